@@ -0,0 +1,339 @@
+"""
+Finds the modules that define a name, to suggest imports for undefined
+names and to complete names that are not imported yet.
+
+The global names of the modules are collected by rope's ``AutoImport``, one
+instance for every project and one for the top level modules of the
+libraries on the python path. Collecting them means parsing every module,
+so it happens in a background thread, and the names are stored with the
+modification time of their module in a JSON file per project. After a
+restart, only modules that changed since are parsed again.
+"""
+import os
+import sys
+import json
+import bisect
+import hashlib
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from rope.base import libutils
+from rope.base.project import Project
+from rope.contrib.autoimport import AutoImport
+
+FORMAT_VERSION = 1
+
+
+class _NameTable(object):
+    """
+    The global names of the modules of a project (or of the libraries),
+    together with the modification times they were collected at.
+    """
+
+    def __init__(self, project, path):
+        self.project = project
+        self.path = path
+        self.auto_import = AutoImport(project, observe=False)
+        self.mtimes = {}
+        self.changed = False
+        self._sorted_names = None
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        if not isinstance(data, dict) or \
+                data.get('version') != FORMAT_VERSION:
+            return
+        modules = data.get('modules', {})
+        self.auto_import.names = dict(
+            (module, names) for module, (mtime, names) in modules.items())
+        self.auto_import.index_names()
+        self.mtimes = dict(
+            (module, mtime) for module, (mtime, names) in modules.items())
+
+    def save(self):
+        if not self.changed:
+            return
+        self.changed = False
+        names = self.auto_import.names
+        data = {
+            'version': FORMAT_VERSION,
+            'modules': dict((module, (self.mtimes.get(module), names[module]))
+                            for module in names),
+        }
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            if os.path.exists(self.path):
+                # os.rename does not replace files on windows
+                os.remove(self.path)
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError):
+            pass
+
+    def modules_for(self, name):
+        return self.auto_import.get_modules(name)
+
+    def names_starting_with(self, prefix):
+        if self._sorted_names is None:
+            self._sorted_names = sorted(self.auto_import.modules_by_name)
+        names = self._sorted_names
+        start = bisect.bisect_left(names, prefix)
+        end = start
+        while end < len(names) and names[end].startswith(prefix):
+            end += 1
+        return names[start:end]
+
+    def update(self, module, mtime, update):
+        """Calls update to collect the names of module again."""
+        self.mtimes[module] = mtime
+        self.changed = True
+        self._sorted_names = None
+        try:
+            update()
+        except Exception:
+            # rope does not understand all of the syntax of newer python
+            # versions, such modules are just left out
+            pass
+
+    def remove(self, modules):
+        for module in modules:
+            self.auto_import.names.pop(module, None)
+            self.mtimes.pop(module, None)
+        self.auto_import.index_names()
+        self.changed = True
+        self._sorted_names = None
+
+
+class AutoImportIndex(object):
+    """
+    The global names of the python modules of the projects and of the
+    libraries, collected in a background thread.
+
+    :param cache_directory: the directory the names are stored in
+    :param library_paths: the folders on the python path whose top level
+        modules are indexed
+    """
+
+    def __init__(self, cache_directory, library_paths):
+        self.cache_directory = cache_directory
+        self.library_paths = library_paths
+        self._lock = threading.Lock()
+        self._tasks = queue.Queue()
+        # project folder (None for the libraries) -> _NameTable, or None
+        # while it is being loaded
+        self._tables = {}
+        self._thread = None
+
+    def start(self):
+        """Starts indexing the libraries, if it isn't yet."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._tables[None] = None
+            self._tasks.put(('libraries', None))
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def add_project(self, root):
+        """Starts indexing the project folder root, if it isn't yet."""
+        with self._lock:
+            if root in self._tables:
+                return
+            self._tables[root] = None
+            # projects are indexed before the libraries
+            self._tasks.put(('project', root))
+        self.start()
+
+    def update_file(self, path):
+        """Collects the names of a changed module again."""
+        self._tasks.put(('file', path))
+
+    def root_for(self, path):
+        """Returns the indexed project folder containing path, or None."""
+        path = os.path.abspath(path)
+        roots = [root for root in list(self._tables) if root is not None and
+                 path.startswith(os.path.join(root, ''))]
+        return max(roots, key=len) if roots else None
+
+    def modules_for(self, name, root=None):
+        """
+        Returns the modules of the project at root and of the libraries
+        that define name. A lookup is a single dict access per table, so it
+        can run for every undefined name the linter reports.
+        """
+        with self._lock:
+            modules = []
+            for table in self._tables_for(root):
+                modules.extend(m for m in table.modules_for(name)
+                               if m not in modules)
+            return modules
+
+    def names_starting_with(self, prefix, root=None, limit=20):
+        """Returns up to limit (name, module) tuples for names with prefix."""
+        with self._lock:
+            result = []
+            for table in self._tables_for(root):
+                for name in table.names_starting_with(prefix):
+                    result.extend((name, m) for m in table.modules_for(name))
+                    if len(result) >= limit:
+                        return result[:limit]
+            return result
+
+    def _tables_for(self, root):
+        return [table for table in (self._tables.get(root),
+                                    self._tables.get(None))
+                if table is not None]
+
+    def _table_path(self, root):
+        if root is None:
+            key = sys.executable + sys.version
+        else:
+            key = root
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json'
+        return os.path.join(self.cache_directory, name)
+
+    def _run(self):
+        if not os.path.isdir(self.cache_directory):
+            try:
+                os.makedirs(self.cache_directory)
+            except OSError:
+                pass
+        while True:
+            kind, argument = self._tasks.get()
+            try:
+                if kind == 'libraries':
+                    self._index_libraries()
+                elif kind == 'project':
+                    self._index_project(argument)
+                else:
+                    self._update_file(argument)
+            except Exception:
+                import traceback
+                traceback.print_exc()
+
+    def _load_table(self, root, project):
+        table = _NameTable(project, self._table_path(root))
+        table.load()
+        with self._lock:
+            self._tables[root] = table
+        return table
+
+    def _index_libraries(self):
+        # an empty project, modules are only searched on the python path
+        project = Project(self.cache_directory, ropefolder=None,
+                          fscommands=None)
+        table = self._load_table(None, project)
+        modules = {}
+        for folder in self.library_paths:
+            for module, path in _top_level_modules(folder):
+                modules.setdefault(module, path)
+
+        pycore = project.pycore
+        for module in sorted(modules):
+            mtime = _mtime(modules[module])
+            if table.mtimes.get(module) == mtime:
+                continue
+            resource = pycore.find_module(module)
+            try:
+                # parse outside of the lock, update_module then hits the cache
+                pycore.get_module(module)
+            except Exception:
+                pass
+            with self._lock:
+                table.update(module, mtime,
+                             lambda: table.auto_import.update_module(module))
+            _forget(pycore, resource)
+        removed = set(table.mtimes) - set(modules)
+        with self._lock:
+            if removed:
+                table.remove(removed)
+        table.save()
+
+    def _index_project(self, root):
+        project = Project(root, ropefolder=None, fscommands=None)
+        table = self._load_table(root, project)
+        pycore = project.pycore
+        modules = set()
+        for resource in pycore.get_python_files():
+            module = pycore.modname(resource)
+            modules.add(module)
+            self._update_resource(table, resource, module)
+        removed = set(table.mtimes) - modules
+        with self._lock:
+            if removed:
+                table.remove(removed)
+        table.save()
+
+    def _update_file(self, path):
+        root = self.root_for(path)
+        table = self._tables.get(root) if root is not None else None
+        if table is None:
+            return
+        resource = libutils.path_to_resource(table.project, path)
+        if resource.exists():
+            self._update_resource(table, resource,
+                                  table.project.pycore.modname(resource),
+                                  force=True)
+        table.save()
+
+    def _update_resource(self, table, resource, module, force=False):
+        mtime = _mtime(resource.real_path)
+        if not force and table.mtimes.get(module) == mtime:
+            return
+        pycore = table.project.pycore
+        try:
+            # parse outside of the lock, update_resource then hits the cache
+            pycore.resource_to_pyobject(resource)
+        except Exception:
+            pass
+        with self._lock:
+            table.update(module, mtime,
+                         lambda: table.auto_import.update_resource(resource))
+        _forget(pycore, resource)
+
+
+def _top_level_modules(folder):
+    """Yields (module name, path) for the top level modules in folder."""
+    try:
+        entries = sorted(os.listdir(folder))
+    except OSError:
+        return
+    for entry in entries:
+        path = os.path.join(folder, entry)
+        if entry.endswith('.py'):
+            module = entry[:-3]
+        elif os.path.isfile(os.path.join(path, '__init__.py')):
+            module = entry
+            path = os.path.join(path, '__init__.py')
+        else:
+            continue
+        if module.startswith('_') or not _is_identifier(module):
+            continue
+        yield module, path
+
+
+def _is_identifier(name):
+    return name.replace('_', 'a').isalnum() and not name[0].isdigit()
+
+
+def _forget(pycore, resource):
+    """Drops a parsed module again, the index only needs its names."""
+    if resource is not None:
+        pycore.module_cache._invalidate_resource(resource)
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
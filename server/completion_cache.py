@@ -0,0 +1,91 @@
+"""
+Reuses completion results between consecutive keystrokes. After typing
+``self.re`` and then ``self.req``, the candidates for the second request are
+a subset of the first, so they are filtered from the cached candidates
+instead of running jedi again. Filtering is a fuzzy match (see
+:mod:`fuzzy_match`), so ``gtdf`` finds ``get_data_frame``.
+
+The cache holds the unfiltered candidates of one completion context per
+document. A context is identified by the complete source in front of the
+token being typed and behind the cursor, so an edit anywhere outside of the
+current token (including the expression before the dot and the enclosing
+scope) invalidates it.
+"""
+import re
+
+from fuzzy_match import FuzzyMatcher
+
+TOKEN_RE = re.compile(r'\w*\Z', re.UNICODE)
+
+
+def split_at_token(source, loc):
+    """
+    Splits source at the identifier in front of the cursor.
+
+    :param source: the document source
+    :param loc: the cursor position as (row, col)
+    :returns: a tuple (before, token, after) of strings, where token is the
+        part of the identifier in front of the cursor, or None if loc is
+        outside of source
+    """
+    row, col = loc
+    lines = source.splitlines(True)
+    if row > len(lines) or (row == len(lines) and col > 0):
+        return None
+    offset = sum(len(l) for l in lines[:row]) + col
+    token = TOKEN_RE.search(source[:offset][-200:]).group()
+    start = offset - len(token)
+    return source[:start], token, source[offset:]
+
+
+class _Entry(object):
+    __slots__ = ('before', 'after', 'proposals', 'matcher')
+
+    def __init__(self, before, after, proposals):
+        self.before = before
+        self.after = after
+        self.proposals = proposals
+        self.matcher = None
+
+
+class CompletionCache(object):
+    """
+    Maps documents to the unfiltered completions of their last completion
+    context. Proposals are (display string, insert string, score) tuples.
+    """
+
+    def __init__(self):
+        self._entries = {}
+
+    def get(self, file_path, before, after):
+        """Returns the cached candidates for a context, or None."""
+        entry = self._entries.get(file_path)
+        if entry is not None and entry.before == before \
+                and entry.after == after:
+            return entry.proposals
+        return None
+
+    def put(self, file_path, before, after, proposals):
+        self._entries[file_path] = _Entry(before, after, proposals)
+
+    def filter(self, file_path, token):
+        """
+        Returns the cached candidates of a document that match token, with
+        the score of the match added to their scores.
+        """
+        entry = self._entries[file_path]
+        if not token:
+            return entry.proposals
+        if entry.matcher is None:
+            entry.matcher = FuzzyMatcher([p[1] for p in entry.proposals])
+        proposals = entry.proposals
+        return [(proposals[i][0], proposals[i][1], proposals[i][2] + score)
+                for i, score in entry.matcher.match(token)]
+
+    def invalidate(self, file_path=None):
+        """Drops the entry of one document, or all entries."""
+        if file_path is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(file_path, None)
+
@@ -0,0 +1,187 @@
+"""
+Orders completion proposals by relevance instead of alphabetically and cuts
+the list down before it is sent to the editor. Lists like the ones for
+``os.`` are hundreds of entries long, and most of their cost is transfer
+and rendering of entries nobody looks at.
+
+A proposal's score is the sum of a base score, computed once when jedi
+returns it (kind of definition and how close it is defined to the cursor),
+and a score computed for the typed token (match quality, private names and
+how often the name was accepted in the project before).
+
+Accepted completions are reported by the client and counted in a
+:class:`FrequencyTable` per project, which is stored as a JSON file.
+"""
+import os
+import json
+import math
+import time
+import hashlib
+
+# like rope's _ProposalSorter: things defined close by come first, then
+# classes and functions before other names
+TYPE_SCORES = {
+    'param': 12,
+    'class': 8,
+    'function': 8,
+    'instance': 6,
+    'statement': 6,
+    'module': 4,
+    'import': 4,
+    'keyword': 0,
+}
+CURRENT_MODULE_SCORE = 20
+# bonus for names defined next to the cursor, falling off with the distance
+NEARBY_SCORE = 10
+NEARBY_LINES = 100
+BUILTIN_SCORE = -4
+PRIVATE_SCORE = -10
+DUNDER_SCORE = -20
+CASE_MATCH_SCORE = 4
+EXACT_MATCH_SCORE = 8
+FREQUENCY_SCORE = 6
+
+
+def base_score(completion, script_path, line):
+    """
+    Scores a jedi Completion independent of the typed token.
+
+    :param script_path: the path of the module being completed
+    :param line: the line of the cursor, starting with 1
+    """
+    score = TYPE_SCORES.get(completion.type, 2)
+    if completion.in_builtin_module():
+        return score + BUILTIN_SCORE
+    if completion.module_path == script_path:
+        score += CURRENT_MODULE_SCORE
+        distance = abs((completion.line or 0) - line)
+        if distance < NEARBY_LINES:
+            score += NEARBY_SCORE * (NEARBY_LINES - distance) // NEARBY_LINES
+    return score
+
+
+def rank(proposals, token, frequencies, limit=None):
+    """
+    Sorts proposals by their score for token and returns at most limit of
+    them.
+
+    :param proposals: (display string, insert string, base score) tuples
+    :param frequencies: the :class:`FrequencyTable` of the project
+    :param limit: the maximum number of proposals, None for all
+    :returns: a list of (display string, insert string) tuples
+    """
+    scored = []
+    for index, (display, name, score) in enumerate(proposals):
+        if name.startswith('__') and name.endswith('__'):
+            if not token.startswith('__'):
+                score += DUNDER_SCORE
+        elif name.startswith('_') and not token.startswith('_'):
+            score += PRIVATE_SCORE
+        if token and name.startswith(token):
+            score += CASE_MATCH_SCORE
+            if name == token:
+                score += EXACT_MATCH_SCORE
+        count = frequencies.count(name)
+        if count:
+            score += FREQUENCY_SCORE * math.log(1 + count, 2)
+        # the index keeps jedi's (alphabetical) order between equal scores
+        scored.append((-score, index, display, name))
+    scored.sort()
+    if limit:
+        scored = scored[:limit]
+    return [(display, name) for _, _, display, name in scored]
+
+
+class FrequencyTable(object):
+    """
+    Counts how often names were accepted as completions. When the table
+    grows beyond max_names, all counts are halved, so names that are not
+    used anymore are forgotten eventually.
+
+    :param path: the JSON file the counts are stored in, or None
+    """
+
+    def __init__(self, path, max_names=2000):
+        self.path = path
+        self.max_names = max_names
+        self.dirty = False
+        self.saved = time.time()
+        self._counts = self._load()
+
+    def _load(self):
+        if self.path is None:
+            return {}
+        try:
+            with open(self.path) as f:
+                counts = json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+        if not isinstance(counts, dict):
+            return {}
+        return counts
+
+    def count(self, name):
+        return self._counts.get(name, 0)
+
+    def record(self, name):
+        self._counts[name] = self._counts.get(name, 0) + 1
+        self.dirty = True
+        if len(self._counts) > self.max_names:
+            self._counts = dict((n, c // 2) for n, c in self._counts.items()
+                                if c > 1)
+
+    def save(self):
+        """Writes the counts if they changed, replacing the file atomically."""
+        self.saved = time.time()
+        if not self.dirty or self.path is None:
+            return
+        self.dirty = False
+        tmp_path = self.path + '.tmp'
+        try:
+            directory = os.path.dirname(self.path)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(tmp_path, 'w') as f:
+                json.dump(self._counts, f)
+            if os.path.exists(self.path):
+                # os.rename does not replace files on windows
+                os.remove(self.path)
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError):
+            pass
+
+
+class FrequencyTables(object):
+    """
+    The frequency tables of all projects, stored in directory.
+
+    :param save_interval: the minimum number of seconds between two writes
+        of the same table
+    """
+
+    def __init__(self, directory, save_interval=10):
+        self.directory = directory
+        self.save_interval = save_interval
+        self._tables = {}
+
+    def table_for(self, project_path):
+        try:
+            return self._tables[project_path]
+        except KeyError:
+            pass
+        path = None
+        if self.directory is not None:
+            key = hashlib.sha1(project_path.encode('utf-8')).hexdigest()
+            path = os.path.join(self.directory, key + '.json')
+        table = self._tables[project_path] = FrequencyTable(path)
+        return table
+
+    def record(self, project_path, name):
+        table = self.table_for(project_path)
+        table.record(name)
+        if time.time() - table.saved > self.save_interval:
+            table.save()
+
+    def save(self):
+        for table in self._tables.values():
+            table.save()
@@ -0,0 +1,149 @@
+"""
+Runs an entry point of a project, usually its tests, under rope's dynamic
+object analysis (``rope/base/oi/runmod.py``). The process reports the
+arguments and return values of the calls of project functions, which rope
+uses to infer the types of parameters and returned values that static
+analysis cannot find.
+
+The calls are received through a local socket in a background thread, in
+lists, and queued. rope's object information is only changed from the
+thread that calls :meth:`DynamicAnalysis.store`, a limited time per call,
+like the other requests of the server.
+"""
+import os
+import sys
+import time
+import pickle
+import socket
+import threading
+import subprocess
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from rope.base.oi import runmod
+
+# the script run in the process is the server's own copy of runmod.py, not
+# a rope the project may contain
+RUNMOD_PATH = os.path.splitext(runmod.__file__)[0] + '.py'
+
+
+class DynamicAnalysis(object):
+    """
+    One run of a project's entry point under dynamic object analysis.
+
+    :param project: the rope project
+    :param args: a python file of the project and its arguments, or "-m",
+        a module and its arguments, e.g. ["-m", "pytest", "tests"]
+    :param time_budget: the seconds after which the process is stopped
+    """
+
+    def __init__(self, project, args, time_budget):
+        self.project = project
+        self.args = list(args)
+        self.time_budget = time_budget
+        # the number of calls received and stored in the object database
+        self.received = 0
+        self.stored = 0
+        self.started = None
+        self.process = None
+        self._calls = queue.Queue()
+        self._thread = None
+        self._timer = None
+
+    def start(self):
+        pycore = self.project.pycore
+        folders = pycore.get_source_folders() + \
+            pycore.get_python_path_folders()
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(f.real_path for f in folders)
+
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.bind(('127.0.0.1', 0))
+        server_socket.listen(1)
+        port = server_socket.getsockname()[1]
+        args = [sys.executable, RUNMOD_PATH, str(port),
+                self.project.address] + self.args
+        with open(os.devnull, 'w') as devnull:
+            self.process = subprocess.Popen(
+                args, env=env, cwd=self.project.address, stdin=devnull,
+                stdout=devnull, stderr=devnull, close_fds=os.name != 'nt')
+        self.started = time.time()
+        self._thread = threading.Thread(target=self._receive,
+                                        args=(server_socket,))
+        self._thread.daemon = True
+        self._thread.start()
+        self._timer = threading.Timer(self.time_budget, self.stop)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def stop(self):
+        """Stops the process, the calls received so far are kept."""
+        if self.process.poll() is None:
+            try:
+                self.process.terminate()
+            except OSError:
+                pass
+
+    @property
+    def running(self):
+        return self.process.poll() is None or self._thread.is_alive()
+
+    @property
+    def done(self):
+        """Whether the process ended and all received calls are stored."""
+        return not self.running and self._calls.empty()
+
+    def _receive(self, server_socket):
+        # the process may fail before it connects
+        server_socket.settimeout(1)
+        try:
+            while True:
+                try:
+                    connection = server_socket.accept()[0]
+                    break
+                except socket.timeout:
+                    if self.process.poll() is not None:
+                        return
+        finally:
+            server_socket.close()
+
+        connection.settimeout(None)
+        data_file = connection.makefile('rb')
+        try:
+            while True:
+                calls = pickle.load(data_file)
+                if not isinstance(calls, list):
+                    calls = [calls]
+                self.received += len(calls)
+                self._calls.put(calls)
+        except Exception:
+            # EOFError, or a partial pickle when the process was stopped
+            pass
+        finally:
+            data_file.close()
+            connection.close()
+            self._timer.cancel()
+
+    def store(self, time_budget):
+        """
+        Stores received calls in rope's object database for about
+        time_budget seconds. Returns True if no calls are left.
+        """
+        object_info = self.project.pycore.object_info
+        start = time.time()
+        while time.time() - start < time_budget:
+            try:
+                calls = self._calls.get_nowait()
+            except queue.Empty:
+                return True
+            for call in calls:
+                try:
+                    object_info.doa_data_received(call)
+                except Exception:
+                    # e.g. modules rope cannot parse
+                    pass
+                self.stored += 1
+        return self._calls.empty()
@@ -0,0 +1,98 @@
+"""
+Long-lived jedi evaluators. ``jedi.Script`` normally creates a new Evaluator
+for every call, which throws away everything inferred about imported
+library modules after each completion. The server instead keeps one
+evaluator per project and only invalidates what depends on modules that
+changed (see ``jedi.evaluate.cache.MemoizeCache``).
+"""
+import os
+import sys
+import zlib
+from collections import OrderedDict
+
+import jedi
+from jedi.parser import load_grammar
+from jedi.evaluate import Evaluator
+from jedi.evaluate.cache import MemoizeCache
+from jedi.cache import parser_cache
+
+
+def _document_key(path):
+    # the parser cache is keyed by the path jedi.Script makes absolute,
+    # "BUFFER:" names included
+    return None if path is None else os.path.abspath(path)
+
+
+class EvaluatorSession(object):
+    """
+    One jedi Evaluator and the versions of the documents it has seen.
+
+    :param max_entries: the maximum number of memoized values to keep
+    """
+
+    def __init__(self, max_entries):
+        grammar = load_grammar('grammar%s.%s' % sys.version_info[:2])
+        self.evaluator = Evaluator(grammar, MemoizeCache(max_entries))
+        # document path -> checksum of the source the evaluator last saw
+        self.versions = {}
+
+    def script(self, source, line, column, path):
+        """Returns a jedi Script for source that uses this session."""
+        parser_cache.open_documents.add(_document_key(path))
+        self.update_document(path, source)
+        return jedi.Script(source, line, column, path, evaluator=self.evaluator)
+
+    def update_document(self, path, source):
+        path = os.path.abspath(path)
+        version = zlib.adler32(source.encode("utf-8"))
+        if self.versions.get(path) != version:
+            self.versions[path] = version
+            self.evaluator.invalidate_module(path)
+
+    def invalidate(self, path):
+        """Forgets the module at path, e.g. after it changed on disk."""
+        path = os.path.abspath(path)
+        self.versions.pop(path, None)
+        self.evaluator.invalidate_module(path)
+
+    def finish_request(self):
+        self.evaluator.memoize_cache.evict()
+
+
+class EvaluatorSessions(object):
+    """
+    The evaluator sessions of all projects, at most max_sessions of them,
+    dropping the least recently used ones.
+    """
+
+    def __init__(self, max_sessions=4, max_entries=200000):
+        self.max_sessions = max_sessions
+        self.max_entries = max_entries
+        self._sessions = OrderedDict()
+
+    def session_for(self, project_path):
+        try:
+            session = self._sessions.pop(project_path)
+        except KeyError:
+            session = EvaluatorSession(self.max_entries)
+            while len(self._sessions) >= self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions[project_path] = session
+        return session
+
+    def invalidate(self, path):
+        for session in self._sessions.values():
+            session.invalidate(path)
+
+    def document_closed(self, path):
+        """Allows jedi to drop the parsed document from its cache."""
+        parser_cache.open_documents.discard(_document_key(path))
+
+    def evict_parsers(self):
+        """
+        Shrinks jedi's parser cache to its size limit and forgets the dropped
+        modules in all sessions, which would keep them in memory otherwise.
+        """
+        for path in parser_cache.evict():
+            for session in self._sessions.values():
+                session.evaluator.invalidate_module(path)
@@ -0,0 +1,122 @@
+"""
+Subsequence ("fuzzy") matching of completion candidates, so that typing
+``gtdf`` finds ``get_data_frame``. The characters of the query have to
+appear in the name in the same order, ignoring case. Matches are scored by
+kind: prefixes first, then the query found at a word start (after ``_``,
+at a camel case hump), the query made of word prefixes (``gdf`` or
+``getdafr`` for ``get_data_frame``), any substring and finally any
+subsequence. Shorter names win within a kind.
+
+Each name is reduced to a bitmask of the characters it contains when the
+matcher is built. A name can only match if its mask contains all the bits
+of the query, which rules out most candidates with a single integer
+operation, and the remaining tests are string methods and a regular
+expression that run in C. When the query grows by a keystroke, only the
+previous matches are tested again.
+"""
+import re
+
+PREFIX_SCORE = 40
+WORD_PREFIX_SCORE = 30
+WORD_PARTS_SCORE = 20
+SUBSTRING_SCORE = 10
+SUBSEQUENCE_SCORE = 0
+# for subsequences that start with the first character of the name
+FIRST_CHAR_SCORE = 5
+# penalty per character the name is longer than the query
+MAX_LENGTH_PENALTY = 9
+
+# marks word starts in names: the first character, the characters after
+# "_" or ".", camel case humps (also the S in HTTPServer) and digits
+WORD_START = '\x00'
+WORD_START_RE = re.compile(
+    r'^.|(?<=[_.])[^_]|(?<![A-Z_.])[A-Z]|(?<=[A-Z])[A-Z](?=[a-z])|'
+    r'(?<![0-9_.])[0-9]', re.DOTALL)
+
+
+def char_mask(text):
+    """
+    Returns the bitmask of the characters in text: one bit per letter
+    (ignoring case), one for all digits and one for everything else.
+    """
+    mask = 0
+    for c in set(text.lower()):
+        if 'a' <= c <= 'z':
+            mask |= 1 << (ord(c) - 97)
+        elif c.isdigit():
+            mask |= 1 << 26
+        else:
+            mask |= 1 << 27
+    return mask
+
+
+def _mark(match):
+    return WORD_START + match.group()
+
+
+class FuzzyMatcher(object):
+    """
+    Matches queries against a fixed list of names.
+
+    :param names: the candidate names, e.g. the proposals of a completion
+        context
+    """
+
+    def __init__(self, names):
+        self.names = names
+        self.lower = [name.lower() for name in names]
+        self.masks = [char_mask(name) for name in names]
+        # the lower case names with WORD_START in front of every word
+        self.marked = [WORD_START_RE.sub(_mark, name).lower()
+                       for name in names]
+        self._last_query = None
+        self._last_indices = None
+
+    def match(self, query):
+        """
+        Returns the names matching query as (index, score) tuples, in the
+        order of the names.
+        """
+        query = query.lower()
+        if self._last_query is not None and \
+                query.startswith(self._last_query):
+            indices = self._last_indices
+        else:
+            indices = range(len(self.names))
+
+        query_mask = char_mask(query)
+        length = len(query)
+        chars = [re.escape(c) for c in query]
+        subsequence = re.compile('.*?'.join(chars), re.DOTALL).search
+        # every char either follows the previous one or starts a word
+        word_parts = re.compile(
+            WORD_START + ('(?:.*?%s)?' % WORD_START).join(chars),
+            re.DOTALL).search
+        word_prefix = WORD_START + query
+        lower, marked, masks = self.lower, self.marked, self.masks
+        results = []
+        for index in indices:
+            if masks[index] & query_mask != query_mask:
+                continue
+            name = lower[index]
+            if name.startswith(query):
+                score = PREFIX_SCORE
+            elif word_prefix in marked[index]:
+                score = WORD_PREFIX_SCORE
+            elif word_parts(marked[index]):
+                score = WORD_PARTS_SCORE
+            elif query in name:
+                score = SUBSTRING_SCORE
+            elif subsequence(name):
+                score = SUBSEQUENCE_SCORE
+                if name[0] == query[0]:
+                    score += FIRST_CHAR_SCORE
+            else:
+                continue
+            score -= min(len(name) - length, MAX_LENGTH_PENALTY)
+            results.append((index, score))
+
+        self._last_query = query
+        self._last_indices = [index for index, _ in results]
+        return results
+
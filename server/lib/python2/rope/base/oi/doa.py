@@ -63,7 +63,12 @@ class PythonFileRunner(object):
     def _receive_information(self):
         #temp = open('/dev/shm/info', 'w')
         for data in self.receiver.receive_data():
-            self.analyze_data(data)
+            # runmod sends the calls in lists
+            if isinstance(data, list):
+                for call in data:
+                    self.analyze_data(call)
+            else:
+                self.analyze_data(data)
             #temp.write(str(data) + '\n')
         #temp.close()
         for observer in self.observers:
@@ -8,6 +8,7 @@ def __rope_start_everything():
     import inspect
     import types
     import threading
+    import time
 
     class _MessageSender(object):
 
@@ -24,6 +25,7 @@ def __rope_start_everything():
         def send_data(self, data):
             if not self.my_file.closed:
                 pickle.dump(data, self.my_file)
+                self.my_file.flush()
 
         def close(self):
             self.my_file.close()
@@ -36,6 +38,7 @@ def __rope_start_everything():
         def send_data(self, data):
             if not self.my_file.closed:
                 marshal.dump(data, self.my_file)
+                self.my_file.flush()
 
         def close(self):
             self.my_file.close()
@@ -53,8 +56,16 @@ def __rope_start_everything():
 
     class _FunctionCallDataSender(object):
 
+        # calls are sent in lists of this many, or of the calls that
+        # returned in this many seconds
+        batch_size = 100
+        batch_interval = 0.5
+
         def __init__(self, send_info, project_root):
             self.project_root = project_root
+            self.sent = set()
+            self.batch = []
+            self.last_sent = time.time()
             if send_info.isdigit():
                 self.sender = _SocketSender(int(send_info))
             else:
@@ -86,11 +97,26 @@ def __rope_start_everything():
             try:
                 data = (self._object_to_persisted_form(frame.f_code),
                         tuple(args), returned)
-                self.sender.send_data(data)
+                self._add_to_batch(data)
             except (TypeError):
                 pass
             return self.on_function_call
 
+        def _add_to_batch(self, data):
+            # the same call is only sent once
+            if data not in self.sent:
+                self.sent.add(data)
+                self.batch.append(data)
+            if len(self.batch) >= self.batch_size or self.batch and \
+               time.time() - self.last_sent > self.batch_interval:
+                self._send_batch()
+
+        def _send_batch(self):
+            if self.batch:
+                self.sender.send_data(self.batch)
+                self.batch = []
+            self.last_sent = time.time()
+
         def _is_an_interesting_call(self, frame):
             #if frame.f_code.co_name in ['?', '<module>']:
             #    return False
@@ -186,8 +212,9 @@ def __rope_start_everything():
                 return path
 
         def close(self):
-            self.sender.close()
             sys.settrace(None)
+            self._send_batch()
+            self.sender.close()
 
     def _realpath(path):
         return os.path.realpath(os.path.abspath(os.path.expanduser(path)))
@@ -202,9 +229,17 @@ def __rope_start_everything():
     if send_info != '-':
         data_sender = _FunctionCallDataSender(send_info, project_root)
     del sys.argv[1:4]
-    execfile(file_to_run, run_globals)
-    if send_info != '-':
-        data_sender.close()
+    try:
+        if file_to_run == '-m':
+            # running a module like ``python -m``, e.g. a test runner
+            import runpy
+            module = sys.argv.pop(1)
+            runpy.run_module(module, run_name='__main__', alter_sys=True)
+        else:
+            execfile(file_to_run, run_globals)
+    finally:
+        if send_info != '-':
+            data_sender.close()
 
 
 if __name__ == '__main__':
@@ -255,34 +255,160 @@ def get_no_project():
 
 
 class _FileListCacher(object):
+    """Keeps the list of the files of a project
+
+    The project is walked once; after that the list is updated from the
+    resource observer events, walking only the folders that were created
+    or changed.  For every folder the names of its files and subfolders
+    are kept with its modification time.  If the project has a
+    ropefolder, they are stored there, and when the project is opened
+    again only the folders whose modification time changed are listed.
+
+    """
 
     def __init__(self, project):
         self.project = project
         self.files = None
+        # folder path -> (mtime, file names, folder names)
+        self.folders = {}
         rawobserver = ResourceObserver(
-            self._changed, self._invalid, self._invalid,
-            self._invalid, self._invalid)
+            self._changed, self._moved, self._created,
+            self._removed, self._validate)
         self.project.add_observer(rawobserver)
+        self.project.data_files.add_write_hook(self._write)
 
     def get_files(self):
         if self.files is None:
             self.files = set()
-            self._add_files(self.project.root)
+            self.folders = {}
+            self._add_folder('', self._read_snapshot())
         return self.files
 
-    def _add_files(self, folder):
-        for child in folder.get_children():
-            if child.is_folder():
-                self._add_files(child)
-            elif not self.project.is_ignored(child):
-                self.files.add(child)
+    def _read_snapshot(self):
+        snapshot = self.project.data_files.read_data('filelist')
+        if not isinstance(snapshot, dict) or \
+           snapshot.get('ignored') != list(self.project.ignored.patterns):
+            return {}
+        return snapshot.get('folders', {})
+
+    def _write(self):
+        if self.files is not None:
+            snapshot = {'ignored': list(self.project.ignored.patterns),
+                        'folders': self.folders}
+            self.project.data_files.write_data('filelist', snapshot)
+
+    def _add_folder(self, path, snapshot=None):
+        real_path = self.project._get_resource_path(path)
+        try:
+            mtime = os.stat(real_path).st_mtime
+        except OSError:
+            return
+        cached = snapshot.get(path) if snapshot else None
+        if cached is not None and cached[0] == mtime:
+            files, folders = cached[1], cached[2]
+        else:
+            files, folders = self._list_folder(path, real_path)
+        self.folders[path] = (mtime, files, folders)
+        for name in files:
+            self.files.add(self.project.get_file(_join_path(path, name)))
+        for name in folders:
+            self._add_folder(_join_path(path, name), snapshot)
+
+    def _list_folder(self, path, real_path):
+        """Return the names of the files and folders that are not ignored
+
+        Unlike `Folder.get_children()` no resources are created and
+        ignored folders are not entered at all.
+
+        """
+        files = []
+        folders = []
+        matcher = self.project.ignored
+        for name, is_folder, is_link in _list_entries(real_path):
+            # like `_ResourceMatcher.does_match()` links are ignored
+            if is_link or matcher.does_match_path(_join_path(path, name)):
+                continue
+            if is_folder:
+                folders.append(name)
+            else:
+                files.append(name)
+        return files, folders
+
+    def _remove(self, resource):
+        path = resource.path
+        if not resource.is_folder():
+            self.files.discard(resource)
+            return
+        prefix = path + '/' if path else ''
+        for folder in list(self.folders):
+            if folder == path or folder.startswith(prefix):
+                for name in self.folders.pop(folder)[1]:
+                    self.files.discard(
+                        self.project.get_file(_join_path(folder, name)))
+
+    def _add(self, resource):
+        if self.project.is_ignored(resource):
+            return
+        if resource.is_folder():
+            self._add_folder(resource.path)
+        elif resource.exists():
+            self.files.add(resource)
+
+    def _update_parent(self, resource):
+        """List the parent folder again, without walking its children"""
+        parent = resource.path.rpartition('/')[0]
+        if resource.path and parent in self.folders:
+            real_path = self.project._get_resource_path(parent)
+            try:
+                mtime = os.stat(real_path).st_mtime
+            except OSError:
+                return
+            files, folders = self._list_folder(parent, real_path)
+            self.folders[parent] = (mtime, files, folders)
 
     def _changed(self, resource):
         if resource.is_folder():
-            self.files = None
+            self._validate(resource)
 
-    def _invalid(self, resource, new_resource=None):
-        self.files = None
+    def _created(self, resource):
+        if self.files is not None:
+            self._add(resource)
+            self._update_parent(resource)
+
+    def _removed(self, resource):
+        if self.files is not None:
+            self._remove(resource)
+            self._update_parent(resource)
+
+    def _moved(self, resource, new_resource):
+        self._removed(resource)
+        self._created(new_resource)
+
+    def _validate(self, resource):
+        if self.files is not None:
+            self._remove(resource)
+            self._add(resource)
+            self._update_parent(resource)
+
+
+def _join_path(folder, name):
+    if folder:
+        return folder + '/' + name
+    return name
+
+
+def _list_entries(real_path):
+    """Yield ``(name, is_folder, is_link)`` for the entries of a folder"""
+    try:
+        if hasattr(os, 'scandir'):
+            for entry in os.scandir(real_path):
+                yield entry.name, entry.is_dir(), entry.is_symlink()
+        else:
+            for name in os.listdir(real_path):
+                path = os.path.join(real_path, name)
+                yield name, os.path.isdir(path), os.path.islink(path)
+    except OSError:
+        return
 
 
 class _DataFiles(object):
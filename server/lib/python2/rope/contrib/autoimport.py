@@ -26,6 +26,7 @@ class AutoImport(object):
         self.names = project.data_files.read_data('globalnames')
         if self.names is None:
             self.names = {}
+        self.index_names()
         project.data_files.add_write_hook(self._write)
         # XXX: using a filtered observer
         observer = resourceobserver.ResourceObserver(
@@ -49,11 +50,29 @@ class AutoImport(object):
 
     def get_modules(self, name):
         """Return the list of modules that have global `name`"""
-        result = []
-        for module in self.names:
-            if name in self.names[module]:
-                result.append(module)
-        return result
+        return list(self.modules_by_name.get(name, ()))
+
+    def index_names(self):
+        """Build the index from global names to their modules
+
+        Has to be called after `names` was changed directly.
+
+        """
+        self.modules_by_name = {}
+        for module, names in self.names.items():
+            self._index_module(module, names)
+
+    def _index_module(self, module, names):
+        for name in names:
+            self.modules_by_name.setdefault(name, []).append(module)
+
+    def _remove_module(self, module):
+        for name in self.names.pop(module, ()):
+            modules = self.modules_by_name.get(name)
+            if modules is not None and module in modules:
+                modules.remove(module)
+                if not modules:
+                    del self.modules_by_name[name]
 
     def get_all_names(self):
         """Return the list of all cached global names"""
@@ -123,6 +142,7 @@ class AutoImport(object):
 
         """
         self.names.clear()
+        self.modules_by_name.clear()
 
     def find_insertion_line(self, code):
         """Guess at what line the new import should be inserted"""
@@ -181,7 +201,9 @@ class AutoImport(object):
                 globals.append(name)
             if isinstance(pymodule, builtins.BuiltinModule):
                 globals.append(name)
+        self._remove_module(modname)
         self.names[modname] = globals
+        self._index_module(modname, globals)
 
     def _write(self):
         self.project.data_files.write_data('globalnames', self.names)
@@ -193,15 +215,13 @@ class AutoImport(object):
     def _moved(self, resource, newresource):
         if not resource.is_folder():
             modname = self._module_name(resource)
-            if modname in self.names:
-                del self.names[modname]
+            self._remove_module(modname)
             self.update_resource(newresource)
 
     def _removed(self, resource):
         if not resource.is_folder():
             modname = self._module_name(resource)
-            if modname in self.names:
-                del self.names[modname]
+            self._remove_module(modname)
 
 
 def submodules(mod):
@@ -44,6 +44,13 @@ class FileSystemCommands(object):
         else:
             shutil.rmtree(path)
 
+    def read(self, path):
+        file_ = open(path, 'rb')
+        try:
+            return file_.read()
+        finally:
+            file_.close()
+
     def write(self, path, data):
         file_ = open(path, 'wb')
         try:
@@ -73,6 +80,9 @@ class SubversionCommands(object):
     def remove(self, path):
         self.client.remove(path, force=True)
 
+    def read(self, path):
+        return self.normal_actions.read(path)
+
     def write(self, path, data):
         self.normal_actions.write(path, data)
 
@@ -117,6 +127,9 @@ class MercurialCommands(object):
     def remove(self, path):
         self.hg.commands.remove(self.ui, self.repo, path)
 
+    def read(self, path):
+        return self.normal_actions.read(path)
+
     def write(self, path, data):
         self.normal_actions.write(path, data)
 
@@ -141,6 +154,9 @@ class GITCommands(object):
     def remove(self, path):
         self._do(['rm', self._in_dir(path)])
 
+    def read(self, path):
+        return self.normal_actions.read(path)
+
     def write(self, path, data):
         # XXX: should we use ``git add``?
         self.normal_actions.write(path, data)
@@ -174,6 +190,9 @@ class DarcsCommands(object):
     def remove(self, path):
         self.normal_actions.remove(path)
 
+    def read(self, path):
+        return self.normal_actions.read(path)
+
     def write(self, path, data):
         self.normal_actions.write(path, data)
 
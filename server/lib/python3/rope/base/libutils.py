@@ -37,10 +37,12 @@ def relative(root, path):
     if path.startswith(root + '/'):
     	return path[len(root) + 1:]
 
-def report_change(project, path, old_content):
+def report_change(project, path, old_content, changed_lines=None):
     """Report that the contents of file at `path` was changed
 
-    The new contents of file is retrieved by reading the file.
+    The new contents of file is retrieved by reading the file.  If the
+    numbers of the changed lines are known, they can be passed as
+    `changed_lines`, which saves comparing the contents.
 
     """
     resource = path_to_resource(project, path)
@@ -50,7 +52,8 @@ def report_change(project, path, old_content):
         observer.resource_changed(resource)
     if project.pycore.automatic_soa:
         rope.base.pycore.perform_soa_on_changed_scopes(project, resource,
-                                                       old_content)
+                                                       old_content,
+                                                       changed_lines)
 
 def analyze_modules(project, task_handle=taskhandle.NullTaskHandle()):
     """Perform static object analysis on all python files in the project
@@ -33,7 +33,13 @@ class ObjectInfoManager(object):
             if dbtype != 'memory' and self.project.ropefolder is not None:
                 persist = True
         self.validation = TextualValidation(self.to_pyobject)
-        db = memorydb.MemoryDB(self.project, persist=persist)
+        # a callable that creates the database for the project, for
+        # storing object information somewhere else
+        factory = self.project.get_prefs().get('objectdb_factory', None)
+        if factory is not None:
+            db = factory(self.project)
+        else:
+            db = memorydb.MemoryDB(self.project, persist=persist)
         self.objectdb = objectdb.ObjectDB(db, self.validation)
 
     def _init_validation(self):
@@ -1,6 +1,6 @@
 import bisect
-import difflib
 import sys
+import time
 import warnings
 
 import rope.base.oi.doa
@@ -46,6 +46,27 @@ class PyCore(object):
         for path in self.project.prefs.get('source_folders', []):
             folder = self.project.get_resource(path)
             self._custom_source_folders.append(folder)
+        # computed from the file list of the project when needed and
+        # updated or dropped when resources are created, moved or removed
+        import rope.base.project
+        self._indexed = isinstance(self.project, rope.base.project.Project)
+        self._python_files = None
+        self._source_folders = None
+        self._source_modules = None
+        self._project_paths = None
+        self._python_path_folders = (None, None)
+        # the source folders and ignored patterns, and the source folders
+        # by the name of the modules that would be ignored in them
+        self._ignored_modules = (None, None, {})
+        observer = rope.base.resourceobserver.ResourceObserver(
+            changed=self._folder_changed, moved=self._resource_moved,
+            created=self._resource_created, removed=self._resource_moved,
+            validate=self._folder_changed)
+        self.project.add_observer(observer)
+        # module resolution counters
+        self.find_module_calls = 0
+        self.find_module_time = 0.0
+        self.source_folder_scans = 0
 
     def _init_automatic_soa(self):
         if not self.automatic_soa:
@@ -121,6 +142,11 @@ class PyCore(object):
             observer(resource)
 
     def _find_module_in_folder(self, folder, modname):
+        if self._indexed and folder.project is self.project:
+            module = self._find_module_in_project(folder, modname)
+            if module is not None or \
+               not self._may_be_ignored_module(folder, modname):
+                return module
         module = folder
         packages = modname.split('.')
         for pkg in packages[:-1]:
@@ -136,23 +162,76 @@ class PyCore(object):
                  not module.get_child(packages[-1] + '.py').is_folder():
                 return module.get_child(packages[-1] + '.py')
 
+    def _find_module_in_project(self, folder, modname):
+        """Find a module using the file list of the project
+
+        Unlike `_find_module_in_folder()` it does not access the file
+        system; ignored resources are not found.
+
+        """
+        files, folders = self._get_project_paths()
+        path = modname.replace('.', '/')
+        if folder.path:
+            path = folder.path + '/' + path
+        if path in folders:
+            return self.project.get_folder(path)
+        if path + '.py' in files:
+            return self.project.get_file(path + '.py')
+
+    def _may_be_ignored_module(self, folder, modname):
+        """Whether the module would be an ignored resource
+
+        The file list lacks those, but they can be imported anyway, like
+        the siblings of the file of a single file project.
+
+        """
+        path = modname.replace('.', '/')
+        if folder.path:
+            path = folder.path + '/' + path
+        matcher = self.project.ignored
+        return matcher.does_match_path(path) or \
+            matcher.does_match_path(path + '.py')
+
+    def _ignored_module_folders(self, modname):
+        """Return the source folders `modname` would be ignored in"""
+        source_folders = self.get_source_folders()
+        patterns = self.project.ignored.patterns
+        if self._ignored_modules[0] is not source_folders or \
+           self._ignored_modules[1] != patterns:
+            self._ignored_modules = (source_folders, list(patterns), {})
+        folders = self._ignored_modules[2]
+        if modname not in folders:
+            folders[modname] = [
+                src for src in source_folders
+                if self._may_be_ignored_module(src, modname)]
+        return folders[modname]
+
     def get_python_path_folders(self):
         import rope.base.project
+        paths = self.project.prefs.get('python_path', []) + sys.path
+        if self._python_path_folders[0] == paths:
+            return list(self._python_path_folders[1])
         result = []
-        for src in self.project.prefs.get('python_path', []) + sys.path:
+        for src in paths:
             try:
                 src_folder = rope.base.project.get_no_project().get_resource(src)
                 result.append(src_folder)
             except rope.base.exceptions.ResourceNotFoundError:
                 pass
-        return result
+        self._python_path_folders = (paths, result)
+        return list(result)
 
     def find_module(self, modname, folder=None):
         """Returns a resource corresponding to the given module
 
         returns None if it can not be found
         """
-        return self._find_module(modname, folder)
+        start = time.time()
+        try:
+            return self._find_module(modname, folder)
+        finally:
+            self.find_module_calls += 1
+            self.find_module_time += time.time() - start
 
     def find_relative_module(self, modname, folder, level):
         for i in range(level - 1):
@@ -164,41 +243,81 @@ class PyCore(object):
 
     def _find_module(self, modname, folder=None):
         """Return `modname` module resource"""
-        for src in self.get_source_folders():
-            module = self._find_module_in_folder(src, modname)
-            if module is not None:
-                return module
-        for src in self.get_python_path_folders():
+        if self._indexed:
+            # only the source folders containing the top level package
+            sources = self._get_source_modules().get(modname.split('.')[0])
+        else:
+            sources = self.get_source_folders()
+        folders = sources
+        if self._indexed and not sources:
+            # the index lacks ignored resources, like the siblings of the
+            # file of a single file project, which are modules nonetheless
+            folders = self._ignored_module_folders(modname)
+        for src in folders:
             module = self._find_module_in_folder(src, modname)
             if module is not None:
                 return module
+        # like python, the submodules of a project package are only looked
+        # up in it; ``from mod import name`` is looked up as ``mod.name``
+        if not (self._indexed and sources and '.' in modname):
+            for src in self.get_python_path_folders():
+                module = self._find_module_in_folder(src, modname)
+                if module is not None:
+                    return module
         if folder is not None:
             module = self._find_module_in_folder(folder, modname)
             if module is not None:
                 return module
         return None
 
-    # INFO: It was decided not to cache source folders, since:
-    #  - Does not take much time when the root folder contains
-    #    packages, that is most of the time
-    #  - We need a separate resource observer; `self.observer`
-    #    does not get notified about module and folder creations
-    @utils.memoize
     def get_source_folders(self):
         """Returns project source folders"""
         if self.project.root is None:
             return []
-        result = list(self._custom_source_folders)
-        result.extend(self._find_source_folders(self.project.root))
-        return result
+        if self._source_folders is None:
+            self.source_folder_scans += 1
+            result = list(self._custom_source_folders)
+            result.extend(self.project.get_folder(path)
+                          for path in self._find_source_folders(''))
+            self._source_folders = result
+            self._source_modules = None
+        return self._source_folders
+
+    def _get_source_modules(self):
+        """Map top level module names to the source folders having them
+
+        The source folders are in the order they are searched in.
+
+        """
+        source_folders = self.get_source_folders()
+        if self._source_modules is None:
+            files, folders = self._get_project_paths()
+            children = {}
+            for path in folders:
+                if path:
+                    parent, _, name = path.rpartition('/')
+                    children.setdefault(parent, set()).add(name)
+            for path in files:
+                if path.endswith('.py'):
+                    parent, _, name = path.rpartition('/')
+                    children.setdefault(parent, set()).add(name[:-3])
+            modules = {}
+            for folder in source_folders:
+                for name in children.get(folder.path, ()):
+                    modules.setdefault(name, []).append(folder)
+            self._source_modules = modules
+        return self._source_modules
 
     def resource_to_pyobject(self, resource, force_errors=False):
         return self.module_cache.get_pymodule(resource, force_errors)
 
     def get_python_files(self):
         """Returns all python files available in the project"""
-        return [resource for resource in self.project.get_files()
-                if self.is_python_file(resource)]
+        if self._python_files is None:
+            self._python_files = set(
+                resource for resource in self.project.get_files()
+                if self.is_python_file(resource))
+        return list(self._python_files)
 
     def _is_package(self, folder):
         if folder.has_child('__init__.py') and \
@@ -207,19 +326,79 @@ class PyCore(object):
         else:
             return False
 
-    @utils.memoize
     def _find_source_folders(self, folder):
-        for resource in folder.get_folders():
-            if self._is_package(resource):
-                return [folder]
-        result = []
-        for resource in folder.get_files():
-            if resource.name.endswith('.py'):
+        """Return the paths of the source folders in `folder` path
+
+        A folder containing packages is a source folder and is not
+        searched further; a folder containing modules is one, too.
+
+        """
+        files, folders = self._get_project_paths()
+        subfolders = {}
+        for path in folders:
+            if path:
+                subfolders.setdefault(path.rpartition('/')[0], []).append(path)
+        with_modules = set(path.rpartition('/')[0] for path in files
+                           if path.endswith('.py'))
+        def find(folder):
+            children = sorted(subfolders.get(folder, []))
+            for path in children:
+                if path + '/__init__.py' in files:
+                    return [folder]
+            result = []
+            if folder in with_modules:
                 result.append(folder)
-                break
-        for resource in folder.get_folders():
-            result.extend(self._find_source_folders(resource))
-        return result
+            for path in children:
+                result.extend(find(path))
+            return result
+        return find(folder)
+
+    def _get_project_paths(self):
+        """Return the paths of the files and folders of the project
+
+        The folders are the ones containing files.
+
+        """
+        if self._project_paths is None:
+            files = set()
+            folders = set([''])
+            for resource in self.project.get_files():
+                files.add(resource.path)
+                path = resource.path.rpartition('/')[0]
+                while path not in folders:
+                    folders.add(path)
+                    path = path.rpartition('/')[0]
+            self._project_paths = (files, folders)
+        return self._project_paths
+
+    def _resource_created(self, resource):
+        if resource.is_folder():
+            self._folder_changed(resource)
+            return
+        self._project_paths = None
+        if resource.name.endswith('.py'):
+            self._source_folders = None
+        if self._python_files is not None and self.is_python_file(resource) \
+           and not self.project.is_ignored(resource):
+            self._python_files.add(resource)
+
+    def _resource_moved(self, resource, new_resource=None):
+        if resource.is_folder():
+            self._folder_changed(resource)
+            return
+        self._project_paths = None
+        if resource.name.endswith('.py'):
+            self._source_folders = None
+        if self._python_files is not None:
+            self._python_files.discard(resource)
+        if new_resource is not None:
+            self._resource_created(new_resource)
+
+    def _folder_changed(self, resource):
+        if resource.is_folder():
+            self._project_paths = None
+            self._source_folders = None
+            self._python_files = None
 
     def run_module(self, resource, args=None, stdin=None, stdout=None):
         """Run `resource` module
@@ -299,18 +478,51 @@ class PyCore(object):
 
 
 class _ModuleCache(object):
+    """Caches `PyModule`\s and knows which of them import each other
+
+    When a module changes, only the data concluded in the modules that
+    (directly or transitively) import it is forgotten.  The number of
+    modules each change invalidates is counted in `invalidations`,
+    `invalidated_modules` and `last_invalidated`.
+
+    """
 
     def __init__(self, pycore):
         self.pycore = pycore
         self.module_map = {}
+        # resource -> set of the resources of the modules importing it
+        self.dependents = {}
+        # resource -> set of the resources it imports
+        self.dependencies = {}
+        self.invalidations = 0
+        self.invalidated_modules = 0
+        self.last_invalidated = 0
         self.pycore.cache_observers.append(self._invalidate_resource)
         self.observer = self.pycore.observer
 
     def _invalidate_resource(self, resource):
         if resource in self.module_map:
-            self.forget_all_data()
+            invalidated = self._get_dependents(resource)
+            for dependent in invalidated:
+                if dependent in self.module_map:
+                    self.module_map[dependent]._forget_concluded_data()
+            self.invalidations += 1
+            self.invalidated_modules += len(invalidated)
+            self.last_invalidated = len(invalidated)
             self.observer.remove_resource(resource)
             del self.module_map[resource]
+            self._remove_dependencies(resource)
+
+    def _get_dependents(self, resource):
+        """Return `resource` and the modules that transitively import it"""
+        result = set([resource])
+        pending = [resource]
+        while pending:
+            for dependent in self.dependents.get(pending.pop(), ()):
+                if dependent not in result:
+                    result.add(dependent)
+                    pending.append(dependent)
+        return result
 
     def get_pymodule(self, resource, force_errors=False):
         if resource in self.module_map:
@@ -325,14 +537,78 @@ class _ModuleCache(object):
                 return result
         self.module_map[resource] = result
         self.observer.add_resource(resource)
+        self._add_dependencies(resource, result)
         return result
 
+    def _add_dependencies(self, resource, pymodule):
+        if resource.is_folder():
+            # a package is made of its __init__.py
+            dependencies = set()
+            if resource.has_child('__init__.py'):
+                dependencies.add(resource.get_child('__init__.py'))
+            folder = resource
+        else:
+            collector = _ImportCollector()
+            ast.walk(pymodule.get_ast(), collector)
+            folder = resource.parent
+            dependencies = set()
+            for modname, level in collector.imports:
+                try:
+                    if level:
+                        module = self.pycore.find_relative_module(
+                            modname, folder, level)
+                    else:
+                        module = self.pycore.find_module(modname, folder)
+                except AttributeError:
+                    # a relative import beyond the root folder
+                    module = None
+                if module is not None and module != resource:
+                    dependencies.add(module)
+        self.dependencies[resource] = dependencies
+        for dependency in dependencies:
+            self.dependents.setdefault(dependency, set()).add(resource)
+
+    def _remove_dependencies(self, resource):
+        for dependency in self.dependencies.pop(resource, ()):
+            dependents = self.dependents.get(dependency)
+            if dependents is not None:
+                dependents.discard(resource)
+                if not dependents:
+                    del self.dependents[dependency]
+
     def forget_all_data(self):
         for pymodule in self.module_map.values():
             pymodule._forget_concluded_data()
 
     def __str__(self):
-        return 'PyCore caches %d PyModules\n' % len(self.module_map)
+        return 'PyCore caches %d PyModules, the last change invalidated ' \
+               '%d of them\n' % (len(self.module_map), self.last_invalidated)
+
+
+class _ImportCollector(object):
+    """Collect ``(modname, level)`` for the modules an AST imports"""
+
+    def __init__(self):
+        self.imports = []
+
+    def _Import(self, node):
+        for alias in node.names:
+            # `import a.b` needs the package `a`, too
+            parts = alias.name.split('.')
+            for i in range(1, len(parts) + 1):
+                self.imports.append(('.'.join(parts[:i]), 0))
+
+    def _ImportFrom(self, node):
+        modname = node.module or ''
+        level = node.level or 0
+        self.imports.append((modname, level))
+        for alias in node.names:
+            # the names might be modules of a package
+            if alias.name != '*':
+                name = alias.name
+                if modname:
+                    name = modname + '.' + name
+                self.imports.append((name, level))
 
 
 class _ExtensionCache(object):
@@ -350,13 +626,22 @@ class _ExtensionCache(object):
         return self.extensions.get(name)
 
 
-def perform_soa_on_changed_scopes(project, resource, old_contents):
+def perform_soa_on_changed_scopes(project, resource, old_contents,
+                                  changed_lines=None):
+    """Analyze the scopes of `resource` that changed
+
+    If the numbers of the changed lines of the new contents are known,
+    they can be passed as `changed_lines` and `old_contents` is not
+    compared with the new contents.
+
+    """
     pycore = project.pycore
     if resource.exists() and pycore.is_python_file(resource):
         try:
             new_contents = resource.read()
             # detecting changes in new_contents relative to old_contents
-            detector = _TextChangeDetector(new_contents, old_contents)
+            detector = _TextChangeDetector(new_contents, old_contents,
+                                           changed_lines)
             def search_subscopes(pydefined):
                 scope = pydefined.get_scope()
                 return detector.is_changed(scope.get_start(), scope.get_end())
@@ -372,22 +657,17 @@ def perform_soa_on_changed_scopes(project, resource, old_contents):
 
 class _TextChangeDetector(object):
 
-    def __init__(self, old, new):
+    def __init__(self, old, new, changed_lines=None):
         self.old = old
         self.new = new
-        self._set_diffs()
+        if changed_lines is not None:
+            self.lines = sorted(set(changed_lines))
+        else:
+            self._set_diffs()
 
     def _set_diffs(self):
-        differ = difflib.Differ()
-        self.lines = []
-        lineno = 0
-        for line in differ.compare(self.old.splitlines(True),
-                                   self.new.splitlines(True)):
-            if line.startswith(' '):
-                lineno += 1
-            elif line.startswith('-'):
-                lineno += 1
-                self.lines.append(lineno)
+        self.lines = _changed_lines(self.old.splitlines(True),
+                                    self.new.splitlines(True))
 
     def is_changed(self, start, end):
         """Tell whether any of start till end lines have changed
@@ -410,3 +690,84 @@ class _TextChangeDetector(object):
         left = bisect.bisect_left(self.lines, start)
         right = bisect.bisect_right(self.lines, end)
         return left, right
+
+
+# the number of edits after which all lines that differ are considered
+# changed, instead of searching the shortest edit script further
+_MAX_EDITS = 500
+
+
+def _changed_lines(lines1, lines2):
+    """Return the numbers of the lines of `lines1` missing in `lines2`
+
+    Line numbers start from 1.  Lines are compared by ids, the common
+    prefix and suffix and the lines that do not appear in the other
+    sequence at all are taken out, and the shortest edit script of what
+    is left is found with Myers' O(ND) algorithm.
+
+    """
+    start = 0
+    end1 = len(lines1)
+    end2 = len(lines2)
+    while start < end1 and start < end2 and lines1[start] == lines2[start]:
+        start += 1
+    while end1 > start and end2 > start and \
+          lines1[end1 - 1] == lines2[end2 - 1]:
+        end1 -= 1
+        end2 -= 1
+    ids = {}
+    ids1 = [ids.setdefault(line, len(ids)) for line in lines1[start:end1]]
+    ids2 = [ids.setdefault(line, len(ids)) for line in lines2[start:end2]]
+    common = set(ids1) & set(ids2)
+    # the indices in ids1 of the lines that might be unchanged
+    candidates = [i for i, id in enumerate(ids1) if id in common]
+    matched = _matched_indices([ids1[i] for i in candidates],
+                               [id for id in ids2 if id in common])
+    unchanged = set(candidates[i] for i in matched)
+    return [start + i + 1 for i in range(len(ids1)) if i not in unchanged]
+
+
+def _matched_indices(a, b, max_edits=_MAX_EDITS):
+    """Return the indices of `a` that are kept in the edit script to `b`
+
+    Returns an empty list if there are more than `max_edits` edits.
+
+    """
+    n = len(a)
+    m = len(b)
+    v = {1: 0}
+    trace = []
+    for d in range(min(n + m, max_edits) + 1):
+        trace.append(v.copy())
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[k] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, n, m)
+    return []
+
+
+def _backtrack(trace, x, y):
+    matched = []
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1] < v[k + 1]):
+            previous_k = k + 1
+        else:
+            previous_k = k - 1
+        previous_x = v[previous_k]
+        previous_y = previous_x - previous_k
+        while x > previous_x and y > previous_y:
+            x -= 1
+            y -= 1
+            matched.append(x)
+        x, y = previous_x, previous_y
+    return matched
@@ -85,6 +85,10 @@ class File(Resource):
             raise exceptions.ModuleDecodeError(self.path, e.reason)
 
     def read_bytes(self):
+        # fscommands may hold contents that are not written yet
+        fscommands = self.project.fscommands
+        if hasattr(fscommands, 'read'):
+            return fscommands.read(self.real_path)
         with open(self.real_path, 'rb') as fi:
             return fi.read()
 
@@ -194,15 +198,21 @@ class _ResourceMatcher(object):
         self.compiled_patterns.append(re.compile(re_pattern))
 
     def does_match(self, resource):
-        for pattern in self.compiled_patterns:
-            if pattern.match(resource.path):
-                return True
+        if self.does_match_path(resource.path):
+            return True
         path = os.path.join(resource.project.address,
                             *resource.path.split('/'))
         if os.path.islink(path):
             return True
         return False
 
+    def does_match_path(self, path):
+        """Whether the resource `path` matches one of the patterns"""
+        for pattern in self.compiled_patterns:
+            if pattern.match(path):
+                return True
+        return False
+
     @property
     def compiled_patterns(self):
         if self._compiled_patterns is None:
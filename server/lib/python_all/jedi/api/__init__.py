@@ -11,6 +11,7 @@ import os
 import warnings
 import sys
 from itertools import chain
+from contextlib import contextmanager
 
 from jedi._compatibility import unicode, builtins
 from jedi.parser import Parser, load_grammar
@@ -73,9 +74,15 @@ class Script(object):
     :param source_encoding: The encoding of ``source``, if it is not a
         ``unicode`` object (default ``'utf-8'``).
     :type encoding: str
+    :param evaluator: An evaluator to reuse, instead of creating a new one.
+        It should have a :class:`jedi.evaluate.cache.MemoizeCache`, and all
+        modules that changed since its last use have to be invalidated with
+        ``Evaluator.invalidate_module``.
+    :type evaluator: :class:`jedi.evaluate.Evaluator`
     """
     def __init__(self, source=None, line=None, column=None, path=None,
-                 encoding='utf-8', source_path=None, source_encoding=None):
+                 encoding='utf-8', source_path=None, source_encoding=None,
+                 evaluator=None):
         if source_path is not None:
             warnings.warn("Use path instead of source_path.", DeprecationWarning)
             path = source_path
@@ -103,13 +110,18 @@ class Script(object):
         self._pos = line, column
 
         cache.clear_time_caches()
+        imports.reset_search_budget()
         debug.reset_time()
         self._grammar = load_grammar('grammar%s.%s' % sys.version_info[:2])
         self._user_context = UserContext(self.source, self._pos)
         self._parser = UserContextParser(self._grammar, self.source, path,
                                          self._pos, self._user_context,
                                          self._parsed_callback)
-        self._evaluator = Evaluator(self._grammar)
+        if evaluator is None:
+            self._evaluator = Evaluator(self._grammar)
+        else:
+            self._evaluator = evaluator
+            self._evaluator.reset_recursion_limitations()
         debug.speed('init')
 
     def _parsed_callback(self, parser):
@@ -457,41 +469,106 @@ class Script(object):
 
         :rtype: list of :class:`classes.Definition`
         """
-        temp, settings.dynamic_flow_information = \
-            settings.dynamic_flow_information, False
-        try:
-            user_stmt = self._parser.user_stmt()
-            definitions = self._goto(add_import_name=True)
-            if not definitions and isinstance(user_stmt, tree.Import):
-                # For not defined imports (goto doesn't find something, we take
-                # the name as a definition. This is enough, because every name
-                # points to it.
-                name = user_stmt.name_for_position(self._pos)
-                if name is None:
-                    # Must be syntax
-                    return []
-                definitions = [name]
-
+        with self._without_dynamic_flow_information():
+            definitions = self._usages_definitions()
             if not definitions:
                 # Without a definition for a name we cannot find references.
                 return []
 
-            if not isinstance(user_stmt, tree.Import):
-                # import case is looked at with add_import_name option
-                definitions = usages.usages_add_import_modules(self._evaluator,
-                                                               definitions)
-
             module = set([d.get_parent_until() for d in definitions])
             module.add(self._parser.module())
             names = usages.usages(self._evaluator, definitions, module)
 
             for d in set(definitions):
                 names.append(classes.Definition(self._evaluator, d))
-        finally:
-            settings.dynamic_flow_information = temp
 
         return helpers.sorted_definitions(set(names))
 
+    def iter_usages(self, module_paths=()):
+        """
+        Like :meth:`usages`, but yields the usages module by module, so that
+        callers can show results before all modules are searched. The
+        current module comes first, then the modules of the definitions and
+        then the modules in `module_paths` (in the given order) which
+        contain the name. Other modules are not searched. A list is yielded
+        for every searched module, even if it is empty, and for every
+        `None` in `module_paths`, so that callers can stop between modules.
+
+        :param module_paths: paths of additional modules to search, may be
+            a generator that finds them.
+        :rtype: generator of lists of :class:`classes.Definition`
+        """
+        with self._without_dynamic_flow_information():
+            definitions = self._usages_definitions()
+        if not definitions:
+            return
+
+        search_name = unicode(list(definitions)[0])
+        compare_definitions = usages.compare_array(definitions)
+        modules = [self._parser.module()]
+        for d in definitions:
+            m = d.get_parent_until()
+            if m not in modules and not isinstance(m, compiled.CompiledObject):
+                modules.append(m)
+
+        def module_generator():
+            for m in modules:
+                yield m
+            for path in module_paths:
+                if path is None:
+                    yield None
+                    continue
+                m = imports.load_module_containing_name(self._evaluator, path,
+                                                        search_name)
+                if m is not None and m not in modules:
+                    yield m
+
+        seen = set()
+        for m in module_generator():
+            if m is None:
+                yield []
+                continue
+            with self._without_dynamic_flow_information():
+                names = usages.usages_in_module(self._evaluator, m, search_name,
+                                                compare_definitions)
+                names += [classes.Definition(self._evaluator, d)
+                          for d in definitions if d.get_parent_until() == m]
+            result = []
+            for name in helpers.sorted_definitions(set(names)):
+                key = name.module_path, name.line, name.column
+                if key not in seen:
+                    seen.add(key)
+                    result.append(name)
+            yield result
+
+    def _usages_definitions(self):
+        user_stmt = self._parser.user_stmt()
+        definitions = self._goto(add_import_name=True)
+        if not definitions and isinstance(user_stmt, tree.Import):
+            # For not defined imports (goto doesn't find something, we take
+            # the name as a definition. This is enough, because every name
+            # points to it.
+            name = user_stmt.name_for_position(self._pos)
+            if name is None:
+                # Must be syntax
+                return []
+            definitions = [name]
+
+        if definitions and not isinstance(user_stmt, tree.Import):
+            # import case is looked at with add_import_name option
+            definitions = usages.usages_add_import_modules(self._evaluator,
+                                                           definitions)
+        return definitions
+
+    @contextmanager
+    def _without_dynamic_flow_information(self):
+        temp, settings.dynamic_flow_information = \
+            settings.dynamic_flow_information, False
+        try:
+            yield
+        finally:
+            settings.dynamic_flow_information = temp
+
     def call_signatures(self):
         """
         Return the function object of the call you're currently in.
@@ -524,6 +601,20 @@ class Script(object):
         return [classes.CallSignature(self._evaluator, o.name, stmt, call_index, key_name)
                 for o in origins if hasattr(o, 'py__call__')]
 
+    def call_position(self):
+        """
+        Return where the call you're currently in starts, without evaluating
+        anything, e.g. to check whether earlier call signatures still apply.
+
+        :return: ``None`` if the cursor is not in a call, otherwise a tuple of
+            the callee's start position, the callee as a string, the index
+            of the argument at the cursor and its keyword name (or ``None``).
+        """
+        call_txt, call_index, key_name, start_pos = self._user_context.call_signature()
+        if call_txt is None:
+            return None
+        return start_pos, call_txt, call_index, key_name
+
     def _analysis(self):
         def check_types(types):
             for typ in types:
@@ -22,6 +22,7 @@ import gc
 import inspect
 import shutil
 import re
+from collections import OrderedDict
 try:
     import cPickle as pickle
 except ImportError:
@@ -33,8 +34,9 @@ from jedi import debug
 
 _time_caches = {}
 
-# for fast_parser, should not be deleted
-parser_cache = {}
+# A rough estimate of the memory a parsed module needs per line of code.
+_BYTES_PER_LINE = 1300
+_stdlib_directory = os.path.dirname(os.path.abspath(os.__file__))
 
 
 class ParserCacheItem(object):
@@ -45,6 +47,125 @@ class ParserCacheItem(object):
         self.change_time = change_time
 
 
+class ParserCache(object):
+    """
+    Maps module paths to `ParserCacheItem` objects, like a dict. Its size is
+    estimated from the number of lines of the modules. `evict` drops the least
+    recently used modules beyond :data:`jedi.settings.parser_cache_max_size`,
+    except for open documents and pinned modules. Dropped modules are loaded
+    from the pickle cache again by `load_parser`.
+    """
+    def __init__(self):
+        self._items = OrderedDict()
+        self._sizes = {}
+        self._uses = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.open_documents = set()
+        self.pinned = set()
+
+    def __getitem__(self, path):
+        try:
+            item = self._items.pop(path)
+        except KeyError:
+            self.misses += 1
+            raise
+        # Reinserting makes it the most recently used one.
+        self._items[path] = item
+        self.hits += 1
+        self._uses[path] = uses = self._uses.get(path, 0) + 1
+        if uses >= settings.parser_cache_pin_hits and path not in self.pinned:
+            self._maybe_pin(path)
+        return item
+
+    def get(self, path, default=None):
+        try:
+            return self[path]
+        except KeyError:
+            return default
+
+    def __setitem__(self, path, item):
+        self._forget(path)
+        self._items[path] = item
+        size = _estimate_size(item.parser)
+        self._sizes[path] = size
+        self.size += size
+
+    def __delitem__(self, path):
+        if path not in self._items:
+            raise KeyError(path)
+        self._forget(path)
+
+    def __contains__(self, path):
+        return path in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def _forget(self, path):
+        self._items.pop(path, None)
+        self.size -= self._sizes.pop(path, 0)
+
+    def _maybe_pin(self, path):
+        if not path or not path.startswith(_stdlib_directory + os.sep) \
+                or 'site-packages' in path or 'dist-packages' in path:
+            return
+        pinned_size = sum(self._sizes.get(p, 0) for p in self.pinned)
+        if pinned_size + self._sizes[path] <= settings.parser_cache_max_size / 2:
+            self.pinned.add(path)
+
+    def evict(self):
+        """
+        Drops the least recently used modules, until the estimated size is
+        below the limit again. Returns the paths of the dropped modules.
+        """
+        evicted = []
+        if self.size <= settings.parser_cache_max_size:
+            return evicted
+        for path in list(self._items):
+            if path in self.open_documents or path in self.pinned:
+                continue
+            self._forget(path)
+            self._uses.pop(path, None)
+            evicted.append(path)
+            if self.size <= settings.parser_cache_max_size:
+                break
+        return evicted
+
+    def clear(self):
+        self._items.clear()
+        self._sizes.clear()
+        self._uses.clear()
+        self.pinned.clear()
+        self.size = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._items),
+            'bytes': self.size,
+            'max_bytes': settings.parser_cache_max_size,
+            'pinned': len(self.pinned),
+            'open_documents': len(self.open_documents),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+        }
+
+
+def _estimate_size(parser):
+    try:
+        lines = parser.module.end_pos[0]
+    except (AttributeError, IndexError):
+        lines = 1
+    return lines * _BYTES_PER_LINE
+
+
+# for fast_parser, should not be deleted
+parser_cache = ParserCache()
+
+
 def clear_time_caches(delete_all=False):
     """ Jedi caches many things, that should be completed after each completion
     finishes.
@@ -225,7 +346,7 @@ def save_parser(path, parser, pickling=True):
 
 class ParserPickling(object):
 
-    version = 24
+    version = 26
     """
     Version number (integer) for file system cache.
 
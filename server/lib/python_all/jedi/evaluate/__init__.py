@@ -79,9 +79,11 @@ from jedi.evaluate import helpers
 
 
 class Evaluator(object):
-    def __init__(self, grammar):
+    def __init__(self, grammar, memoize_cache=None):
         self.grammar = grammar
-        self.memoize_cache = {}  # for memoize decorators
+        # for memoize decorators, see `cache.MemoizeCache` for evaluators
+        # that are used for more than one API call.
+        self.memoize_cache = {} if memoize_cache is None else memoize_cache
         # To memorize modules -> equals `sys.modules`.
         self.modules = {}  # like `sys.modules`.
         self.compiled_cache = {}  # see `compiled.create()`
@@ -89,6 +91,25 @@ class Evaluator(object):
         self.execution_recursion_detector = recursion.ExecutionRecursionDetector()
         self.analysis = []
 
+    def reset_recursion_limitations(self):
+        """
+        Resets the per-call state, needed if the evaluator is used for more
+        than one API call.
+        """
+        self.recursion_detector = recursion.RecursionDetector()
+        self.execution_recursion_detector = recursion.ExecutionRecursionDetector()
+        self.analysis = []
+
+    def invalidate_module(self, path):
+        """
+        Forgets everything that was inferred from the module at `path`,
+        because it changed. Only possible with a `cache.MemoizeCache`.
+        """
+        self.memoize_cache.invalidate_module(path)
+        for name, module in list(self.modules.items()):
+            if getattr(module, 'path', None) == path:
+                del self.modules[name]
+
     def wrap(self, element):
         if isinstance(element, tree.Class):
             return er.Class(self, element)
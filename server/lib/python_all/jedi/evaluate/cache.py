@@ -21,10 +21,18 @@ def memoize_default(default=NO_DEFAULT, evaluator_is_first_arg=False, second_arg
         def wrapper(obj, *args, **kwargs):
             if evaluator_is_first_arg:
                 cache = obj.memoize_cache
+                dependency = args[0] if args else None
             elif second_arg_is_evaluator:  # needed for meta classes
                 cache = args[0].memoize_cache
+                dependency = args[1] if len(args) > 1 else None
             else:
                 cache = obj._evaluator.memoize_cache
+                dependency = obj
+
+            key = (obj, args, frozenset(kwargs.items()))
+            if isinstance(cache, MemoizeCache):
+                return cache.call(function, key, default, dependency,
+                                  obj, args, kwargs)
 
             try:
                 memo = cache[function]
@@ -32,7 +40,6 @@ def memoize_default(default=NO_DEFAULT, evaluator_is_first_arg=False, second_arg
                 memo = {}
                 cache[function] = memo
 
-            key = (obj, args, frozenset(kwargs.items()))
             if key in memo:
                 return memo[key]
             else:
@@ -47,6 +54,143 @@ def memoize_default(default=NO_DEFAULT, evaluator_is_first_arg=False, second_arg
     return func
 
 
+class MemoizeCache(object):
+    """
+    A memoize cache for evaluators that are used for more than one API call.
+
+    Besides the memoized values, it records the paths of the modules each
+    value depends on: the module of the memoized object plus the dependencies
+    of all memoized calls made while computing the value. This way all values
+    that depend on a changed module can be dropped with `invalidate_module`,
+    while values that only depend on unchanged (library) modules are kept.
+
+    Values are dropped in least recently used order if there are more than
+    `max_entries` of them, see `evict`.
+    """
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self.tables = {}  # function -> {key: [value, dependencies, last_use]}
+        self.by_module = {}  # module path -> set of (function, key)
+        self.clock = 0
+        self._dependency_stack = []
+
+    def call(self, function, key, default, dependency, obj, args, kwargs):
+        try:
+            memo = self.tables[function]
+        except KeyError:
+            memo = self.tables[function] = {}
+
+        stack = self._dependency_stack
+        try:
+            entry = memo[key]
+        except KeyError:
+            pass
+        else:
+            entry[2] = self.clock
+            if stack:
+                stack[-1].update(entry[1])
+            return entry[0]
+
+        dependencies = set()
+        path = _module_path(dependency)
+        if path is not None:
+            dependencies.add(path)
+        entry = [default, dependencies, self.clock]
+        if default is not NO_DEFAULT:
+            memo[key] = entry
+        stack.append(dependencies)
+        try:
+            rv = function(obj, *args, **kwargs)
+            if inspect.isgenerator(rv):
+                rv = list(rv)
+            entry[0] = rv
+            memo[key] = entry
+        finally:
+            stack.pop()
+            if key in memo:
+                self._register(function, key, dependencies)
+            if stack:
+                stack[-1].update(dependencies)
+        return rv
+
+    def _register(self, function, key, dependencies):
+        for path in dependencies:
+            try:
+                self.by_module[path].add((function, key))
+            except KeyError:
+                self.by_module[path] = set([(function, key)])
+
+    def _remove(self, function, key):
+        try:
+            entry = self.tables[function].pop(key)
+        except KeyError:
+            return
+        for path in entry[1]:
+            keys = self.by_module.get(path)
+            if keys is not None:
+                keys.discard((function, key))
+                if not keys:
+                    del self.by_module[path]
+
+    def invalidate_module(self, path):
+        """Drops all values that depend on the module at `path`."""
+        for function, key in list(self.by_module.get(path, ())):
+            self._remove(function, key)
+
+    def evict(self):
+        """
+        Should be called after each API call. Starts a new period for the
+        least recently used bookkeeping and drops the least recently used
+        values, if there are more than `max_entries`.
+        """
+        self.clock += 1
+        size = len(self)
+        if size <= self.max_entries:
+            return
+        entries = sorted(((entry[2], function, key)
+                          for function, memo in self.tables.items()
+                          for key, entry in memo.items()),
+                         key=lambda e: e[0])
+        for _, function, key in entries[:size - self.max_entries * 3 // 4]:
+            self._remove(function, key)
+
+    def __len__(self):
+        return sum(len(memo) for memo in self.tables.values())
+
+    def clear(self):
+        self.tables.clear()
+        self.by_module.clear()
+
+
+# Modules of the parser tree classes, their instances can be walked up to the
+# module without evaluating anything.
+_TREE_MODULES = 'jedi.parser.tree', 'jedi.parser.fast'
+
+
+def _module_path(obj):
+    """
+    Returns the path of the module `obj` belongs to. Evaluated objects are
+    unwrapped by their attributes instead of using `get_parent_until`,
+    because that might memoize again.
+    """
+    for _ in range(100):
+        if type(obj).__module__ in _TREE_MODULES:
+            if obj.type == 'file_input':
+                return obj.path
+            obj = obj.parent
+        else:
+            attributes = getattr(obj, '__dict__', {})
+            for name in ('var', 'base', '_module'):
+                if name in attributes:
+                    obj = attributes[name]
+                    break
+            else:
+                return None
+        if obj is None:
+            return None
+    return None
+
+
 class CachedMetaClass(type):
     """
     This is basically almost the same than the decorator above, it just caches
@@ -109,7 +109,7 @@ def get_faked(module, obj, name=None):
         doc = '"""%s"""' % obj.__doc__  # TODO need escapes.
         suite = result.children[-1]
         string = pt.String(pt.zero_position_modifier, doc, (0, 0), '')
-        new_line = pt.Whitespace('\n', (0, 0), '')
+        new_line = pt.Whitespace(pt.zero_position_modifier, '\n', (0, 0), '')
         docstr_node = pt.Node('simple_stmt', [string, new_line])
         suite.children.insert(2, docstr_node)
         return result
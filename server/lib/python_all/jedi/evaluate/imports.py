@@ -15,6 +15,7 @@ import imp
 import os
 import pkgutil
 import sys
+import time
 from itertools import chain
 
 from jedi._compatibility import find_module, unicode
@@ -461,19 +462,11 @@ def add_module(evaluator, module_name, module):
         evaluator.modules[module_name] = module
 
 
-def get_modules_containing_name(evaluator, mods, name):
+def load_module_containing_name(evaluator, path, name):
     """
-    Search a name in the directories of modules.
+    Returns the module at `path`, if it is already parsed or if its source
+    contains `name`, otherwise None.
     """
-    def check_python_file(path):
-        try:
-            return cache.parser_cache[path].parser.module
-        except KeyError:
-            try:
-                return check_fs(path)
-            except IOError:
-                return None
-
     def check_fs(path):
         with open(path, 'rb') as f:
             source = source_to_unicode(f.read())
@@ -483,6 +476,19 @@ def get_modules_containing_name(evaluator, mods, name):
                 add_module(evaluator, module_name, module)
                 return module
 
+    try:
+        return cache.parser_cache[path].parser.module
+    except KeyError:
+        try:
+            return check_fs(path)
+        except IOError:
+            return None
+
+
+def get_modules_containing_name(evaluator, mods, name):
+    """
+    Search a name in the directories of modules.
+    """
     # skip non python modules
     mods = set(m for m in mods if not isinstance(m, compiled.CompiledObject))
     mod_paths = set()
@@ -492,16 +498,51 @@ def get_modules_containing_name(evaluator, mods, name):
 
     if settings.dynamic_params_for_other_modules:
         paths = set(settings.additional_dynamic_modules)
+        name_index = settings.dynamic_params_name_index
         for p in mod_paths:
             if p is not None:
                 d = os.path.dirname(p)
-                for entry in os.listdir(d):
+                if name_index is not None:
+                    entries = name_index.files_containing(d, name)
+                else:
+                    entries = (d + os.path.sep + e for e in os.listdir(d)
+                               if e.endswith('.py'))
+                for entry in entries:
                     if entry not in mod_paths:
-                        if entry.endswith('.py'):
-                            paths.add(d + os.path.sep + entry)
+                        paths.add(entry)
 
         for p in sorted(paths):
             # make testing easier, sort it - same results on every interpreter
-            c = check_python_file(p)
+            if p not in cache.parser_cache and not _search_budget.take_file():
+                debug.warning('Search budget exhausted, skipping %s', p)
+                continue
+            c = load_module_containing_name(evaluator, p, name)
             if c is not None and c not in mods and not isinstance(c, compiled.CompiledObject):
                 yield c
+
+
+class _SearchBudget(object):
+    """
+    Limits the number of modules read from the file system (and the time
+    spent on it) by `get_modules_containing_name` during one API call. See
+    `settings.dynamic_params_max_files` and `settings.dynamic_params_time_limit`.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.files = 0
+        self.start = time.time()
+
+    def take_file(self):
+        """Counts one more file read, returns False if it exceeds the budget."""
+        self.files += 1
+        return self.files <= settings.dynamic_params_max_files \
+            and time.time() - self.start <= settings.dynamic_params_time_limit
+
+
+_search_budget = _SearchBudget()
+
+
+def reset_search_budget():
+    _search_budget.reset()
@@ -17,13 +17,17 @@ complexity of the ``Parser`` (there's another parser sitting inside
 """
 import os
 import re
+import sys
+import hashlib
 
+from jedi import settings
 from jedi.parser import tree as pt
 from jedi.parser import tokenize
 from jedi.parser import token
 from jedi.parser.token import (DEDENT, INDENT, ENDMARKER, NEWLINE, NUMBER,
                                STRING, OP, ERRORTOKEN)
 from jedi.parser.pgen2.pgen import generate_grammar
+from jedi.parser.pgen2.grammar import Grammar
 from jedi.parser.pgen2.parse import PgenParser
 
 OPERATOR_KEYWORDS = 'and', 'for', 'if', 'else', 'in', 'is', 'lambda', 'not', 'or'
@@ -48,7 +52,33 @@ def load_grammar(file='grammar3.4'):
     try:
         return _loaded_grammars[path]
     except KeyError:
-        return _loaded_grammars.setdefault(path, generate_grammar(path))
+        return _loaded_grammars.setdefault(path, _grammar_tables(path))
+
+
+def _grammar_tables(path):
+    """
+    Generating the parser tables from a grammar file takes a while, so they
+    are stored in the cache directory. The stored tables are only used if
+    they were generated from a grammar file with the same hash.
+    """
+    with open(path, 'rb') as f:
+        checksum = hashlib.sha1(f.read()).hexdigest()
+    tables_path = os.path.join(settings.cache_directory,
+                               'cpython-%s%s' % sys.version_info[:2],
+                               os.path.basename(path)[:-4] + '.tables')
+
+    if settings.use_filesystem_cache:
+        grammar = Grammar()
+        if grammar.load_marshal(tables_path, checksum):
+            return grammar
+
+    grammar = generate_grammar(path)
+    if settings.use_filesystem_cache:
+        try:
+            grammar.dump_marshal(tables_path, checksum)
+        except (IOError, OSError):
+            pass
+    return grammar
 
 
 class ErrorStatement(object):
@@ -148,7 +178,12 @@ class Parser(object):
             added_newline = True
 
         # For the fast parser.
-        self.position_modifier = pt.PositionModifier()
+        if settings.compact_parse_trees:
+            self.position_modifier = pt.CompactPositionModifier()
+            self._strings = {}
+        else:
+            self.position_modifier = pt.PositionModifier()
+            self._strings = None
         p = PgenParser(grammar, self.convert_node, self.convert_leaf,
                        self.error_recovery)
         tokenizer = tokenizer or tokenize.source_tokens(source)
@@ -162,6 +197,7 @@ class Parser(object):
 
         if added_newline:
             self.remove_last_newline()
+        self._strings = None
         self.module.used_names = self._used_names
         self.module.path = module_path
         self.module.global_names = self._global_names
@@ -207,6 +243,13 @@ class Parser(object):
 
     def convert_leaf(self, grammar, type, value, prefix, start_pos):
         #print('leaf', value, pytree.type_repr(type))
+        strings = self._strings
+        if strings is not None:
+            # Most prefixes are the same few whitespace strings and names are
+            # repeated a lot, so share them between the leaves.
+            prefix = strings.setdefault(prefix, prefix)
+            if type == tokenize.NAME:
+                value = strings.setdefault(value, value)
         if type == tokenize.NAME:
             if value in grammar.keywords:
                 if value in ('def', 'class', 'lambda'):
@@ -4,6 +4,7 @@ anything changes, it only reparses the changed parts. But because it's not
 finished (and still not working as I want), I won't document it any further.
 """
 import re
+import bisect
 from itertools import chain
 
 from jedi._compatibility import use_metaclass
@@ -245,8 +246,65 @@ class FastParser(use_metaclass(CachedFastParser)):
     def _reset_caches(self):
         self.module = FastModule(self.module_path)
         self.current_node = ParserNode(self.module, self, '')
+        # The lines of the source, with a newline added at the end if needed.
+        self._lines = []
+        self._added_newline = False
+        # The parts of the last split: (first line, split state, code).
+        self._parts = []
 
     def update(self, source):
+        """
+        Reparses the module after its source changed. Only the lines that
+        differ from the previous source are split again, see `update_lines`.
+        """
+        added_newline = False
+        if not source or source[-1] != '\n':
+            # To be compatible with Pythons grammar, we need a newline at the
+            # end. The parser would handle it, but since the fast parser abuses
+            # the normal parser in various ways, we need to care for this
+            # ourselves.
+            source += '\n'
+            added_newline = True
+        lines = source.splitlines(True)
+
+        old_lines = self._lines
+        start = 0
+        end = min(len(old_lines), len(lines))
+        while start < end and old_lines[start] == lines[start]:
+            start += 1
+        old_end, new_end = len(old_lines), len(lines)
+        while old_end > start and new_end > start \
+                and old_lines[old_end - 1] == lines[new_end - 1]:
+            old_end -= 1
+            new_end -= 1
+        self._update(lines, added_newline, start, old_end - start,
+                     new_end - start)
+
+    def update_lines(self, start, old_count, new_lines):
+        """
+        Reparses the module after an edit, that replaced `old_count` lines
+        beginning at the line `start` (zero based) with `new_lines` (including
+        their line endings). This avoids comparing the whole source, if the
+        caller knows what changed.
+        """
+        lines = list(self._lines)
+        if self._added_newline:
+            lines[-1] = lines[-1][:-1]
+            if not lines[-1]:
+                lines.pop()
+        lines[start:start + old_count] = new_lines
+        new_count = len(new_lines)
+
+        added_newline = not lines or not lines[-1].endswith('\n')
+        if added_newline:
+            if lines:
+                lines[-1] += '\n'
+            else:
+                lines.append('\n')
+                new_count = 1
+        self._update(lines, added_newline, start, old_count, new_count)
+
+    def _update(self, lines, added_newline, start, old_count, new_count):
         # For testing purposes: It is important that the number of parsers used
         # can be minimized. With these variables we can test against that.
         self.number_parsers_used = 0
@@ -254,23 +312,62 @@ class FastParser(use_metaclass(CachedFastParser)):
         self.number_of_misses = 0
         self.module.reset_caches()
         try:
-            self._parse(source)
+            self._lines = lines
+            self._added_newline = added_newline
+            self._parts = self._resplit(start, old_count, new_count)
+            self._parse()
         except:
             # FastParser is cached, be careful with exceptions.
             self._reset_caches()
             raise
 
-    def _split_parts(self, source):
+    def _resplit(self, start, old_count, new_count):
+        """
+        Returns the parts of the changed source. The parts in front of the
+        changed lines are kept, the parts behind them are only shifted as
+        soon as splitting the changed lines ends at an old part boundary
+        with the same split state.
+        """
+        parts = self._parts
+        starts = [part[0] for part in parts]
+        # Whether there's a part boundary at a line depends on the lines in
+        # front of it, so start one part before the one with the first change.
+        index = max(bisect.bisect_right(starts, start) - 2, 0)
+        if index < len(parts):
+            resume_line, state = parts[index][:2]
+        else:
+            resume_line, state = 0, None
+
+        new_parts = parts[:index]
+        delta = new_count - old_count
+        changed_end = start + new_count
+        for part in self._split_parts(resume_line, state):
+            first_line = part[0]
+            if first_line >= changed_end and first_line > resume_line:
+                i = bisect.bisect_left(starts, first_line - delta)
+                if i < len(parts) and starts[i] == first_line - delta \
+                        and parts[i][1] == part[1]:
+                    new_parts += [(line + delta, s, code)
+                                  for line, s, code in parts[i:]]
+                    break
+            new_parts.append(part)
+        return new_parts
+
+    def _split_parts(self, start=0, state=None):
         """
         Split the source code into different parts. This makes it possible to
         parse each part seperately and therefore cache parts of the file and
         not everything.
+
+        Yields tuples of the first line of a part, the state of the splitter
+        at that line and the code of the part. Splitting can be resumed at any
+        of these lines with the state.
         """
         def gen_part():
             text = ''.join(current_lines)
             del current_lines[:]
             self.number_of_splits += 1
-            return text
+            return part_start, part_state, text
 
         def just_newlines(current_lines):
             for line in current_lines:
@@ -279,21 +376,25 @@ class FastParser(use_metaclass(CachedFastParser)):
                     return False
             return True
 
+        if state is None:
+            # Use -1, because that indent is always smaller than any other.
+            state = (-1, 0), False, 0, None, False
+        indent_list, new_indent, parentheses_level, flow_indent, is_decorator \
+            = state
+        indent_list = list(indent_list)
+
         # Split only new lines. Distinction between \r\n is the tokenizer's
         # job.
         # It seems like there's no problem with form feed characters here,
         # because we're not counting lines.
-        self._lines = source.splitlines(True)
         current_lines = []
-        is_decorator = False
-        # Use -1, because that indent is always smaller than any other.
-        indent_list = [-1, 0]
-        new_indent = False
-        parentheses_level = 0
-        flow_indent = None
+        part_start, part_state = start, state
         previous_line = None
         # All things within flows are simply being ignored.
-        for i, l in enumerate(self._lines):
+        for i in range(start, len(self._lines)):
+            l = self._lines[i]
+            if previous_line is None:
+                line_start = i
             # Handle backslash newline escaping.
             if l.endswith('\\\n') or l.endswith('\\\r\n'):
                 if previous_line is not None:
@@ -312,6 +413,8 @@ class FastParser(use_metaclass(CachedFastParser)):
                 current_lines.append(l)  # Just ignore comments and blank lines
                 continue
 
+            line_state = (tuple(indent_list), new_indent, parentheses_level,
+                          flow_indent, is_decorator)
             if new_indent:
                 if indent > indent_list[-2]:
                     # Set the actual indent, not just the random old indent + 1.
@@ -325,6 +428,7 @@ class FastParser(use_metaclass(CachedFastParser)):
                 new_indent = False
                 if flow_indent is None and current_lines and not parentheses_level:
                     yield gen_part()
+                    part_start, part_state = line_start, line_state
                 flow_indent = None
 
             # Check lines for functions/classes and split the code there.
@@ -338,6 +442,7 @@ class FastParser(use_metaclass(CachedFastParser)):
                     else:
                         if not is_decorator and not just_newlines(current_lines):
                             yield gen_part()
+                            part_start, part_state = line_start, line_state
                     is_decorator = '@' == m.group(1)
                     if not is_decorator:
                         parentheses_level = 0
@@ -355,32 +460,23 @@ class FastParser(use_metaclass(CachedFastParser)):
         if current_lines:
             yield gen_part()
 
-    def _parse(self, source):
-        """ :type source: str """
-        added_newline = False
-        if not source or source[-1] != '\n':
-            # To be compatible with Pythons grammar, we need a newline at the
-            # end. The parser would handle it, but since the fast parser abuses
-            # the normal parser in various ways, we need to care for this
-            # ourselves.
-            source += '\n'
-            added_newline = True
-
+    def _parse(self):
         next_line_offset = line_offset = 0
-        start = 0
-        nodes = list(self.current_node.all_sub_nodes())
+        # Old nodes by the hash of their source.
+        nodes = {}
+        for node in self.current_node.all_sub_nodes():
+            nodes.setdefault(node.hash, []).append(node)
         # Now we can reset the node, because we have all the old nodes.
         self.current_node.reset_node()
         last_end_line = 1
 
-        for code_part in self._split_parts(source):
+        for _, _, code_part in self._parts:
             next_line_offset += code_part.count('\n')
             # If the last code part parsed isn't equal to the current end_pos,
             # we know that the parser went further (`def` start in a
             # docstring). So just parse the next part.
             if line_offset + 1 == last_end_line:
-                self.current_node = self._get_node(code_part, source[start:],
-                                                   line_offset, nodes)
+                self.current_node = self._get_node(code_part, line_offset, nodes)
             else:
                 # Means that some lines where not fully parsed. Parse it now.
                 # This is a very rare case. Should only happens with very
@@ -392,20 +488,18 @@ class FastParser(use_metaclass(CachedFastParser)):
                     # make caching here possible as well. However, this is
                     # complicated and error-prone. Since this is not very often
                     # called - just ignore it.
-                    src = ''.join(self._lines[line_offset:])
-                    self.current_node = self._get_node(code_part, src,
-                                                       line_offset, nodes)
+                    self.current_node = self._get_node(code_part, line_offset,
+                                                       nodes)
                     last_end_line = self.current_node.parser.module.end_pos[0]
 
                 debug.dbg('While parsing %s, line %s slowed down the fast parser.',
                           self.module_path, line_offset + 1)
 
             line_offset = next_line_offset
-            start += len(code_part)
 
             last_end_line = self.current_node.parser.module.end_pos[0]
 
-        if added_newline:
+        if self._added_newline:
             self.current_node.remove_last_newline()
 
         # Now that the for loop is finished, we still want to close all nodes.
@@ -416,20 +510,21 @@ class FastParser(use_metaclass(CachedFastParser)):
                   % (self.module_path, self.number_parsers_used,
                      self.number_of_splits))
 
-    def _get_node(self, source, parser_code, line_offset, nodes):
+    def _get_node(self, source, line_offset, nodes):
         """
-        Side effect: Alters the list of nodes.
+        Side effect: Alters the dict of nodes.
         """
         indent = len(source) - len(source.lstrip('\t '))
         self.current_node = self.current_node.parent_until_indent(indent)
 
         h = hash(source)
-        for index, node in enumerate(nodes):
-            if node.hash == h and node.source == source:
+        for node in nodes.get(h, ()):
+            if node.source == source:
                 node.reset_node()
-                nodes.remove(node)
+                nodes[h].remove(node)
                 break
         else:
+            parser_code = ''.join(self._lines[line_offset:])
             tokenizer = FastTokenizer(parser_code)
             self.number_parsers_used += 1
             p = Parser(self._grammar, parser_code, self.module_path, tokenizer=tokenizer)
@@ -437,6 +532,9 @@ class FastParser(use_metaclass(CachedFastParser)):
             end = line_offset + p.module.end_pos[0]
             used_lines = self._lines[line_offset:end - 1]
             code_part_actually_used = ''.join(used_lines)
+            if code_part_actually_used == source:
+                # Don't keep the same code twice, `self._parts` has it, too.
+                code_part_actually_used = source
 
             node = ParserNode(self.module, p, code_part_actually_used)
 
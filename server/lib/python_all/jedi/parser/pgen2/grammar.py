@@ -17,7 +17,12 @@ fallback token code OP, but the parser needs the actual token code.
 """
 
 # Python imports
+import os
 import pickle
+import marshal
+
+# Increase this if the layout of the marshalled tables changes.
+MARSHAL_FORMAT = 1
 
 
 class Grammar(object):
@@ -96,6 +101,44 @@ class Grammar(object):
             d = pickle.load(f)
         self.__dict__.update(d)
 
+    def dump_marshal(self, filename, checksum):
+        """Dump the grammar tables to a marshal file.
+
+        The checksum identifies the grammar source the tables were
+        generated from, see load_marshal().  Marshal files are specific to
+        the Python version writing them.
+        """
+        data = (MARSHAL_FORMAT, checksum, self.__dict__)
+        directory = os.path.dirname(filename)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        # Other server processes may be loading the file at the same time.
+        temp = '%s.%s.tmp' % (filename, os.getpid())
+        with open(temp, "wb") as f:
+            marshal.dump(data, f)
+        try:
+            os.rename(temp, filename)
+        except OSError:
+            # Windows doesn't replace existing files.
+            os.remove(temp)
+
+    def load_marshal(self, filename, checksum):
+        """Load the grammar tables from a marshal file.
+
+        Returns False (leaving the tables untouched) if the file is missing,
+        damaged or was generated from a grammar source with another
+        checksum.
+        """
+        try:
+            with open(filename, "rb") as f:
+                version, file_checksum, d = marshal.load(f)
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return False
+        if version != MARSHAL_FORMAT or file_checksum != checksum:
+            return False
+        self.__dict__.update(d)
+        return True
+
     def copy(self):
         """
         Copy the grammar.
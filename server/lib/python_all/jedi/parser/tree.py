@@ -30,6 +30,7 @@ See also :attr:`Scope.subscopes` and :attr:`Scope.statements`.
 """
 import os
 import re
+from array import array
 from inspect import cleandoc
 from itertools import chain
 import textwrap
@@ -49,10 +50,44 @@ def is_node(node, *symbol_names):
 
 
 class PositionModifier(object):
-    """A start_pos modifier for the fast parser."""
+    """
+    A start_pos modifier for the fast parser.
+
+    It also stores the positions (relative to `line`) of its leaves. A leaf
+    only keeps the key returned by `add_position`; this class simply uses the
+    position tuple itself as key.
+    """
     def __init__(self):
         self.line = 0
 
+    def add_position(self, start_pos):
+        return start_pos
+
+    def get_position(self, key):
+        return key
+
+
+class CompactPositionModifier(PositionModifier):
+    """
+    Stores the positions of all leaves of a parser in two arrays, the keys are
+    indexes into them. This needs a lot less memory than a tuple per leaf.
+
+    Positions are never changed in place, because copied leaves share their
+    key with the original.
+    """
+    def __init__(self):
+        super(CompactPositionModifier, self).__init__()
+        self.lines = array('i')
+        self.columns = array('i')
+
+    def add_position(self, start_pos):
+        self.lines.append(start_pos[0])
+        self.columns.append(start_pos[1])
+        return len(self.lines) - 1
+
+    def get_position(self, key):
+        return self.lines[key], self.columns[key]
+
 
 zero_position_modifier = PositionModifier()
 
@@ -146,18 +181,28 @@ class Base(object):
 
 
 class Leaf(Base):
-    __slots__ = ('position_modifier', 'value', 'parent', '_start_pos', 'prefix')
+    __slots__ = ('position_modifier', 'value', 'parent', '_position', 'prefix')
 
     def __init__(self, position_modifier, value, start_pos, prefix=''):
         self.position_modifier = position_modifier
         self.value = value
-        self._start_pos = start_pos
+        self._position = position_modifier.add_position(start_pos)
         self.prefix = prefix
         self.parent = None
 
+    @property
+    def _start_pos(self):
+        """The position without the line offset of the position_modifier."""
+        return self.position_modifier.get_position(self._position)
+
+    @_start_pos.setter
+    def _start_pos(self, value):
+        self._position = self.position_modifier.add_position(value)
+
     @property
     def start_pos(self):
-        return self._start_pos[0] + self.position_modifier.line, self._start_pos[1]
+        line, column = self.position_modifier.get_position(self._position)
+        return line + self.position_modifier.line, column
 
     @start_pos.setter
     def start_pos(self, value):
@@ -165,12 +210,12 @@ class Leaf(Base):
 
     @property
     def end_pos(self):
-        return (self._start_pos[0] + self.position_modifier.line,
-                self._start_pos[1] + len(self.value))
+        line, column = self.position_modifier.get_position(self._position)
+        return line + self.position_modifier.line, column + len(self.value)
 
     def move(self, line_offset, column_offset):
-        self._start_pos = (self._start_pos[0] + line_offset,
-                           self._start_pos[1] + column_offset)
+        line, column = self._start_pos
+        self._start_pos = line + line_offset, column + column_offset
 
     def get_previous(self):
         """
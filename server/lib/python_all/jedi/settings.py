@@ -26,12 +26,15 @@ Filesystem cache
 
 .. autodata:: cache_directory
 .. autodata:: use_filesystem_cache
+.. autodata:: parser_cache_max_size
+.. autodata:: parser_cache_pin_hits
 
 
 Parser
 ~~~~~~
 
 .. autodata:: fast_parser
+.. autodata:: compact_parse_trees
 
 
 Dynamic stuff
@@ -41,6 +44,9 @@ Dynamic stuff
 .. autodata:: dynamic_params
 .. autodata:: dynamic_params_for_other_modules
 .. autodata:: additional_dynamic_modules
+.. autodata:: dynamic_params_name_index
+.. autodata:: dynamic_params_max_files
+.. autodata:: dynamic_params_time_limit
 .. autodata:: auto_import_modules
 
 
@@ -132,6 +138,21 @@ On Linux, if environment variable ``$XDG_CACHE_HOME`` is set,
 ``$XDG_CACHE_HOME/jedi`` is used instead of the default one.
 """
 
+parser_cache_max_size = 256 * 1024 * 1024
+"""
+The estimated memory (in bytes) the parsed modules in memory may use. The
+least recently used modules are dropped from memory beyond that, they are
+loaded from the filesystem cache again when needed. Documents that are marked
+as open in :data:`jedi.cache.parser_cache` are never dropped.
+"""
+
+parser_cache_pin_hits = 10
+"""
+Standard library modules are kept in memory for good, once they have been
+used this many times (as long as they don't use more than half of
+:data:`parser_cache_max_size`).
+"""
+
 # ----------------
 # parser
 # ----------------
@@ -143,6 +164,13 @@ something has been changed e.g. to a function. If this happens, only the
 function is being reparsed.
 """
 
+compact_parse_trees = True
+"""
+Store the positions of the leaves of a parse tree in arrays instead of a tuple
+per leaf and share equal prefixes and names between the leaves of a module.
+This reduces the memory used by the parser cache.
+"""
+
 # ----------------
 # dynamic stuff
 # ----------------
@@ -169,6 +197,26 @@ Additional modules in which |jedi| checks if statements are to be found. This
 is practical for IDEs, that want to administrate their modules themselves.
 """
 
+dynamic_params_name_index = None
+"""
+An object with a ``files_containing(directory, name)`` method, that returns
+the python files of a directory which contain a name. If set, it is used by
+the search in other modules instead of reading all files of a directory.
+This is practical for IDEs, that keep such an index anyway.
+"""
+
+dynamic_params_max_files = 30
+"""
+The maximum number of modules that are loaded from the file system while
+searching other modules, per completion.
+"""
+
+dynamic_params_time_limit = 0.3
+"""
+The maximum amount of time (in seconds) that may be spent on loading modules
+while searching other modules, per completion.
+"""
+
 dynamic_flow_information = True
 """
 Check for `isinstance` and other information to infer a type.
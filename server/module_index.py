@@ -0,0 +1,199 @@
+"""
+Keeps an index of importable module names for the interpreter running the
+server and for the project source folders. Completions inside import
+statements are answered from this index, so that directories on sys.path
+are not listed again on every keystroke.
+
+The index is a trie over dotted module paths: every package directory is a
+node, its children are the modules and packages it contains. Nodes are
+built lazily on first use and are refreshed only if the modification time
+of their directory changed.
+"""
+import os
+import re
+import sys
+import time
+import bisect
+
+try:
+    from importlib.machinery import all_suffixes
+    MODULE_SUFFIXES = tuple(all_suffixes())
+except ImportError:
+    import imp
+    MODULE_SUFFIXES = tuple(s for s, _, _ in imp.get_suffixes())
+
+# matches the part of a line in front of the cursor, if the cursor is on
+# a module path in an import statement, e.g. "import os.pa" or "from xml.d"
+IMPORT_LINE_RE = re.compile(
+    r'^\s*(?:import\s+(?:[\w.]+\s*,\s*)*|from\s+)(?P<path>[\w.]*)$')
+IDENTIFIER_RE = re.compile(r'^[A-Za-z_]\w*$')
+
+
+def import_context(line):
+    """
+    Checks whether the text in front of the cursor is a module path in an
+    import statement, that can be completed with module names only.
+
+    :param line: the text of the current line up to the cursor
+    :returns: a tuple (import_path, prefix) or None, e.g. for
+        "from os.pa" this returns (["os"], "pa")
+    """
+    match = IMPORT_LINE_RE.match(line)
+    if match is None:
+        return None
+    path = match.group('path')
+    if path.startswith('.'):
+        # relative imports are left to jedi
+        return None
+    parts = path.split('.')
+    return parts[:-1], parts[-1]
+
+
+class _PackageNode(object):
+    """
+    A node of the module trie, representing the contents of one directory.
+    """
+
+    __slots__ = ('directory', 'mtime', 'checked', 'names', 'packages')
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.mtime = None
+        self.checked = 0
+        # sorted module names, for prefix search using bisect
+        self.names = []
+        # package name -> directory of that package
+        self.packages = {}
+
+    def refresh(self, check_interval):
+        now = time.time()
+        if now - self.checked < check_interval:
+            return
+        self.checked = now
+        try:
+            mtime = os.stat(self.directory).st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self.mtime:
+            self.mtime = mtime
+            self._scan()
+
+    def _scan(self):
+        modules = set()
+        packages = {}
+        for entry, is_dir in _list_directory(self.directory):
+            if is_dir:
+                if IDENTIFIER_RE.match(entry):
+                    path = os.path.join(self.directory, entry)
+                    if _is_package(path):
+                        packages[entry] = path
+                        modules.add(entry)
+            else:
+                name = _module_name(entry)
+                if name is not None:
+                    modules.add(name)
+        self.names = sorted(modules)
+        self.packages = packages
+
+    def starting_with(self, prefix):
+        index = bisect.bisect_left(self.names, prefix)
+        while index < len(self.names) and self.names[index].startswith(prefix):
+            yield self.names[index]
+            index += 1
+
+
+class ModuleNameTrie(object):
+    """
+    Answers "which modules can be imported below this dotted path" for a list
+    of root directories (the project's source folders and sys.path).
+
+    :param check_interval: minimum number of seconds between two mtime
+        checks of the same directory
+    """
+
+    def __init__(self, check_interval=2.0):
+        self.check_interval = check_interval
+        self._nodes = {}
+
+    def _node(self, directory):
+        try:
+            node = self._nodes[directory]
+        except KeyError:
+            node = _PackageNode(directory)
+            self._nodes[directory] = node
+        node.refresh(self.check_interval)
+        return node
+
+    def _package_directories(self, roots, import_path):
+        directories = roots
+        for part in import_path:
+            next_directories = []
+            for directory in directories:
+                package_dir = self._node(directory).packages.get(part)
+                if package_dir is not None:
+                    next_directories.append(package_dir)
+            if not next_directories:
+                return []
+            directories = next_directories
+        return directories
+
+    def completions(self, roots, import_path, prefix):
+        """
+        Returns the sorted names of all modules and packages directly below
+        import_path, that start with prefix.
+
+        :param roots: the directories to search, in sys.path order
+        :param import_path: a list of package names, may be empty
+        :param prefix: the part of the module name typed so far
+        """
+        names = set()
+        if not import_path:
+            names.update(n for n in sys.builtin_module_names
+                         if n.startswith(prefix))
+        elif import_path == ['os'] and 'path'.startswith(prefix):
+            # os.path is not a real submodule, see jedi's Importer
+            names.add('path')
+
+        for directory in self._package_directories(roots, import_path):
+            names.update(self._node(directory).starting_with(prefix))
+        return sorted(names)
+
+    def forget(self, directory=None):
+        """Drops a single directory or the whole index."""
+        if directory is None:
+            self._nodes.clear()
+        else:
+            self._nodes.pop(directory, None)
+
+
+def _list_directory(directory):
+    """Yields (name, is_directory) for all entries of directory."""
+    try:
+        if hasattr(os, 'scandir'):
+            for entry in os.scandir(directory):
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                yield entry.name, is_dir
+        else:
+            for entry in os.listdir(directory):
+                yield entry, os.path.isdir(os.path.join(directory, entry))
+    except OSError:
+        return
+
+
+def _is_package(path):
+    for suffix in MODULE_SUFFIXES:
+        if os.path.isfile(os.path.join(path, '__init__' + suffix)):
+            return True
+    return False
+
+
+def _module_name(file_name):
+    for suffix in MODULE_SUFFIXES:
+        if file_name.endswith(suffix):
+            name = file_name[:-len(suffix)]
+            if IDENTIFIER_RE.match(name) and name != '__init__':
+                return name
+    return None
@@ -0,0 +1,177 @@
+"""
+An inverted index from identifiers to the python files of a directory that
+contain them. jedi's dynamic parameter search consults this index (see
+``jedi.settings.dynamic_params_name_index``) instead of reading every
+sibling file of a module on each completion.
+
+Directories are indexed incrementally: every lookup indexes at most as many
+new or changed files as fit into its time budget, so the first completions
+in a huge package stay fast and the index completes over the next requests.
+"""
+import os
+import re
+import time
+import threading
+
+IDENTIFIER_RE = re.compile(r'[A-Za-z_]\w*')
+
+
+class _DirectoryIndex(object):
+    """The index for the python files of a single directory."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.mtime = None
+        self.checked = 0
+        # file path -> (mtime, frozenset of names), None if not indexed yet
+        self.files = {}
+        # name -> set of file paths
+        self.names = {}
+        # files that still have to be (re)indexed
+        self.pending = []
+
+    def refresh(self, check_interval):
+        now = time.time()
+        if now - self.checked < check_interval:
+            return
+        self.checked = now
+
+        try:
+            mtime = os.stat(self.directory).st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self.mtime:
+            self.mtime = mtime
+            self._update_file_list()
+        # files edited outside of the editor only change their own mtime
+        for path, entry in self.files.items():
+            if entry is not None and entry[0] != _mtime(path) \
+                    and path not in self.pending:
+                self.pending.append(path)
+
+    def _update_file_list(self):
+        try:
+            entries = os.listdir(self.directory)
+        except OSError:
+            entries = []
+        current = set(os.path.join(self.directory, e)
+                      for e in entries if e.endswith('.py'))
+        for path in set(self.files) - current:
+            self.remove(path)
+        for path in sorted(current - set(self.files)):
+            self.files[path] = None
+            self.pending.append(path)
+
+    def index_pending(self, deadline):
+        while self.pending and time.time() < deadline:
+            self.index(self.pending.pop())
+
+    def index(self, path):
+        self._forget_names(path)
+        mtime = _mtime(path)
+        try:
+            with open(path, 'rb') as f:
+                source = f.read().decode('utf-8', 'replace')
+        except IOError:
+            self.files.pop(path, None)
+            return
+        names = frozenset(IDENTIFIER_RE.findall(source))
+        self.files[path] = (mtime, names)
+        for name in names:
+            self.names.setdefault(name, set()).add(path)
+
+    def remove(self, path):
+        self._forget_names(path)
+        self.files.pop(path, None)
+        if path in self.pending:
+            self.pending.remove(path)
+
+    def _forget_names(self, path):
+        entry = self.files.get(path)
+        if entry is None:
+            return
+        for name in entry[1]:
+            paths = self.names.get(name)
+            if paths is not None:
+                paths.discard(path)
+                if not paths:
+                    del self.names[name]
+
+    @property
+    def complete(self):
+        return not self.pending
+
+
+class NameIndex(object):
+    """
+    Maps names to the python files of a directory that contain them.
+
+    :param time_budget: seconds a single lookup may spend on indexing files
+    :param check_interval: minimum seconds between two mtime checks of the
+        same directory
+    """
+
+    def __init__(self, time_budget=0.05, check_interval=5.0):
+        self.time_budget = time_budget
+        self.check_interval = check_interval
+        self._directories = {}
+        self._lock = threading.Lock()
+
+    def files_containing(self, directory, name):
+        """
+        Returns the paths of the python files in directory that contain
+        name. While the directory is not completely indexed, the result only
+        covers the files indexed so far.
+        """
+        deadline = time.time() + self.time_budget
+        with self._lock:
+            index = self._directory(directory)
+            index.index_pending(deadline)
+            return sorted(index.names.get(name, ()))
+
+    def index_directory(self, directory):
+        """
+        Indexes the files of directory for up to the time budget. Returns
+        True once all of them are indexed.
+        """
+        with self._lock:
+            index = self._directory(directory)
+            index.index_pending(time.time() + self.time_budget)
+            return index.complete
+
+    def file_contains(self, path, name):
+        """Checks an already indexed file for name."""
+        with self._lock:
+            index = self._directories.get(os.path.dirname(path))
+            entry = index and index.files.get(path)
+            return entry is not None and name in entry[1]
+
+    def update_file(self, path):
+        """Reindexes a single file, e.g. after it was saved."""
+        directory = os.path.dirname(path)
+        with self._lock:
+            index = self._directories.get(directory)
+            if index is None:
+                return
+            if os.path.exists(path):
+                index.index(path)
+                if path in index.pending:
+                    index.pending.remove(path)
+            else:
+                index.remove(path)
+
+    def _directory(self, directory):
+        try:
+            index = self._directories[directory]
+        except KeyError:
+            index = _DirectoryIndex(directory)
+            self._directories[directory] = index
+        index.refresh(self.check_interval)
+        return index
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
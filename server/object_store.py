@@ -0,0 +1,236 @@
+"""
+Keeps what rope's object inference learned about the modules of a project
+(returned types of functions, parameter types, the items of containers)
+across sessions. The server's projects have no ``.ropeproject`` folder, and
+rope's own persistence pickles its whole database on every write anyway.
+
+Here every project gets a sqlite database in the cache directory with one
+record per module. Only the list of modules is read when a project is
+opened, a module's record is unpickled when rope first asks for it, and
+only the records of the modules rope added to or removed from are pickled
+and written back. Records store the modification time of their module;
+with the ``validate_objectdb`` pref, a record whose module changed while
+the server was not running is dropped when it is loaded.
+
+Refactoring tasks run rope in a background thread, so the connection is
+shared between threads and guarded by a lock.
+"""
+import os
+import sys
+import pickle
+import hashlib
+import threading
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+from rope.base.oi import objectdb, memorydb
+
+FORMAT_VERSION = 1
+
+
+class ObjectStore(object):
+    """
+    Creates the object databases of projects, to be passed to rope as the
+    ``objectdb_factory`` pref.
+
+    :param directory: the directory the databases are stored in
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def create_db(self, project):
+        if sqlite3 is None:
+            return memorydb.MemoryDB(project, persist=False)
+        try:
+            return SQLiteDB(project, self._db_path(project.address))
+        except (sqlite3.Error, OSError):
+            return memorydb.MemoryDB(project, persist=False)
+
+    def _db_path(self, root):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        # the pickled records differ between python versions
+        key = '%s:%s:%s' % (root, sys.version_info[0], FORMAT_VERSION)
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest() + '.sqlite'
+        return os.path.join(self.directory, name)
+
+
+class SQLiteDB(objectdb.FileDict):
+    """
+    A rope object database (like ``memorydb.MemoryDB``) that keeps every
+    module in its own record of a sqlite database.
+
+    :param project: the rope project
+    :param path: the path of the database file
+    """
+
+    def __init__(self, project, path):
+        self.project = project
+        self.files = self
+        self.validate = project.prefs.get('validate_objectdb', False)
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS modules '
+            '(path TEXT PRIMARY KEY, mtime REAL, scopes BLOB)')
+        self._paths = set(row[0] for row in self._connection.execute(
+            'SELECT path FROM modules'))
+        # path -> dict of the loaded scopes, and the pickle they were
+        # loaded from or last written as
+        self._scopes = {}
+        self._written = {}
+        # the loaded modules whose scopes changed since they were written
+        self._dirty = set()
+        self._removed = set()
+        self.project.data_files.add_write_hook(self.write)
+
+    def keys(self):
+        return list(self._paths)
+
+    def __contains__(self, key):
+        return key in self._paths
+
+    def __getitem__(self, key):
+        with self._lock:
+            if key not in self._paths:
+                raise KeyError(key)
+            if key not in self._scopes:
+                self._scopes[key] = self._load(key)
+            return _FileInfo(self._scopes[key], lambda: self._changed(key))
+
+    def _changed(self, path):
+        with self._lock:
+            self._dirty.add(path)
+
+    def _load(self, path):
+        row = self._connection.execute(
+            'SELECT mtime, scopes FROM modules WHERE path = ?',
+            (path,)).fetchone()
+        if row is None:
+            return {}
+        mtime, data = row
+        if self.validate and mtime != self._mtime(path):
+            self._dirty.add(path)
+            return {}
+        data = bytes(data)
+        self._written[path] = data
+        scopes = {}
+        for key, state in pickle.loads(data).items():
+            scope = scopes[key] = memorydb.ScopeInfo()
+            scope.__setstate__(state)
+        return scopes
+
+    def create(self, path):
+        with self._lock:
+            self._paths.add(path)
+            self._scopes[path] = {}
+            self._dirty.add(path)
+            self._removed.discard(path)
+
+    def rename(self, file, newfile):
+        with self._lock:
+            if file not in self._paths:
+                return
+            scopes = self._scopes.get(file)
+            if scopes is None:
+                scopes = self._load(file)
+            del self[file]
+            self.create(newfile)
+            self._scopes[newfile] = scopes
+
+    def __delitem__(self, file):
+        with self._lock:
+            self._paths.discard(file)
+            self._scopes.pop(file, None)
+            self._written.pop(file, None)
+            self._dirty.discard(file)
+            self._removed.add(file)
+
+    def write(self):
+        """Writes the records of the modules that changed since."""
+        with self._lock:
+            self._write()
+
+    def _write(self):
+        changed = []
+        for path in self._dirty:
+            scopes = self._scopes.get(path)
+            if scopes is None:
+                continue
+            state = dict((key, scope.__getstate__())
+                         for key, scope in scopes.items())
+            data = pickle.dumps(state, 2)
+            if self._written.get(path) != data:
+                changed.append((path, self._mtime(path), data))
+        if not changed and not self._removed:
+            self._dirty.clear()
+            return
+        try:
+            with self._connection:
+                self._connection.executemany(
+                    'DELETE FROM modules WHERE path = ?',
+                    [(path,) for path in self._removed])
+                self._connection.executemany(
+                    'INSERT OR REPLACE INTO modules VALUES (?, ?, ?)',
+                    [(path, mtime, sqlite3.Binary(data))
+                     for path, mtime, data in changed])
+        except sqlite3.Error:
+            return
+        self._removed.clear()
+        self._dirty.clear()
+        for path, mtime, data in changed:
+            self._written[path] = data
+
+    def _mtime(self, path):
+        # project modules are stored relative to the project root
+        if not os.path.isabs(path):
+            path = self.project._get_resource_path(path)
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return None
+
+
+class _FileInfo(memorydb.FileInfo):
+    """
+    The scopes of a module, calling changed when rope adds to or removes
+    from them.
+    """
+
+    def __init__(self, scopes, changed):
+        memorydb.FileInfo.__init__(self, scopes)
+        self._changed = changed
+
+    def create_scope(self, key):
+        memorydb.FileInfo.create_scope(self, key)
+        self._changed()
+
+    def __getitem__(self, key):
+        return _ScopeInfo(self.scopes[key], self._changed)
+
+    def __delitem__(self, key):
+        memorydb.FileInfo.__delitem__(self, key)
+        self._changed()
+
+
+class _ScopeInfo(object):
+    """A scope of a module, calling changed when rope adds to it."""
+
+    def __init__(self, scope, changed):
+        self._scope = scope
+        self._changed = changed
+
+    def __getattr__(self, name):
+        return getattr(self._scope, name)
+
+    def add_call(self, parameters, returned):
+        self._scope.add_call(parameters, returned)
+        self._changed()
+
+    def save_per_name(self, name, value):
+        self._scope.save_per_name(name, value)
+        self._changed()
@@ -0,0 +1,441 @@
+"""
+Computes rope refactorings without writing the files they change, and
+returns the changes as text edits the editor applies to its buffers.
+
+While a :class:`RefactoringBatch` is open, the project's ``fscommands`` are
+replaced by :class:`MemoryCommands`: rope reads the files through them and
+the contents its changes write are kept in memory. So the refactorings of a
+batch see the results of the ones before, and the sources of unsaved
+buffers can be refactored without saving them first.
+
+:class:`PendingChanges` keeps computed changes until they are applied, so
+they can be previewed a file at a time. Refactorings that search the whole
+project are computed by a :class:`RefactoringTask` in a background thread,
+which reports their progress and can stop them.
+"""
+import os
+import time
+import difflib
+import threading
+import traceback
+
+from rope.base import change, exceptions, libutils, taskhandle
+from rope.base.fscommands import file_data_to_unicode, unicode_to_file_data
+from rope.refactor.change_signature import (
+    ArgumentAdder, ArgumentDefaultInliner, ArgumentRemover, ArgumentReorderer
+)
+
+
+class MemoryCommands(object):
+    """
+    rope fscommands that keep the contents of written files in memory.
+    Creating, moving and removing resources is not supported.
+
+    :param fscommands: the fscommands files that were not written are read
+        with
+    """
+
+    def __init__(self, fscommands):
+        self.fscommands = fscommands
+        # real path -> contents, and the contents before the first write
+        self.contents = {}
+        self.originals = {}
+
+    def read(self, path):
+        if path in self.contents:
+            return self.contents[path]
+        return self.fscommands.read(path)
+
+    def write(self, path, data):
+        if path not in self.originals:
+            self.originals[path] = self.read(path)
+        self.contents[path] = data
+
+    def create_file(self, path):
+        self._unsupported('create', path)
+
+    def create_folder(self, path):
+        self._unsupported('create', path)
+
+    def move(self, path, new_location):
+        self._unsupported('move', path)
+
+    def remove(self, path):
+        self._unsupported('remove', path)
+
+    def _unsupported(self, operation, path):
+        raise exceptions.RopeError(
+            'Cannot %s <%s> without writing to disk' % (operation, path))
+
+
+class RefactoringBatch(object):
+    """
+    Performs refactorings one after the other in memory, to collect what
+    they change in a single ChangeSet. Must be closed, to read the files
+    from disk again.
+
+    :param project: the rope project
+    :param sources: dict of path -> source, for the files whose buffers
+        differ from the files on disk
+    """
+
+    def __init__(self, project, sources=None):
+        self.project = project
+        self.descriptions = []
+        self._fscommands = project.fscommands
+        self._commands = MemoryCommands(self._fscommands)
+        project.fscommands = self._commands
+        for path, source in (sources or {}).items():
+            self.set_source(path, source)
+
+    def set_source(self, path, source):
+        resource = libutils.path_to_resource(self.project, path)
+        data = unicode_to_file_data(source)
+        self._commands.originals[resource.real_path] = data
+        self._commands.contents[resource.real_path] = data
+        self._notify(resource)
+
+    def do(self, changes):
+        """Performs changes in memory, without adding them to the history."""
+        changes.do()
+        self.descriptions.append(changes.description)
+
+    def get_changes(self):
+        """Returns a ChangeSet of all the files the batch changed."""
+        commands = self._commands
+        changes = change.ChangeSet(' + '.join(self.descriptions))
+        for path in sorted(commands.contents):
+            if commands.contents[path] == commands.originals[path]:
+                continue
+            changes.add_change(change.ChangeContents(
+                libutils.path_to_resource(self.project, path),
+                file_data_to_unicode(commands.contents[path]),
+                file_data_to_unicode(commands.originals[path])))
+        return changes
+
+    def close(self):
+        self.project.fscommands = self._fscommands
+        # modules rope parsed from memory are parsed from disk again
+        for path in self._commands.contents:
+            self._notify(libutils.path_to_resource(self.project, path))
+
+    def _notify(self, resource):
+        for observer in list(self.project.observers):
+            observer.resource_changed(resource)
+
+
+class PendingChanges(object):
+    """
+    The changes of refactorings that were computed but not applied yet.
+
+    :param project: the rope project
+    :param changes: the ChangeSet
+    :param paths: dict of real path -> the path the client knows a file by
+    :param on_disk: whether the changes create, move or remove files, so
+        they have to be performed on disk
+    """
+
+    def __init__(self, project, changes, paths, on_disk=False):
+        self.project = project
+        self.changes = changes
+        self.paths = paths
+        self.on_disk = on_disk
+        self.last_access = time.time()
+        # changes performed on disk must not overwrite the files when they
+        # changed since
+        self.mtimes = {}
+        if on_disk:
+            self.mtimes = dict(
+                (resource.real_path, _mtime(resource.real_path))
+                for resource in changes.get_changed_resources())
+        self._leaves = list(_leaf_changes(changes))
+        self._edits = None
+
+    def edits(self):
+        """Returns the text edits by file path, see changes_to_edits."""
+        if self._edits is None:
+            self._edits = dict(
+                (self.paths.get(path, path), file_edits)
+                for path, file_edits in changes_to_edits(self.changes).items())
+        return self._edits
+
+    def summary(self):
+        """
+        Returns a dict for every change, with the "path" of its file, the
+        number of regions it changes ("hunks") and a "description". No
+        diff is built.
+        """
+        edits = self.edits()
+        result = []
+        for leaf in self._leaves:
+            path = self._client_path(leaf.resource)
+            result.append({"path": path, "hunks": len(edits.get(path, ())),
+                           "description": str(leaf)})
+        return result
+
+    def diffs(self, start, count):
+        """
+        Returns the unified diffs of count changes from the start-th, as
+        dicts with the "path" and the "diff".
+        """
+        self.last_access = time.time()
+        return [{"path": self._client_path(leaf.resource),
+                 "diff": leaf.get_description()}
+                for leaf in self._leaves[start:start + count]]
+
+    def perform(self):
+        """
+        Returns the edits the client applies, or performs the changes on
+        disk, in the format of the server's refactor_batch. Changes are not
+        performed on files that changed since they were computed.
+        """
+        if not self.on_disk:
+            return {"edits": self.edits(), "written": [], "error": None}
+        for path, mtime in sorted(self.mtimes.items()):
+            if _mtime(path) != mtime:
+                error = '<%s> changed since the preview' % \
+                    self.paths.get(path, path)
+                return {"edits": {}, "written": [], "error": error}
+        self.project.do(self.changes)
+        return {
+            "edits": {},
+            "written": sorted(self._client_path(resource) for resource in
+                              self.changes.get_changed_resources()),
+            "error": None,
+        }
+
+    def _client_path(self, resource):
+        return self.paths.get(resource.real_path, resource.real_path)
+
+
+class RefactoringTask(object):
+    """
+    Computes the changes of refactorings in a background thread, so the
+    server keeps answering other requests. rope reports the progress
+    through a TaskHandle, which also interrupts the refactorings when the
+    task is cancelled.
+
+    :param project_path: the project path the client knows the project by
+    :param compute: a function taking the TaskHandle and returning a
+        PendingChanges, or None and an error
+    """
+
+    def __init__(self, project_path, compute):
+        self.project_path = project_path
+        self.handle = taskhandle.TaskHandle('Refactoring')
+        self.pending = None
+        self.summary = None
+        self.error = None
+        self.done = False
+        self.finished = None
+        # files that were changed while rope was busy with the project
+        self.deferred_changes = []
+        self._compute = compute
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        self.handle.stop()
+
+    def progress(self):
+        """
+        Returns the name of the current job and the percentage of its job
+        set that is done, or None if it is not known.
+        """
+        job_set = self.handle.current_jobset()
+        if job_set is None:
+            return None, None
+        name = job_set.get_active_job_name() or job_set.get_name()
+        return name, job_set.get_percent_done()
+
+    def _run(self):
+        try:
+            self.pending, self.error = self._compute(self.handle)
+            if self.pending is not None:
+                # the summary is built here, not by the request thread
+                self.summary = self.pending.summary()
+        except exceptions.InterruptedTaskError:
+            self.error = 'cancelled'
+        except Exception as e:
+            traceback.print_exc()
+            self.error = str(e) or e.__class__.__name__
+        finally:
+            self.finished = time.time()
+            self.done = True
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def signature_changers(definition_info, parameters):
+    """
+    Returns the rope changers that turn the parameters of a function into
+    parameters, e.g. "a, c, b, d=None": parameters that are left out are
+    removed, new ones are added, and a removed default is inlined into the
+    calls. ``*args`` and ``**kwargs`` are not changed. Parameters without
+    defaults cannot follow ones with defaults.
+
+    :param definition_info: the ``functionutils.DefinitionInfo`` of the
+        function
+    :param parameters: the new parameter list
+    """
+    old_defaults = dict(definition_info.args_with_defaults)
+    current = [name for name, default in definition_info.args_with_defaults]
+    parsed = _parse_parameters(parameters)
+    new = [parameter for parameter in parsed
+           if not parameter[0].startswith('*')]
+    new_names = [name for name, default in new]
+    if len(set(new_names)) != len(new_names):
+        raise exceptions.RefactoringError('Duplicate parameters')
+    with_default = None
+    for name, default in parsed:
+        if name.startswith('*'):
+            # keyword only parameters may lack defaults
+            break
+        if default is not None:
+            with_default = name
+        elif with_default is not None:
+            raise exceptions.RefactoringError(
+                'Parameter <%s> without a default follows <%s>'
+                % (name, with_default))
+
+    changers = []
+    for index in reversed(range(len(current))):
+        if current[index] not in new_names:
+            changers.append(ArgumentRemover(index))
+            del current[index]
+    for name, default in new:
+        if name not in current:
+            changers.append(ArgumentAdder(len(current), name, default))
+            current.append(name)
+    order = [current.index(name) for name in new_names]
+    if order != sorted(order):
+        changers.append(ArgumentReorderer(order))
+    for index, (name, default) in enumerate(new):
+        old_default = old_defaults.get(name)
+        if name not in old_defaults or default == old_default:
+            continue
+        if default is not None:
+            raise exceptions.RefactoringError(
+                'Cannot change the default of <%s>' % name)
+        inliner = ArgumentDefaultInliner(index)
+        inliner.remove = True
+        changers.append(inliner)
+    return changers
+
+
+def _parse_parameters(parameters):
+    """Splits a parameter list into (name, default or None) tuples."""
+    result = []
+    depth = 0
+    start = 0
+    for index, char in enumerate(parameters + ','):
+        if char in '([{':
+            depth += 1
+        elif char in ')]}':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            parameter = parameters[start:index].strip()
+            start = index + 1
+            if not parameter:
+                continue
+            name, equals, default = parameter.partition('=')
+            result.append((name.strip(), default.strip() if equals else None))
+    return result
+
+
+def changes_to_edits(changes):
+    """
+    Returns the text edits of the files changes modifies, as a dict of real
+    path -> list of (offset, length, text) tuples, see :func:`text_edits`.
+    Changes that were not performed yet are compared to the current file
+    contents.
+    """
+    texts = {}
+    for leaf in _leaf_changes(changes):
+        if not isinstance(leaf, change.ChangeContents):
+            continue
+        path = leaf.resource.real_path
+        old = leaf.old_contents
+        if old is None:
+            old = leaf.resource.read()
+        # a file changed several times is compared to its first contents
+        old = texts.get(path, (old, None))[0]
+        texts[path] = (old, leaf.new_contents)
+    return dict((path, text_edits(old, new))
+                for path, (old, new) in texts.items() if old != new)
+
+
+def unsupported_changes(changes):
+    """Returns the changes that are not changes of file contents."""
+    return [leaf for leaf in _leaf_changes(changes)
+            if not isinstance(leaf, change.ChangeContents)]
+
+
+def _leaf_changes(changes):
+    if isinstance(changes, change.ChangeSet):
+        for child in changes.changes:
+            for leaf in _leaf_changes(child):
+                yield leaf
+    else:
+        yield changes
+
+
+def text_edits(old, new):
+    """
+    Returns the edits that turn old into new as (offset, length, text)
+    tuples, ordered by offset. Offsets are relative to old, so the edits
+    are applied from the last to the first. Only the lines that differ are
+    replaced, and of those only the characters that differ.
+    """
+    old_lines = old.splitlines(True)
+    new_lines = new.splitlines(True)
+    # the common first and last lines are not compared by the matcher
+    start = 0
+    while start < min(len(old_lines), len(new_lines)) and \
+            old_lines[start] == new_lines[start]:
+        start += 1
+    end = 0
+    while end < min(len(old_lines), len(new_lines)) - start and \
+            old_lines[-end - 1] == new_lines[-end - 1]:
+        end += 1
+
+    offsets = [0]
+    for line in old_lines:
+        offsets.append(offsets[-1] + len(line))
+    matcher = difflib.SequenceMatcher(
+        None, old_lines[start:len(old_lines) - end],
+        new_lines[start:len(new_lines) - end], autojunk=False)
+    edits = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        old_text = ''.join(old_lines[start + i1:start + i2])
+        new_text = ''.join(new_lines[start + j1:start + j2])
+        prefix = _common_prefix(old_text, new_text)
+        suffix = _common_suffix(old_text[prefix:], new_text[prefix:])
+        edits.append((offsets[start + i1] + prefix,
+                      len(old_text) - prefix - suffix,
+                      new_text[prefix:len(new_text) - suffix]))
+    return edits
+
+
+def _common_prefix(a, b):
+    length = 0
+    while length < min(len(a), len(b)) and a[length] == b[length]:
+        length += 1
+    return length
+
+
+def _common_suffix(a, b):
+    length = 0
+    while length < min(len(a), len(b)) and a[-length - 1] == b[-length - 1]:
+        length += 1
+    return length
@@ -1,6 +1,8 @@
 import os
+import re
 import sys
 import time
+import itertools
 import logging
 import tempfile
 import threading
@@ -27,22 +29,81 @@ sys.path.insert(
     0, os.path.join(os.path.dirname(__file__), "lib", "python_all"))
 
 import jedi
+from jedi.evaluate.sys_path import get_sys_path
 
 from rope.base import libutils
 from rope.base.project import Project
 from rope.refactor.rename import Rename
 from rope.refactor.extract import ExtractMethod
-from rope.refactor.importutils import ImportTools
-from rope.base.exceptions import ModuleSyntaxError
+from rope.refactor.move import create_move, MoveMethod
+from rope.refactor.inline import create_inline, InlineParameter
+from rope.refactor.change_signature import ChangeSignature
+from rope.refactor.introduce_parameter import IntroduceParameter
+from rope.refactor.restructure import Restructure
+from rope.refactor.importutils import (
+    ImportOrganizer, FromImport, get_module_imports
+)
+from rope.base.exceptions import (
+    ModuleSyntaxError, RopeError, InterruptedTaskError
+)
+from rope.base.taskhandle import NullTaskHandle
 from rope.contrib.codeassist import (
     get_doc, get_definition_location
 )
 
+from module_index import ModuleNameTrie, import_context
+from name_index import NameIndex
+from usage_search import UsageSearch, candidate_paths
+from completion_cache import CompletionCache, split_at_token
+from evaluator_session import EvaluatorSessions
+from signature_cache import (SignatureCache, signature_key,
+                             serialize_signature, param_index)
+from completion_ranking import FrequencyTables, base_score, rank
+from auto_import import AutoImportIndex
+from object_store import ObjectStore
+from dynamic_analysis import DynamicAnalysis
+from refactorings import (
+    RefactoringBatch, PendingChanges, RefactoringTask, signature_changers,
+    unsupported_changes
+)
+from SublimePythonIDE.pyflakes.messages import UndefinedName
+
 # global state of the server process
 last_heartbeat = None
 # constants
 HEARTBEAT_TIMEOUT = 19
 NO_ROOT_PATH = -1
+# seconds a usages call may spend searching before returning results
+USAGES_TIME_BUDGET = 0.1
+# searches that were not continued for this many seconds are dropped
+USAGES_SEARCH_TIMEOUT = 60
+# default maximum number of completion proposals sent to the editor
+COMPLETION_LIMIT = 100
+# names that are not imported yet are completed from this many characters on
+AUTO_IMPORT_MIN_PREFIX = 3
+AUTO_IMPORT_COMPLETIONS = 10
+AUTO_IMPORT_SCORE = -10
+# seconds a dynamic analysis may run, and a status call may spend storing
+# the calls it received
+DOA_TIME_BUDGET = 300
+DOA_STORE_TIME_BUDGET = 0.1
+# the error of refactorings requested while a task works on their project
+REFACTORING_RUNNING = "another refactoring of the project is running"
+# previewed refactorings that were not accessed for this many seconds are
+# dropped, as are the results of refactoring tasks nobody asked for
+REFACTORING_PREVIEW_TIMEOUT = 600
+# the folder containing this plugin and the other packages of the editor
+PACKAGES_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", ".."))
+
+
+def library_paths():
+    """
+    Returns the folders of the interpreter's sys.path, without the ones of
+    the editor packages, which contain the server and its libraries
+    """
+    return [p for p in get_sys_path() if os.path.isdir(p) and
+            not os.path.abspath(p).startswith(PACKAGES_PATH)]
 
 
 class RopeProjectMixin(object):
@@ -53,6 +114,8 @@ class RopeProjectMixin(object):
         self.projects = {}
         self.buffer_tmpfile_map = {}
         self.tempfiles = []
+        self.object_store = ObjectStore(
+            os.path.join(jedi.settings.cache_directory, "rope_objectdb"))
 
     def __del__(self):
         '''Cleanup temporary files when server is deallocated. Although
@@ -102,7 +165,11 @@ class RopeProjectMixin(object):
         return self.projects.keys()
 
     def _create_project(self, path):
-        project = Project(path, fscommands=None, ropefolder=None)
+        # what rope infers about objects is kept across sessions
+        project = Project(
+            path, fscommands=None, ropefolder=None,
+            objectdb_factory=self.object_store.create_db,
+            validate_objectdb=True)
         return project
 
     def _create_single_file_project(self, path):
@@ -136,6 +203,32 @@ class RopeFunctionsMixin(object):
     """Uses Rope to generate completion proposals, depends on RopeProjectMixin
     """
 
+    def __init__(self):
+        self.module_names = ModuleNameTrie()
+        self.completion_cache = CompletionCache()
+        self.evaluator_sessions = EvaluatorSessions()
+        self.name_index = NameIndex()
+        jedi.settings.dynamic_params_name_index = self.name_index
+        self.signature_cache = SignatureCache()
+        self.completion_frequencies = FrequencyTables(
+            os.path.join(jedi.settings.cache_directory,
+                         "completion_frequencies"))
+        self.auto_import = AutoImportIndex(
+            os.path.join(jedi.settings.cache_directory, "auto_import"),
+            library_paths())
+        # signatures are cached by document version instead of by time
+        jedi.settings.call_signatures_validity = 0.0
+        self.usage_searches = {}
+        self.usage_search_ids = itertools.count(1)
+        # project path -> DynamicAnalysis
+        self.dynamic_analyses = {}
+        # preview id -> PendingChanges; a task's changes become the preview
+        # with the task's id
+        self.refactoring_previews = {}
+        self.refactoring_preview_ids = itertools.count(1)
+        # task id -> RefactoringTask
+        self.refactoring_tasks = {}
+
     def profile_completions(self, source, project_path, file_path, loc):
         """
         Only for testing purposes::
@@ -154,7 +247,8 @@ class RopeFunctionsMixin(object):
 
         return self.completions(source, project_path, file_path, loc)
 
-    def completions(self, source, project_path, file_path, loc):
+    def completions(self, source, project_path, file_path, loc,
+                    limit=COMPLETION_LIMIT):
         """
         Get completions from the underlying Rope library and returns it back
         to the editor interface
@@ -163,31 +257,187 @@ class RopeFunctionsMixin(object):
         :param project_path: the actual project_path
         :param file_path: the actual file path
         :param loc: the buffer location
-        :returns: a list of tuples of strings
+        :param limit: the maximum number of proposals, 0 for all of them
+        :returns: a list of tuples of strings, best matches first
+        """
+
+        frequencies = self.completion_frequencies.table_for(
+            self._frequency_key(project_path, file_path))
+        if project_path != NO_ROOT_PATH:
+            self.auto_import.add_project(project_path)
+        else:
+            self.auto_import.start()
+        parts = split_at_token(source, loc)
+        proposals = self._import_completions(
+            source, project_path, file_path, loc)
+        if proposals is not None:
+            return rank(proposals, parts[1], frequencies, limit)
+
+        if parts is None:
+            proposals = self._jedi_completions(
+                source, project_path, file_path, loc)
+            return rank(proposals, "", frequencies, limit)
+
+        # completions are computed for the start of the current token and
+        # cached, so that the following keystrokes only filter them
+        before, token, after = parts
+        proposals = self.completion_cache.get(file_path, before, after)
+        if proposals is None:
+            row, col = loc
+            proposals = self._jedi_completions(
+                source, project_path, file_path, (row, col - len(token)))
+            self.completion_cache.put(file_path, before, after, proposals)
+        proposals = self.completion_cache.filter(file_path, token)
+        if len(token) >= AUTO_IMPORT_MIN_PREFIX and \
+                not before.rstrip().endswith('.'):
+            proposals = proposals + self._auto_import_completions(
+                project_path, token, proposals)
+        return rank(proposals, token, frequencies, limit)
+
+    def _auto_import_completions(self, project_path, token, proposals):
+        """Completes names that are not imported yet, but could be."""
+        root = project_path if project_path != NO_ROOT_PATH else None
+        known = set(p[1] for p in proposals)
+        return [('{0}\t(from {1})'.format(name, module), name,
+                 AUTO_IMPORT_SCORE)
+                for name, module in self.auto_import.names_starting_with(
+                    token, root, AUTO_IMPORT_COMPLETIONS)
+                if name not in known]
+
+    def import_suggestions(self, project_path, file_path, name):
+        """
+        Returns the modules that define name, in the project and in the
+        libraries on the python path.
+        """
+        root = project_path if project_path != NO_ROOT_PATH else None
+        return self.auto_import.modules_for(name, root)
+
+    def add_import(self, source, project_path, file_path, module, name):
+        """
+        Imports name from module in source, or extends an existing import
+        of module.
+
+        :returns: a string containing the source with the new import
+        """
+        if self._running_refactoring(project_path) is not None:
+            # rope is busy with the project in a refactoring task
+            return source
+        project, resource = self._get_resource(project_path, file_path, source)
+        pycore = project.pycore
+        pymodule = pycore.get_string_module(source, resource)
+        module_imports = get_module_imports(pycore, pymodule)
+        module_imports.add_import(FromImport(module, 0, [(name, None)]))
+        return module_imports.get_changed_source()
+
+    def completion_accepted(self, project_path, file_path, name):
+        """
+        Reports that the completion name was inserted, which ranks it higher
+        in the following completions of the project.
         """
+        self.completion_frequencies.record(
+            self._frequency_key(project_path, file_path), name)
 
+    def _frequency_key(self, project_path, file_path):
+        if project_path != NO_ROOT_PATH:
+            return project_path
+        if file_path and not file_path.startswith("BUFFER:"):
+            return os.path.dirname(os.path.abspath(file_path))
+        return ""
+
+    def _jedi_completions(self, source, project_path, file_path, loc):
         project, resource = self._get_resource(project_path, file_path, source)
 
+        session = self.evaluator_sessions.session_for(project_path)
         try:
             row, col = loc
             row += 1
-            script = jedi.Script(source, row, col, file_path)
+            script = session.script(source, row, col, file_path)
             proposals = script.completions()
+            proposals = [
+                (self._proposal_string(p), self._insert_string(p),
+                 base_score(p, script.path, row))
+                for p in proposals if p.name != 'self='
+            ]
         except ModuleSyntaxError:
             proposals = []
         except Exception:
             import traceback
             traceback.print_exc()
             proposals = []
-        finally:
-            proposals = [
-                (self._proposal_string(p), self._insert_string(p))
-                for p in proposals if p.name != 'self='
-            ]
 
+        session.finish_request()
+        self.evaluator_sessions.evict_parsers()
         jedi.cache.clear_time_caches()
         return proposals
 
+    def _import_completions(self, source, project_path, file_path, loc):
+        """
+        Completes module paths in import statements from the module name
+        index, without running jedi. Returns None if the cursor is not on
+        such a module path.
+        """
+        row, col = loc
+        lines = source.splitlines()
+        if row >= len(lines):
+            return None
+        context = import_context(lines[row][:col])
+        if context is None:
+            return None
+
+        import_path, prefix = context
+        roots = []
+        if file_path and not file_path.startswith("BUFFER:"):
+            roots.append(os.path.dirname(os.path.abspath(file_path)))
+        if project_path != NO_ROOT_PATH:
+            roots.append(project_path)
+        roots.extend(p for p in library_paths() if p not in roots)
+
+        names = self.module_names.completions(roots, import_path, prefix)
+        return [('{0}\t(module)'.format(name), name, 0) for name in names]
+
+    def call_signatures(self, source, project_path, file_path, loc):
+        """
+        Get the signatures of the call the cursor is in
+
+        :param source: the document source
+        :param project_path: the actual project_path
+        :param file_path: the actual file path
+        :param loc: the buffer location as (row, col)
+        :returns: a list of dicts with the "name" of the callee, its "params"
+            as strings like "b=2" or "*args", its "doc" and the "index" of
+            the active parameter (-1 if there is none)
+        """
+        row, col = loc
+        session = self.evaluator_sessions.session_for(project_path)
+        try:
+            script = session.script(source, row + 1, col, file_path)
+            call = script.call_position()
+        except Exception:
+            import traceback
+            traceback.print_exc()
+            call = None
+        if call is None:
+            return []
+        call_start, call_text, index, key_name = call
+
+        key = signature_key(file_path, source, loc, call_start, call_text)
+        signatures = self.signature_cache.get(key)
+        if signatures is None:
+            try:
+                signatures = [serialize_signature(s)
+                              for s in script.call_signatures()]
+            except Exception:
+                import traceback
+                traceback.print_exc()
+                signatures = []
+            session.finish_request()
+            self.evaluator_sessions.evict_parsers()
+            jedi.cache.clear_time_caches()
+            self.signature_cache.put(key, signatures)
+
+        return [dict(s, index=param_index(s["params"], index, key_name))
+                for s in signatures]
+
     def documentation(self, source, project_path, file_path, loc):
         """
         Search for documentation about the word in the current location
@@ -198,6 +448,8 @@ class RopeFunctionsMixin(object):
         :param loc: the buffer location
         :returns: a string containing the documentation
         """
+        if self._running_refactoring(project_path) is not None:
+            return None
 
         project, resource = self._get_resource(project_path, file_path, source)
 
@@ -218,6 +470,8 @@ class RopeFunctionsMixin(object):
         :param loc: the buffer location
         :returns: a tuple containing the path and the line number
         """
+        if self._running_refactoring(project_path) is not None:
+            return None, None
 
         project, resource = self._get_resource(project_path, file_path, source)
 
@@ -232,6 +486,137 @@ class RopeFunctionsMixin(object):
 
         return real_path, def_lineno
 
+    def usages(self, source, project_path, file_path, loc):
+        """
+        Starts a search for the usages of the name at loc. The usages in the
+        current file are returned right away, the other files of the project
+        are searched by subsequent calls to usages_next.
+
+        :param source: the document source
+        :param project_path: the actual project_path
+        :param file_path: the actual file path
+        :param loc: the buffer location as (row, col)
+        :returns: a dict with the search "id", the "usages" found so far as
+            (path, line, column, text) tuples and whether the search is "done"
+        """
+        now = time.time()
+        for search_id, search in list(self.usage_searches.items()):
+            if now - search.last_access > USAGES_SEARCH_TIMEOUT:
+                del self.usage_searches[search_id]
+
+        project, resource = self._get_resource(project_path, file_path, source)
+        row, col = loc
+        name = self._name_at(source, row, col)
+        if name is None:
+            return {"id": None, "usages": [], "done": True}
+
+        def python_files():
+            if self._running_refactoring(project_path) is not None:
+                # rope is busy with the project in a refactoring task, only
+                # the folder of the current file is searched
+                return [resource.real_path]
+            return [r.real_path for r in project.pycore.get_python_files()]
+
+        script = jedi.Script(source, row + 1, col, file_path)
+        candidates = candidate_paths(
+            name, resource.real_path, python_files, self.name_index)
+        search = UsageSearch(script, file_path, source, candidates)
+        search_id = next(self.usage_search_ids)
+        self.usage_searches[search_id] = search
+        return self.usages_next(search_id)
+
+    def usages_next(self, search_id):
+        """
+        Continues a search started by usages and returns the usages found
+        since the last call, in the same format as usages.
+        """
+        search = self.usage_searches.get(search_id)
+        if search is None:
+            return {"id": search_id, "usages": [], "done": True}
+        try:
+            results = search.next_results(USAGES_TIME_BUDGET)
+        except Exception:
+            import traceback
+            traceback.print_exc()
+            search.done = True
+            results = []
+        if search.done:
+            del self.usage_searches[search_id]
+            self.evaluator_sessions.evict_parsers()
+        return {"id": search_id, "usages": results, "done": search.done}
+
+    def usages_cancel(self, search_id):
+        """Drops a running usages search."""
+        self.usage_searches.pop(search_id, None)
+
+    def run_dynamic_analysis(self, project_path, args,
+                             time_budget=DOA_TIME_BUDGET):
+        """
+        Starts running an entry point of the project, e.g. its tests, under
+        rope's dynamic object analysis, which records the types of the
+        arguments and return values of the calls of project functions. The
+        calls are stored by subsequent calls to dynamic_analysis_status.
+
+        :param project_path: the actual project path
+        :param args: a python file of the project and its arguments, or
+            "-m", a module and its arguments, e.g. ["-m", "pytest"]
+        :param time_budget: the seconds after which the process is stopped
+        :returns: False if there's no project or its analysis still runs
+        """
+        if project_path == NO_ROOT_PATH:
+            return False
+        if project_path in self.dynamic_analyses:
+            return False
+        project, _ = self.project_for(project_path, "")
+        analysis = DynamicAnalysis(project, args, time_budget)
+        analysis.start()
+        self.dynamic_analyses[project_path] = analysis
+        return True
+
+    def dynamic_analysis_status(self, project_path):
+        """
+        Stores the calls the dynamic analysis of the project received, for
+        a limited time, and reports its progress.
+
+        :returns: a dict with the number of calls "received" and "stored",
+            the "seconds" the analysis runs and whether it is "done"
+        """
+        analysis = self.dynamic_analyses.get(project_path)
+        if analysis is None:
+            return {"received": 0, "stored": 0, "seconds": 0, "done": True}
+        # the calls are stored once a refactoring task of the project ends
+        busy = self._running_refactoring(project_path) is not None
+        if not busy:
+            analysis.store(DOA_STORE_TIME_BUDGET)
+        done = not busy and analysis.done
+        if done:
+            del self.dynamic_analyses[project_path]
+            # inferred objects are computed again with the new information
+            analysis.project.pycore.module_cache.forget_all_data()
+            analysis.project.sync()
+            self.completion_cache.invalidate()
+        return {
+            "received": analysis.received,
+            "stored": analysis.stored,
+            "seconds": int(time.time() - analysis.started),
+            "done": done,
+        }
+
+    def dynamic_analysis_stop(self, project_path):
+        """Stops the process of the dynamic analysis of the project."""
+        analysis = self.dynamic_analyses.get(project_path)
+        if analysis is not None:
+            analysis.stop()
+
+    def _name_at(self, source, row, col):
+        lines = source.splitlines()
+        if row >= len(lines):
+            return None
+        for match in re.finditer(r'[A-Za-z_]\w*', lines[row]):
+            if match.start() <= col <= match.end():
+                return match.group()
+        return None
+
     def report_changed(self, project_path, file_path):
         """
         Reports the change of the contents of file_path.
@@ -240,21 +625,93 @@ class RopeFunctionsMixin(object):
         :param file_path: the file path
         """
 
+        # a saved module may change the completions in any other file
+        self.completion_cache.invalidate()
+        self.signature_cache.invalidate()
+        if not file_path.startswith("BUFFER:"):
+            self.name_index.update_file(file_path)
+            self.evaluator_sessions.invalidate(file_path)
+            self.auto_import.update_file(file_path)
+
         if project_path != NO_ROOT_PATH:
+            task = self._running_refactoring(project_path)
+            if task is not None:
+                # rope is busy with the project in the task's thread
+                task.deferred_changes.append(file_path)
+                return
             project, file_path = self.project_for(project_path, file_path)
             libutils.report_change(project, file_path, "")
+            # writes the object information that changed
+            project.sync()
 
-    def rename(self, project_path, file_path, loc, source, new_name):
-        project, resource = self._get_resource(project_path, file_path, source)
-        rename = Rename(project, resource, loc)
-        changes = rename.get_changes(new_name, in_hierarchy=True)
-        project.do(changes)
+    def document_closed(self, project_path, file_path):
+        """
+        Reports that file_path was closed in the editor, so its parse tree
+        may be dropped from memory.
+        """
+        self.completion_cache.invalidate(file_path)
+        self.evaluator_sessions.document_closed(file_path)
+        self.completion_frequencies.save()
 
-    def extract_method(self, project_path, file_path, start, end, source, new_name):
-        project, resource = self._get_resource(project_path, file_path, source)
-        rename = ExtractMethod(project, resource, start, end)
-        changes = rename.get_changes(new_name)
-        project.do(changes)
+    def parser_cache_stats(self):
+        """
+        Returns the number of entries, the estimated size in bytes and the
+        hit rate of jedi's parser cache, as a dict.
+        """
+        return jedi.cache.parser_cache.stats()
+
+    def module_cache_stats(self, project_path):
+        """
+        Returns the number of modules rope caches for a project, how many
+        changes were reported and how many cached modules they invalidated
+        in total and the last time, how many modules were looked up and how
+        long that took, and how often the source folders were searched, as
+        a dict.
+        """
+        if project_path not in self.projects:
+            return {}
+        pycore = self.projects[project_path].pycore
+        module_cache = pycore.module_cache
+        return {
+            "modules": len(module_cache.module_map),
+            "invalidations": module_cache.invalidations,
+            "invalidated_modules": module_cache.invalidated_modules,
+            "last_invalidated": module_cache.last_invalidated,
+            "find_module_calls": pycore.find_module_calls,
+            "find_module_seconds": pycore.find_module_time,
+            "source_folder_scans": pycore.source_folder_scans,
+        }
+
+    def rename(self, project_path, file_path, loc, source, new_name,
+               sources=None):
+        """
+        Renames the name at loc throughout the project.
+
+        :param project_path: the actual project path
+        :param file_path: the actual file path
+        :param loc: the offset of the name in source
+        :param source: the document source
+        :param new_name: the new name
+        :param sources: dict of file path -> source, for the other unsaved
+            buffers
+        :returns: the changes, see refactor_batch
+        """
+        return self._refactor(project_path, [{
+            "type": "rename", "file_path": file_path, "offset": loc,
+            "new_name": new_name,
+        }], self._with_source(sources, file_path, source))
+
+    def extract_method(self, project_path, file_path, start, end, source,
+                       new_name, sources=None):
+        """
+        Extracts the code between start and end into a new method.
+
+        :returns: the changes, see refactor_batch
+        """
+        return self._refactor(project_path, [{
+            "type": "extract_method", "file_path": file_path,
+            "start": start, "end": end, "new_name": new_name,
+        }], self._with_source(sources, file_path, source))
 
     def organize_imports(self, source, project_path, file_path):
         """
@@ -263,14 +720,312 @@ class RopeFunctionsMixin(object):
         :param source: the document source
         :param project_path: the actual project_path
         :param file_path: the actual file path
-        :returns: a string containing the source with imports fully organized
+        :returns: the changes, see refactor_batch
+        """
+        return self._refactor(project_path, [{
+            "type": "organize_imports", "file_path": file_path,
+        }], {file_path: source})
+
+    def refactor_batch(self, project_path, operations, sources=None):
+        """
+        Performs renames, method extractions and import organizations one
+        after the other, each on the results of the ones before, without
+        writing any file.
+
+        :param project_path: the actual project path
+        :param operations: a list of dicts with the "type" of refactoring,
+            "rename", "extract_method" or "organize_imports", the
+            "file_path", the "new_name", and the "offset" of the name to
+            rename or the "start" and "end" of the code to extract, in the
+            contents the operations before leave. The types refactor_start
+            computes are accepted too: "move" to a "destination" module
+            path, relative to the project, or to the attribute a method is
+            moved to; "inline" with optional "remove" and "only_current";
+            "change_signature" with the new "parameters" list, e.g.
+            "a, c, b=None", and optional "in_hierarchy";
+            "introduce_parameter" with its "new_name"; and "restructure"
+            with a "pattern", a "goal" and optional "args" and "imports"
+        :param sources: dict of file path -> source, for the unsaved buffers
+        :returns: a dict with the "edits" of the changed files, as file path
+            -> list of (offset, length, text) tuples, the files that were
+            "written" instead, and the "error" that stopped the batch, in
+            which case nothing is changed
+        """
+        return self._refactor(project_path, operations, sources or {})
+
+    def refactor_preview(self, project_path, operations, sources=None):
+        """
+        Computes refactorings like refactor_batch, but keeps their changes
+        until refactor_preview_apply or refactor_preview_discard is called,
+        for up to REFACTORING_PREVIEW_TIMEOUT seconds without an access.
+        Only a summary is returned, the diffs of the changed files are
+        returned by refactor_preview_diffs.
+
+        :returns: a dict with the preview "id", the "files" it changes, as
+            dicts with the "path", the number of changed regions ("hunks")
+            and a "description", and the "error" that stopped the
+            refactorings, in which case there is no preview
+        """
+        now = time.time()
+        for preview_id, pending in list(self.refactoring_previews.items()):
+            if now - pending.last_access > REFACTORING_PREVIEW_TIMEOUT:
+                del self.refactoring_previews[preview_id]
+
+        if self._running_refactoring(project_path) is not None:
+            return {"id": None, "files": [], "error": REFACTORING_RUNNING}
+        pending, error = self._pending_changes(
+            project_path, operations, sources or {})
+        if error is not None:
+            return {"id": None, "files": [], "error": error}
+        preview_id = next(self.refactoring_preview_ids)
+        self.refactoring_previews[preview_id] = pending
+        return {"id": preview_id, "files": pending.summary(), "error": None}
+
+    def refactor_preview_diffs(self, preview_id, start, count):
+        """
+        Returns the unified diffs of count files of a preview, from the
+        start-th, as dicts with the "path" and the "diff".
+        """
+        pending = self.refactoring_previews.get(preview_id)
+        if pending is None:
+            return []
+        return pending.diffs(start, count)
+
+    def refactor_preview_apply(self, preview_id):
+        """
+        Applies the changes of a preview.
+
+        :returns: the changes, see refactor_batch
+        """
+        pending = self.refactoring_previews.pop(preview_id, None)
+        if pending is None:
+            return {"edits": {}, "written": [],
+                    "error": "the preview expired"}
+        return self._perform(pending)
+
+    def refactor_preview_discard(self, preview_id):
+        """Drops the changes of a preview."""
+        self.refactoring_previews.pop(preview_id, None)
+
+    def refactor_start(self, project_path, operations, sources=None):
+        """
+        Starts computing refactorings like refactor_preview, but in a
+        background thread, for refactorings that search the whole project:
+        "move", "inline", "change_signature", "introduce_parameter" and
+        "restructure". Their progress is reported by refactor_status.
+
+        :returns: a dict with the task "id" and the "error" that prevents
+            starting it
         """
+        now = time.time()
+        for task_id, task in list(self.refactoring_tasks.items()):
+            if task.done and \
+                    now - task.finished > REFACTORING_PREVIEW_TIMEOUT:
+                self._finish_refactoring(task_id)
+
+        if self._running_refactoring(project_path) is not None:
+            return {"id": None, "error": REFACTORING_RUNNING}
+        sources = sources or {}
+
+        def compute(task_handle):
+            return self._pending_changes(
+                project_path, operations, sources, task_handle)
+        task_id = next(self.refactoring_preview_ids)
+        task = RefactoringTask(project_path, compute)
+        self.refactoring_tasks[task_id] = task
+        task.start()
+        return {"id": task_id, "error": None}
+
+    def refactor_status(self, task_id):
+        """
+        Reports the progress of a refactoring task.
+
+        :returns: a dict with the name of the current "job", the "percent"
+            of the refactoring that is done (None if not known), whether
+            the task is "done", and once it is, the "preview" of its
+            changes, as returned by refactor_preview
+        """
+        task = self.refactoring_tasks.get(task_id)
+        if task is None:
+            return {"job": None, "percent": None, "done": True, "preview": {
+                "id": None, "files": [], "error": "the refactoring expired"}}
+        job, percent = task.progress()
+        if not task.done:
+            return {"job": job, "percent": percent, "done": False,
+                    "preview": None}
+        self._finish_refactoring(task_id)
+        if task.error is not None:
+            preview = {"id": None, "files": [], "error": task.error}
+        else:
+            task.pending.last_access = time.time()
+            self.refactoring_previews[task_id] = task.pending
+            preview = {"id": task_id, "files": task.summary, "error": None}
+        return {"job": job, "percent": percent, "done": True,
+                "preview": preview}
+
+    def refactor_cancel(self, task_id):
+        """Stops a refactoring task, at the next file rope looks at."""
+        task = self.refactoring_tasks.get(task_id)
+        if task is not None:
+            task.cancel()
+
+    def change_signature_parameters(self, source, project_path, file_path,
+                                    loc):
+        """
+        Returns the parameter list of the function at loc, to be changed
+        by a "change_signature" refactoring, or None.
+        """
+        if self._running_refactoring(project_path) is not None:
+            return None
         project, resource = self._get_resource(project_path, file_path, source)
-        pycore = project.pycore
-        import_tools = ImportTools(pycore)
-        pymodule = pycore.resource_to_pyobject(resource)
-        organized_source = import_tools.organize_imports(pymodule)
-        return organized_source
+        batch = RefactoringBatch(project, {resource.real_path: source})
+        try:
+            signature = ChangeSignature(project, resource, loc)
+            return signature.get_definition_info().arguments_to_string()
+        except RopeError:
+            return None
+        finally:
+            batch.close()
+
+    def _running_refactoring(self, project_path):
+        for task in self.refactoring_tasks.values():
+            if task.project_path == project_path and not task.done:
+                return task
+        return None
+
+    def _finish_refactoring(self, task_id):
+        task = self.refactoring_tasks.pop(task_id)
+        for file_path in task.deferred_changes:
+            self.report_changed(task.project_path, file_path)
+
+    def _refactor(self, project_path, operations, sources):
+        if self._running_refactoring(project_path) is not None:
+            return {"edits": {}, "written": [], "error": REFACTORING_RUNNING}
+        pending, error = self._pending_changes(
+            project_path, operations, sources)
+        if error is not None:
+            return {"edits": {}, "written": [], "error": error}
+        return self._perform(pending)
+
+    def _perform(self, pending):
+        try:
+            return pending.perform()
+        except (RopeError, IOError, OSError) as e:
+            return {"edits": {}, "written": [], "error": str(e)}
+
+    def _pending_changes(self, project_path, operations, sources,
+                         task_handle=None):
+        """
+        Computes the changes of refactorings in memory, with sources as the
+        contents of the files. Returns a PendingChanges, or None and the
+        error that stopped the refactorings.
+        """
+        if task_handle is None:
+            task_handle = NullTaskHandle()
+        if not operations:
+            return None, "no refactoring"
+        first_path = operations[0]["file_path"]
+        project, _ = self.project_for(
+            project_path, first_path, sources.get(first_path, ""))
+        # real path -> the path the client knows the file by
+        client_paths = {}
+
+        def resource_for(file_path):
+            file_project, path = self.project_for(
+                project_path, file_path, sources.get(file_path, ""))
+            if file_project is not project:
+                return None
+            resource = libutils.path_to_resource(project, path)
+            client_paths[resource.real_path] = file_path
+            return resource
+
+        batch = RefactoringBatch(project)
+        try:
+            for file_path, source in sources.items():
+                resource = resource_for(file_path)
+                if resource is not None:
+                    batch.set_source(resource.real_path, source)
+            for index, operation in enumerate(operations):
+                try:
+                    resource = resource_for(operation["file_path"])
+                    if resource is None:
+                        raise RopeError("file is not in the project")
+                    changes = self._refactoring_changes(
+                        project, resource, operation, task_handle)
+                    if changes is None:
+                        continue
+                    if len(operations) == 1 and unsupported_changes(changes):
+                        # e.g. renaming a module moves its file, a single
+                        # refactoring doing so is performed on disk
+                        return PendingChanges(
+                            project, changes, client_paths, on_disk=True), None
+                    batch.do(changes)
+                except InterruptedTaskError:
+                    return None, "cancelled"
+                except (RopeError, KeyError, ValueError) as e:
+                    return None, "operation %d (%s): %s" % (
+                        index + 1, operation.get("type"), e)
+            return PendingChanges(
+                project, batch.get_changes(), client_paths), None
+        finally:
+            batch.close()
+
+    def _refactoring_changes(self, project, resource, operation,
+                             task_handle):
+        kind = operation["type"]
+        if kind == "rename":
+            rename = Rename(project, resource, operation["offset"])
+            return rename.get_changes(operation["new_name"], in_hierarchy=True,
+                                      task_handle=task_handle)
+        if kind == "extract_method":
+            extract = ExtractMethod(
+                project, resource, operation["start"], operation["end"])
+            return extract.get_changes(operation["new_name"])
+        if kind == "organize_imports":
+            return ImportOrganizer(project).organize_imports(resource)
+        if kind == "move":
+            # a module, a global class or function is moved to the module
+            # or package at "destination", a method to the attribute
+            move = create_move(project, resource, operation.get("offset"))
+            if isinstance(move, MoveMethod):
+                return move.get_changes(
+                    operation["destination"], operation.get("new_name"),
+                    task_handle=task_handle)
+            destination = os.path.join(
+                project.address, operation["destination"])
+            return move.get_changes(
+                libutils.path_to_resource(project, destination),
+                task_handle=task_handle)
+        if kind == "inline":
+            inline = create_inline(project, resource, operation["offset"])
+            if isinstance(inline, InlineParameter):
+                return inline.get_changes(task_handle=task_handle)
+            return inline.get_changes(
+                remove=operation.get("remove", True),
+                only_current=operation.get("only_current", False),
+                task_handle=task_handle)
+        if kind == "change_signature":
+            signature = ChangeSignature(project, resource, operation["offset"])
+            changers = signature_changers(
+                signature.get_definition_info(), operation["parameters"])
+            return signature.get_changes(
+                changers, in_hierarchy=operation.get("in_hierarchy", False),
+                task_handle=task_handle)
+        if kind == "introduce_parameter":
+            introduce = IntroduceParameter(
+                project, resource, operation["offset"])
+            return introduce.get_changes(operation["new_name"])
+        if kind == "restructure":
+            restructure = Restructure(
+                project, operation["pattern"], operation["goal"],
+                args=operation.get("args"), imports=operation.get("imports"))
+            return restructure.get_changes(task_handle=task_handle)
+        raise ValueError("unknown refactoring %r" % kind)
+
+    def _with_source(self, sources, file_path, source):
+        sources = dict(sources or {})
+        sources[file_path] = source
+        return sources
 
     def _proposal_string(self, p):
         """
@@ -317,7 +1072,8 @@ class LinterMixin(object):
     Performs a PyFlakes and PEP8 check on the input code, returns either a
     list of messages or a single syntax error in case of an error while
     parsing the code. The receiver thus has to check for these two
-    cases.
+    cases. Undefined names get the modules they can be imported from as
+    import_suggestions, which depends on RopeFunctionsMixin.
     """
 
     def check_syntax(self, code, encoding, lint_settings, filename):
@@ -325,6 +1081,11 @@ class LinterMixin(object):
         but uses the linters directy.'''
         try:
             codes = do_linting(lint_settings, code, encoding, filename)
+            root = self.auto_import.root_for(filename)
+            for error in codes:
+                if isinstance(error, UndefinedName):
+                    error.import_suggestions = self.auto_import.modules_for(
+                        error.message_args[0], root)
         except Exception:
             import traceback
             sys.stderr.write(traceback.format_exc())
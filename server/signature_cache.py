@@ -0,0 +1,133 @@
+"""
+Caches call signatures (parameter hints). While the cursor moves between
+the arguments of a call or the arguments are typed, the callee stays the
+same, so its signatures are taken from the cache and only the index of the
+active parameter is computed again, which needs no evaluation.
+
+Signatures are cached by document, the start of the callee and a version of
+the document, which is the checksum of its source without the argument list
+of the call. So moving the cursor between the arguments keeps the version,
+and any edit outside of the argument list (including the callee itself)
+leads to a new evaluation.
+"""
+import zlib
+from collections import OrderedDict
+
+
+def _offset(lines, row, col):
+    return sum(len(l) for l in lines[:row]) + col
+
+
+def _arguments_end(source, start, cursor):
+    """
+    Returns the offset after the ")" that closes the first bracket from
+    start, or the end of the line of the cursor if the call is not closed.
+    """
+    depth = 0
+    quote = None
+    i = start
+    while i < len(source):
+        c = source[i]
+        if quote is not None:
+            if c == '\\':
+                i += 1
+            elif c == quote:
+                quote = None
+        elif c in '"\'':
+            quote = c
+        elif c == '#':
+            i = source.find('\n', i)
+            if i < 0:
+                break
+        elif c in '([{':
+            depth += 1
+        elif c in ')]}':
+            depth -= 1
+            if depth <= 0:
+                return i + 1
+        i += 1
+    end = source.find('\n', cursor)
+    return len(source) if end < 0 else end
+
+
+def signature_key(file_path, source, loc, call_start, call_text):
+    """
+    Returns the cache key for the signatures of a call.
+
+    :param loc: the cursor position as (row, col)
+    :param call_start: the start position of the callee as jedi reports it,
+        (line, col) with lines starting at 1
+    :param call_text: the callee as a string
+    """
+    lines = source.splitlines(True)
+    start = _offset(lines, call_start[0] - 1, call_start[1])
+    cursor = _offset(lines, loc[0], loc[1])
+    # the arguments start at the first bracket after the callee
+    callee_end = start
+    if source.startswith(call_text, start):
+        callee_end += len(call_text)
+    paren = source.find('(', callee_end, cursor + 1)
+    end = _arguments_end(source, paren if paren >= 0 else cursor, cursor)
+    outside = source[:start] + source[end:]
+    version = zlib.adler32(outside.encode("utf-8"))
+    return file_path, tuple(call_start), call_text, version
+
+
+def serialize_signature(signature):
+    """Converts a jedi CallSignature to a dict that XML-RPC can transfer."""
+    return {
+        "name": signature.name,
+        "params": [p.description for p in signature.params],
+        "doc": signature.docstring(),
+    }
+
+
+def param_index(params, index, key_name):
+    """
+    Finds the active parameter like jedi's ``CallSignature.index``.
+
+    :param params: the parameter descriptions, e.g. ["a", "b=2", "*args"]
+    :param index: the index of the argument at the cursor
+    :param key_name: the keyword of that argument or None
+    :returns: the parameter index or -1 if there's no matching parameter
+    """
+    names = [p.split('=', 1)[0].lstrip('*') for p in params]
+    if key_name is not None:
+        if key_name in names:
+            return names.index(key_name)
+        if params and params[-1].startswith('**'):
+            return len(params) - 1
+        return -1
+
+    if index >= len(params):
+        for i, param in enumerate(params):
+            if param.startswith('*') and not param.startswith('**'):
+                return i
+        return -1
+    return index
+
+
+class SignatureCache(object):
+    """
+    Maps signature keys (see :func:`signature_key`) to lists of serialized
+    signatures, keeping the most recently used max_entries of them.
+    """
+
+    def __init__(self, max_entries=100):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        signatures = self._entries.pop(key, None)
+        if signatures is not None:
+            self._entries[key] = signatures
+        return signatures
+
+    def put(self, key, signatures):
+        self._entries.pop(key, None)
+        self._entries[key] = signatures
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self):
+        self._entries.clear()
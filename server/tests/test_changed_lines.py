@@ -0,0 +1,83 @@
+import os
+import sys
+import random
+import difflib
+import unittest
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(__file__), "..", "lib", "python%d" % sys.version_info[0]))
+
+from rope.base.pycore import _changed_lines
+
+
+def differ_changed_lines(lines1, lines2):
+    """The changed lines as rope found them with difflib.Differ"""
+    result = []
+    lineno = 0
+    for line in difflib.Differ().compare(lines1, lines2):
+        if line.startswith(' '):
+            lineno += 1
+        elif line.startswith('-'):
+            lineno += 1
+            result.append(lineno)
+    return result
+
+
+def lcs_length(lines1, lines2):
+    lengths = [0] * (len(lines2) + 1)
+    for line in lines1:
+        previous = 0
+        for j, other in enumerate(lines2):
+            current = lengths[j + 1]
+            if line == other:
+                lengths[j + 1] = previous + 1
+            else:
+                lengths[j + 1] = max(lengths[j + 1], lengths[j])
+            previous = current
+    return lengths[-1]
+
+
+def edited(rng, lines, new_line):
+    lines = list(lines)
+    for _ in range(rng.randint(0, 8)):
+        i = rng.randint(0, len(lines))
+        op = rng.random()
+        if op < 0.4:
+            lines.insert(i, new_line())
+        elif lines and op < 0.7:
+            del lines[min(i, len(lines) - 1)]
+        elif lines:
+            lines[min(i, len(lines) - 1)] = new_line()
+    return lines
+
+
+class ChangedLinesTest(unittest.TestCase):
+
+    def test_same_as_differ_for_unique_lines(self):
+        rng = random.Random(0)
+        fresh = iter(range(1000000))
+        for _ in range(500):
+            old = ['line %d\n' % i for i in range(rng.randint(0, 60))]
+            new = edited(rng, old, lambda: 'new %d\n' % next(fresh))
+            self.assertEqual(_changed_lines(old, new),
+                             differ_changed_lines(old, new))
+
+    def test_keeps_a_longest_common_subsequence(self):
+        rng = random.Random(1)
+        for _ in range(500):
+            pool = ['line %d\n' % i for i in range(rng.choice([3, 10, 50]))]
+            old = [rng.choice(pool) for _ in range(rng.randint(0, 40))]
+            new = edited(rng, old, lambda: rng.choice(pool))
+            changed = _changed_lines(old, new)
+            kept = [line for i, line in enumerate(old)
+                    if i + 1 not in changed]
+            # the kept lines appear in new in the same order
+            remaining = iter(new)
+            self.assertTrue(all(line in remaining for line in kept))
+            self.assertEqual(len(kept), lcs_length(old, new))
+            self.assertTrue(
+                len(changed) <= len(differ_changed_lines(old, new)))
+
+
+if __name__ == "__main__":
+    unittest.main()
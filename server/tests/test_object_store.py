@@ -0,0 +1,76 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(
+    os.path.dirname(__file__), "..", "lib", "python%d" % sys.version_info[0]))
+
+from rope.base.project import Project
+
+from object_store import SQLiteDB
+
+
+class SQLiteDBTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        with open(os.path.join(self.folder, "a.py"), "w") as f:
+            f.write("def f(x):\n    return x\n")
+        self.project = Project(self.folder, ropefolder=None)
+        self.path = os.path.join(self.folder, "objectdb.sqlite")
+
+    def tearDown(self):
+        self.project.close()
+        shutil.rmtree(self.folder)
+
+    def open_db(self):
+        db = SQLiteDB(self.project, self.path)
+        self.addCleanup(db._connection.close)
+        return db
+
+    def test_changes_are_written(self):
+        db = self.open_db()
+        db.create("a.py")
+        db["a.py"].create_scope("f")
+        db["a.py"]["f"].add_call(("int",), "int")
+        db["a.py"]["f"].save_per_name("x", "int")
+        db.write()
+
+        scope = self.open_db()["a.py"]["f"]
+        self.assertEqual(scope.get_returned(("int",)), "int")
+        self.assertEqual(scope.get_per_name("x"), "int")
+
+    def test_only_changed_modules_are_pickled(self):
+        db = self.open_db()
+        db.create("a.py")
+        db.create("b.py")
+        db["a.py"].create_scope("f")
+        db["b.py"].create_scope("g")
+        db.write()
+
+        db = self.open_db()
+        db["a.py"]["f"].get_returned(("int",))
+        db["b.py"]["g"].add_call(("str",), "str")
+        self.assertEqual(db._dirty, set(["b.py"]))
+        db.write()
+        self.assertEqual(db._dirty, set())
+        self.assertEqual(
+            self.open_db()["b.py"]["g"].get_returned(("str",)), "str")
+
+    def test_removed_scopes_are_written(self):
+        db = self.open_db()
+        db.create("a.py")
+        db["a.py"].create_scope("f")
+        db.write()
+
+        db = self.open_db()
+        del db["a.py"]["f"]
+        db.write()
+        self.assertEqual(self.open_db()["a.py"].keys(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import os
+import sys
+import random
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(
+    os.path.dirname(__file__), "..", "lib", "python%d" % sys.version_info[0]))
+
+from rope.base import libutils
+from rope.base.exceptions import RefactoringError
+from rope.base.project import Project
+from rope.refactor.change_signature import ChangeSignature
+from rope.refactor.rename import Rename
+
+from refactorings import (
+    RefactoringBatch, changes_to_edits, signature_changers, text_edits
+)
+
+
+def apply_text_edits(text, edits):
+    for offset, length, new_text in reversed(edits):
+        text = text[:offset] + new_text + text[offset + length:]
+    return text
+
+
+def random_text(rng, lines):
+    pool = ['', 'x = 1', 'def f(a, b):', '    return a + b', 'y = f(1, 2)',
+            'pass', '# comment', 'z = x']
+    return ''.join(rng.choice(pool) + rng.choice(['\n', '\n', '\r\n', ''])
+                   for _ in range(lines))
+
+
+class TextEditsTest(unittest.TestCase):
+
+    def test_edits_turn_old_into_new(self):
+        rng = random.Random(0)
+        for _ in range(1000):
+            old = random_text(rng, rng.randint(0, 15))
+            if rng.random() < 0.5:
+                new = random_text(rng, rng.randint(0, 15))
+            else:
+                # a few characters changed, as after a refactoring
+                chars = list(old)
+                for _ in range(rng.randint(0, 4)):
+                    i = rng.randint(0, len(chars))
+                    chars[i:i + rng.randint(0, 3)] = rng.choice(
+                        ['', 'a', 'new_name', '\n'])
+                new = ''.join(chars)
+            edits = text_edits(old, new)
+            self.assertEqual(apply_text_edits(old, edits), new)
+            # ordered by offset and not overlapping
+            for (offset, length, _), (next_offset, _, _) in \
+                    zip(edits, edits[1:]):
+                self.assertTrue(offset + length <= next_offset)
+
+    def test_only_the_changed_characters_are_replaced(self):
+        old = 'a = 1\nb = value\nc = 3\n'
+        new = 'a = 1\nb = new_value\nc = 3\n'
+        self.assertEqual(text_edits(old, new), [(10, 0, 'new_')])
+        self.assertEqual(text_edits(old, old), [])
+
+
+class RefactoringTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.project = Project(self.folder, ropefolder=None)
+
+    def tearDown(self):
+        self.project.close()
+        shutil.rmtree(self.folder)
+
+    def write(self, name, source):
+        path = os.path.join(self.folder, name)
+        with open(path, 'w') as f:
+            f.write(source)
+        return path
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+
+class RefactoringBatchTest(RefactoringTestCase):
+
+    def test_refactorings_are_collected_in_memory(self):
+        mod = self.write('mod.py', 'def f(a):\n    return a\n')
+        use = self.write('use.py', 'from mod import f\nf(1)\n')
+        batch = RefactoringBatch(self.project)
+        try:
+            resource = libutils.path_to_resource(self.project, mod)
+            batch.do(Rename(self.project, resource, 4).get_changes('g'))
+            batch.do(Rename(self.project, resource, 6).get_changes('b'))
+            changes = batch.get_changes()
+        finally:
+            batch.close()
+
+        self.assertEqual(self.read(mod), 'def f(a):\n    return a\n')
+        edits = changes_to_edits(changes)
+        self.assertEqual(sorted(edits), sorted([mod, use]))
+        self.assertEqual(apply_text_edits(self.read(mod), edits[mod]),
+                         'def g(b):\n    return b\n')
+        self.assertEqual(apply_text_edits(self.read(use), edits[use]),
+                         'from mod import g\ng(1)\n')
+
+    def test_unsaved_sources_are_refactored(self):
+        mod = self.write('mod.py', 'def f(a):\n    return a\n')
+        source = 'def f(a):\n    return a * 2\n'
+        batch = RefactoringBatch(self.project, {mod: source})
+        try:
+            resource = libutils.path_to_resource(self.project, mod)
+            batch.do(Rename(self.project, resource, 6).get_changes('b'))
+            edits = changes_to_edits(batch.get_changes())
+        finally:
+            batch.close()
+        self.assertEqual(apply_text_edits(source, edits[mod]),
+                         'def f(b):\n    return b * 2\n')
+
+
+class SignatureChangersTest(RefactoringTestCase):
+
+    def change_signature(self, parameters):
+        mod = self.write(
+            'mod.py', 'def f(a, b, c=3):\n    return a\n\nf(1, 2)\n')
+        resource = libutils.path_to_resource(self.project, mod)
+        changer = ChangeSignature(self.project, resource, 4)
+        changers = signature_changers(changer.get_definition_info(),
+                                      parameters)
+        changes = changer.get_changes(changers)
+        return apply_text_edits(self.read(mod), changes_to_edits(changes)[mod])
+
+    def test_parameters_are_reordered_added_and_removed(self):
+        self.assertEqual(self.change_signature('b, a, d=None'),
+                         'def f(b, a, d=None):\n    return a\n\nf(2, 1)\n')
+
+    def test_removed_defaults_are_inlined(self):
+        self.assertEqual(self.change_signature('a, b, c'),
+                         'def f(a, b, c):\n    return a\n\nf(1, 2, 3)\n')
+
+    def test_parameters_without_defaults_cannot_follow_defaults(self):
+        self.assertRaises(RefactoringError, self.change_signature, 'a, c=3, b')
+        self.assertRaises(RefactoringError, self.change_signature, 'a, a')
+
+
+if __name__ == "__main__":
+    unittest.main()
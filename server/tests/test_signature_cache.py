@@ -0,0 +1,40 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from signature_cache import signature_key
+
+
+class SignatureKeyTest(unittest.TestCase):
+
+    source = "def f(a, b, c): pass\nf(1, 2, 3)\n"
+
+    def key(self, source, col):
+        return signature_key("m.py", source, (1, col), (2, 0), "f")
+
+    def test_cursor_moves_inside_the_call_keep_the_key(self):
+        keys = [self.key(self.source, col) for col in (2, 5, 8)]
+        self.assertEqual(keys[0], keys[1])
+        self.assertEqual(keys[0], keys[2])
+
+    def test_edits_inside_the_call_keep_the_key(self):
+        edited = self.source.replace("f(1, 2, 3)", "f(1, (x + 2), ')')")
+        self.assertEqual(self.key(self.source, 2), self.key(edited, 2))
+
+    def test_unclosed_call_ignores_the_rest_of_the_line(self):
+        source = "def f(a, b, c): pass\nf(1, 2\n"
+        self.assertEqual(self.key(source, 2), self.key(source, 5))
+        self.assertEqual(self.key(source, 2),
+                         self.key(source.replace("2\n", "2, 3\n"), 2))
+
+    def test_edits_outside_the_call_change_the_key(self):
+        edited = self.source.replace("def f(a, b, c)", "def f(a, b, d)")
+        self.assertNotEqual(self.key(self.source, 5), self.key(edited, 5))
+        edited = self.source + "x = 1\n"
+        self.assertNotEqual(self.key(self.source, 5), self.key(edited, 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
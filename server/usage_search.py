@@ -0,0 +1,98 @@
+"""
+Incremental find-usages searches. A search is started by one RPC call and
+continued by further calls, each of which returns the usages found since
+the previous one. This way the client can show the usages in the current
+file right away, while the rest of the project is still being searched.
+The files that may use the name are found while searching, too, a little
+at a time.
+"""
+import os
+import time
+import linecache
+
+
+class UsageSearch(object):
+    """
+    Wraps jedi's ``Script.iter_usages`` generator.
+
+    :param script: the jedi Script, positioned on the name to search
+    :param file_path: the path (or buffer name) of the current file
+    :param source: the source of the current file
+    :param candidate_paths: an iterable of other python files that might
+        use the name, in the order they should be searched
+    """
+
+    def __init__(self, script, file_path, source, candidate_paths):
+        self.file_path = file_path
+        self.script_path = script.path
+        self.lines = source.splitlines()
+        self.last_access = time.time()
+        self.done = False
+        self._first = True
+        self._usages = script.iter_usages(candidate_paths)
+        linecache.checkcache()
+
+    def next_results(self, time_budget):
+        """
+        Returns the usages found within time_budget seconds, as a list of
+        (path, line, column, line text) tuples. At least one module is
+        searched per call, so the time budget may be exceeded. The first
+        call only searches the current module.
+        """
+        self.last_access = time.time()
+        deadline = self.last_access + time_budget
+        results = []
+        while not self.done:
+            try:
+                usages = next(self._usages)
+            except StopIteration:
+                self.done = True
+                break
+            results.extend(self._serialize(u) for u in usages)
+            if self._first or time.time() > deadline:
+                break
+        self._first = False
+        return results
+
+    def _serialize(self, usage):
+        path = usage.module_path
+        if path is None or path == self.script_path:
+            path = self.file_path
+            try:
+                text = self.lines[usage.line - 1]
+            except IndexError:
+                text = ""
+        else:
+            text = linecache.getline(path, usage.line)
+        return path, usage.line, usage.column, text.strip()
+
+
+def candidate_paths(name, file_path, python_files, name_index):
+    """
+    Yields the python files that contain name, except file_path, directory
+    by directory. Files that also contain the module name of file_path
+    (probably importing it) come first, the others after all directories
+    were indexed. None is yielded whenever the name index spent its time
+    budget on a directory, so the search can stop in between.
+
+    :param python_files: a callable returning the python files of the project
+    :param name_index: a :class:`name_index.NameIndex`
+    """
+    module_name = os.path.splitext(os.path.basename(file_path))[0]
+    if module_name == "__init__":
+        module_name = os.path.basename(os.path.dirname(file_path))
+
+    directories = sorted(set(os.path.dirname(p) for p in python_files()))
+    others = []
+    for directory in directories:
+        while not name_index.index_directory(directory):
+            yield None
+        for path in name_index.files_containing(directory, name):
+            if path == file_path:
+                continue
+            if name_index.file_contains(path, module_name):
+                yield path
+            else:
+                others.append(path)
+    for path in others:
+        yield path
@@ -1,3 +1,7 @@
+import os
+import re
+import html
+
 import sublime
 import sublime_plugin
 
@@ -5,25 +9,78 @@ from SublimePythonIDE.sublime_python import proxy_for, root_folder_for,\
     get_setting, file_or_buffer_name, GOTO_STACK, python_only
 
 
+class CompletionState(object):
+
+    '''The last completion results of a view, and the request in flight'''
+
+    def __init__(self):
+        self.word_start = None
+        self.prefix = None
+        self.change_count = None
+        self.proposals = []
+        self.requesting = False
+        # whether a query arrived while a prefetch was in flight
+        self.queried = False
+
+    def matches(self, word_start, prefix):
+        return (self.word_start == word_start and
+                prefix.lower().startswith(self.prefix.lower()))
+
+    def filtered(self, prefix):
+        '''the proposals containing the characters of prefix in order,
+        which is how the server matches them'''
+        prefix = prefix.lower()
+        if prefix == self.prefix.lower():
+            return self.proposals
+        match = re.compile('.*?'.join(re.escape(c) for c in prefix)).search
+        return [p for p in self.proposals if match(p[1].lower())]
+
+
+# contains the CompletionState for each view, by view id
+COMPLETION_STATES = {}
+
+# matches the text in front of the cursor, if completions should be
+# prefetched there: after "obj.", "call(", "import " and "from x import "
+PREFETCH_TRIGGER_RE = re.compile(
+    r'(?:(?:[A-Za-z_]\w*|[)\]])\.|\(|^\s*import\s+|'
+    r'^\s*from\s+[\w.]+\s+import\s+)$')
+
+
 class PythonCompletionsListener(sublime_plugin.EventListener):
 
     '''Retrieves completion proposals from external Python
-    processes running Rope'''
+    processes running Rope.
+
+    Completions never block the UI thread: a query is answered from the
+    last results for the current word (filtered by the typed prefix),
+    while fresh results are requested in the background. When those
+    arrive, the completion popup is triggered again.'''
 
     @python_only
     def on_query_completions(self, view, prefix, locations):
-        path = file_or_buffer_name(view)
-        source = view.substr(sublime.Region(0, view.size()))
-        loc = view.rowcol(locations[0])
-        # t0 = time.time()
-        proxy = proxy_for(view)
-        if not proxy:
-            return []
-        proposals = proxy.completions(source, root_folder_for(view), path, loc)
-        # proposals = (
-        #   proxy.profile_completions(source, root_folder_for(view), path, loc)
-        # )
-        # print("+++", time.time() - t0)
+        state = COMPLETION_STATES.setdefault(view.id(), CompletionState())
+        word_start = locations[0] - len(prefix)
+        proposals = []
+        if state.matches(word_start, prefix):
+            proposals = state.filtered(prefix)
+            if state.change_count == view.change_count():
+                # results are fresh, most likely this is the retrigger
+                return self.completion_result(proposals)
+
+        if not state.requesting:
+            state.requesting = True
+            path = file_or_buffer_name(view)
+            source = view.substr(sublime.Region(0, view.size()))
+            loc = view.rowcol(locations[0])
+            request = (word_start, prefix, view.change_count())
+            sublime.set_timeout_async(
+                lambda: self.request_completions(
+                    view, state, request, source, path, loc), 0)
+        else:
+            state.queried = True
+        return self.completion_result(proposals)
+
+    def completion_result(self, proposals):
         if proposals:
             completion_flags = (
                 sublime.INHIBIT_WORD_COMPLETIONS |
@@ -32,6 +89,110 @@ class PythonCompletionsListener(sublime_plugin.EventListener):
             return (proposals, completion_flags)
         return proposals
 
+    @python_only
+    def on_modified_async(self, view):
+        '''prefetches the completions after a trigger like "obj." was
+        typed, so they are ready when the completion popup asks for them'''
+        if not get_setting("python_completion_prefetch", view, True):
+            return
+        sel = view.sel()
+        if len(sel) != 1 or not sel[0].empty():
+            return
+        point = sel[0].b
+        line = view.substr(sublime.Region(view.line(point).a, point))
+        if not PREFETCH_TRIGGER_RE.search(line):
+            return
+        if view.score_selector(point - 1, "string, comment"):
+            return
+        state = COMPLETION_STATES.setdefault(view.id(), CompletionState())
+        if state.requesting:
+            # a prefetch has a lower priority than a real request
+            return
+        state.requesting = True
+        path = file_or_buffer_name(view)
+        source = view.substr(sublime.Region(0, view.size()))
+        request = (point, "", view.change_count())
+        self.request_completions(view, state, request, source, path,
+                                 view.rowcol(point), retrigger=False)
+
+    def request_completions(self, view, state, request, source, path, loc,
+                            retrigger=True):
+        try:
+            proxy = proxy_for(view)
+            if not proxy:
+                return
+            # t0 = time.time()
+            limit = get_setting("python_completion_limit", view, 100)
+            proposals = proxy.completions(
+                source, root_folder_for(view), path, loc, limit)
+            # proposals = (
+            #   proxy.profile_completions(source, root_folder_for(view), path, loc)
+            # )
+            # print("+++", time.time() - t0)
+        finally:
+            state.requesting = False
+
+        state.word_start, state.prefix, state.change_count = request
+        state.proposals = proposals or []
+        # a query answered while a prefetch was in flight is shown again
+        retrigger = retrigger or state.queried
+        state.queried = False
+        if retrigger:
+            sublime.set_timeout(lambda: self.retrigger(view, state), 0)
+
+    def retrigger(self, view, state):
+        '''shows the popup again, if the cursor is still in the completed word'''
+        sel = view.sel()
+        if len(sel) == 0 or not sel[0].empty():
+            return
+        point = sel[0].b
+        word_start = point
+        while word_start > 0 and (view.substr(word_start - 1).isalnum() or
+                                  view.substr(word_start - 1) == "_"):
+            word_start -= 1
+        if word_start != state.word_start:
+            return
+        prefix = view.substr(sublime.Region(word_start, point))
+        if not state.matches(word_start, prefix):
+            return
+        view.run_command("hide_auto_complete")
+        view.run_command("auto_complete", {
+            "disable_auto_insert": True,
+            "next_completion_if_showing": False
+        })
+
+    @python_only
+    def on_post_text_command(self, view, command_name, args):
+        '''reports inserted completions to the server, which ranks the
+        names used most often higher'''
+        if command_name not in ("commit_completion",
+                                "insert_best_completion"):
+            return
+        sel = view.sel()
+        if len(sel) == 0:
+            return
+        name = view.substr(view.word(sel[0].b))
+        if not name.isidentifier():
+            return
+        proxy = proxy_for(view)
+        if not proxy:
+            return
+        root, path = root_folder_for(view), file_or_buffer_name(view)
+        sublime.set_timeout_async(
+            lambda: proxy.completion_accepted(root, path, name), 0)
+
+    def on_close(self, view):
+        state = COMPLETION_STATES.pop(view.id(), None)
+        if state is None:
+            return
+        # only views that requested completions are known to the server
+        proxy = proxy_for(view)
+        if not proxy:
+            return
+        root, path = root_folder_for(view), file_or_buffer_name(view)
+        sublime.set_timeout_async(
+            lambda: proxy.document_closed(root, path), 0)
+
     @python_only
     def on_post_save_async(self, view, *args):
         proxy = proxy_for(view)
@@ -41,6 +202,148 @@ class PythonCompletionsListener(sublime_plugin.EventListener):
         proxy.report_changed(root_folder_for(view), path)
 
 
+class PythonDynamicAnalysisCommand(sublime_plugin.WindowCommand):
+    '''
+    Runs the command set in "python_dynamic_analysis_command" (usually the
+    tests of the project) under rope's dynamic object analysis, so rope
+    learns the types of arguments and return values from the actual calls.
+    The progress is shown in the status bar. With stop=True, stops the
+    running analysis instead.
+    '''
+
+    def run(self, stop=False):
+        self.run_for(self.window.active_view(), stop)
+
+    @python_only
+    def run_for(self, view, stop):
+        proxy = proxy_for(view)
+        if not proxy:
+            return
+        root = root_folder_for(view)
+        if stop:
+            sublime.set_timeout_async(
+                lambda: proxy.dynamic_analysis_stop(root), 0)
+            return
+
+        args = get_setting(
+            "python_dynamic_analysis_command", view, ["-m", "pytest"])
+        time_budget = get_setting(
+            "python_dynamic_analysis_time_budget", view, 300)
+
+        def start():
+            if not proxy.run_dynamic_analysis(root, args, time_budget):
+                sublime.status_message(
+                    "Dynamic analysis is already running or there is "
+                    "no project")
+                return
+            self.poll(view, proxy, root)
+        sublime.set_timeout_async(start, 0)
+
+    def poll(self, view, proxy, root):
+        status = proxy.dynamic_analysis_status(root)
+        if status["done"]:
+            view.erase_status("python_dynamic_analysis")
+            sublime.status_message(
+                "Dynamic analysis finished, %i calls recorded"
+                % status["stored"])
+            return
+        view.set_status(
+            "python_dynamic_analysis",
+            "Dynamic analysis... (%is, %i calls)"
+            % (status["seconds"], status["received"]))
+        sublime.set_timeout_async(lambda: self.poll(view, proxy, root), 500)
+
+
+class PythonCallSignaturesListener(sublime_plugin.EventListener):
+
+    '''Shows the signature of the called function in a popup, when "(" or
+    "," is typed in a call, and updates the highlighted parameter while the
+    cursor moves between the arguments.'''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # views that currently show a signature popup, by view id
+        self.showing = set()
+
+    @python_only
+    def on_modified_async(self, view):
+        if not get_setting("python_call_signatures", view, True):
+            return
+        sel = view.sel()
+        if len(sel) != 1 or not sel[0].empty():
+            return
+        if view.substr(sel[0].b - 1) in "(," or view.id() in self.showing:
+            self.request_signatures(view)
+
+    @python_only
+    def on_selection_modified_async(self, view):
+        if view.id() in self.showing:
+            self.request_signatures(view)
+
+    def on_close(self, view):
+        self.showing.discard(view.id())
+
+    def request_signatures(self, view):
+        proxy = proxy_for(view)
+        if not proxy:
+            return
+        sel = view.sel()
+        if len(sel) == 0:
+            return
+        loc = view.rowcol(sel[0].b)
+        source = view.substr(sublime.Region(0, view.size()))
+        change_count = view.change_count()
+        signatures = proxy.call_signatures(
+            source, root_folder_for(view), file_or_buffer_name(view), loc)
+        sublime.set_timeout(
+            lambda: self.show(view, signatures, change_count), 0)
+
+    def show(self, view, signatures, change_count):
+        if view.change_count() != change_count:
+            # outdated, another request follows
+            return
+        if not signatures:
+            self.hide(view)
+            return
+        if not hasattr(view, "show_popup"):
+            # Sublime Text builds before 3070 have no popups
+            view.set_status("python_call_signature",
+                            self.plain_text(signatures[0]))
+            self.showing.add(view.id())
+            return
+        content = "<br>".join(self.html(s) for s in signatures)
+        if view.is_popup_visible():
+            view.update_popup(content)
+        else:
+            view.show_popup(content, max_width=640,
+                            on_hide=lambda: self.showing.discard(view.id()))
+        self.showing.add(view.id())
+
+    def hide(self, view):
+        if view.id() not in self.showing:
+            return
+        self.showing.discard(view.id())
+        if hasattr(view, "hide_popup"):
+            view.hide_popup()
+        else:
+            view.erase_status("python_call_signature")
+
+    def html(self, signature):
+        params = []
+        for i, param in enumerate(signature["params"]):
+            param = html.escape(param)
+            if i == signature["index"]:
+                param = "<b>%s</b>" % param
+            params.append(param)
+        return "%s(%s)" % (html.escape(signature["name"]), ", ".join(params))
+
+    def plain_text(self, signature):
+        params = list(signature["params"])
+        if 0 <= signature["index"] < len(params):
+            params[signature["index"]] = "[%s]" % params[signature["index"]]
+        return "%s(%s)" % (signature["name"], ", ".join(params))
+
+
 class PythonGetDocumentationCommand(sublime_plugin.WindowCommand):
 
     '''Retrieves the docstring for the identifier under the cursor and
@@ -174,3 +477,108 @@ class PythonGoBackCommand(sublime_plugin.WindowCommand):
             file_name, lineno, colno = GOTO_STACK.pop()
             path = "%s:%d:%d" % (file_name, lineno, colno)
             self.window.open_file(path, sublime.ENCODED_POSITION)
+
+
+class PythonFindUsagesCommand(sublime_plugin.WindowCommand):
+    '''
+    Finds the usages of the identifier under the cursor, project-wide.
+    Usages are shown in a quick panel, which is updated while the server
+    is still searching.
+    '''
+
+    @python_only
+    def run(self, *args):
+        view = self.window.active_view()
+        loc = view.rowcol(view.sel()[0].a)
+        path = file_or_buffer_name(view)
+        source = view.substr(sublime.Region(0, view.size()))
+
+        proxy = proxy_for(view)
+        if not proxy:
+            return
+
+        self.view = view
+        self.proxy = proxy
+        self.usages = []
+        self.search_id = None
+        self.panel_open = False
+        # incremented each time the panel is reshown with more usages
+        self.panel_generation = 0
+        self.selected_index = 0
+        sublime.set_timeout_async(
+            lambda: self.receive(proxy.usages(
+                source, root_folder_for(view), path, loc)), 0)
+
+    def receive(self, response):
+        if not response:
+            return
+        self.search_id = response["id"]
+        self.usages.extend(response["usages"])
+        done = response["done"]
+        sublime.set_timeout(lambda: self.update_panel(done), 0)
+        if not done:
+            sublime.set_timeout_async(self.continue_search, 0)
+
+    def continue_search(self):
+        if self.search_id is None:
+            return  # cancelled by the user
+        self.receive(self.proxy.usages_next(self.search_id))
+
+    def update_panel(self, done):
+        if done:
+            self.view.erase_status("python_usages")
+        else:
+            self.view.set_status(
+                "python_usages",
+                "Searching usages... (%i found)" % len(self.usages))
+
+        if not self.usages:
+            if done:
+                word = self.view.substr(self.view.word(self.view.sel()[0].a))
+                sublime.status_message("No usages found for %s" % word)
+            return
+
+        self.panel_generation += 1
+        generation = self.panel_generation
+        if self.panel_open:
+            self.window.run_command("hide_overlay")
+        self.panel_open = True
+        items = [
+            ["%s:%i" % (self.display_path(path), line), text]
+            for path, line, column, text in self.usages
+        ]
+        self.window.show_quick_panel(
+            items, lambda index: self.on_select(index, generation),
+            0, self.selected_index, self.on_highlight)
+
+    def display_path(self, path):
+        for folder in self.window.folders():
+            if path.startswith(folder + os.sep):
+                return os.path.relpath(path, folder)
+        return path
+
+    def on_highlight(self, index):
+        self.selected_index = index
+
+    def on_select(self, index, generation):
+        if generation != self.panel_generation:
+            return  # the panel was hidden to show more usages
+        self.panel_open = False
+        if self.search_id is not None:
+            search_id, self.search_id = self.search_id, None
+            sublime.set_timeout_async(
+                lambda: self.proxy.usages_cancel(search_id), 0)
+        self.view.erase_status("python_usages")
+        if index == -1:
+            return
+
+        path, line, column, _ = self.usages[index]
+        if path == file_or_buffer_name(self.view):
+            point = self.view.text_point(line - 1, column)
+            self.view.sel().clear()
+            self.view.sel().add(sublime.Region(point))
+            self.view.show_at_center(point)
+            self.window.focus_view(self.view)
+        else:
+            self.window.open_file(
+                "%s:%i:%i" % (path, line, column + 1), sublime.ENCODED_POSITION)
@@ -304,7 +304,11 @@ def parse_errors(view, errors, lines, vid):
         if type(error) is pyflakes.messages.ImportStarUsed and ignore_star:
             continue
 
-        add_message(error.lineno, lines, str(error), messages)
+        message = str(error)
+        suggestions = getattr(error, 'import_suggestions', None)
+        if suggestions:
+            message += ' (import from {0})'.format(', '.join(suggestions))
+        add_message(error.lineno, lines, message, messages)
         if isinstance(error, (Pep8Error, Pep8Warning, OffsetError,
                               PythonLintError)):
             underline_range(
@@ -1,9 +1,324 @@
+import os
 from abc import ABCMeta, abstractmethod
 
 import sublime
 import sublime_plugin
 
-from SublimePythonIDE.sublime_python import proxy_for, file_or_buffer_name, root_folder_for
+from SublimePythonIDE.sublime_python import proxy_for, file_or_buffer_name, root_folder_for,\
+    get_setting
+
+# the output panel showing the diffs of a refactoring preview, and how many
+# diffs are requested from the server at a time
+PREVIEW_PANEL = "python_refactoring_preview"
+PREVIEW_DIFF_PAGE_SIZE = 10
+# the status bar key of the progress of refactoring tasks, and how often
+# (in ms) the server is asked for it
+TASK_STATUS = "python_refactoring"
+TASK_POLL_INTERVAL = 200
+
+# window id -> the id of the refactoring task running for the window
+running_tasks = {}
+
+
+def unsaved_sources(window):
+    '''Returns the sources of the modified views of window, by file name'''
+    return dict((file_or_buffer_name(view), view.substr(sublime.Region(0, view.size())))
+                for view in window.views() if view.is_dirty())
+
+
+def apply_edits(window, edits):
+    '''
+    Applies the edits the server returned for a refactoring, as a dict of
+    file name -> list of (offset, length, text). The views of open files are
+    changed in place, without saving them, the other files are written.
+    Returns the names of the files that were written.
+    '''
+    written = []
+    for path, file_edits in edits.items():
+        view = _view_for(window, path)
+        if view is not None:
+            view.run_command("python_apply_edits", {"edits": file_edits})
+        else:
+            _apply_edits_to_file(path, file_edits)
+            written.append(path)
+    return written
+
+
+def run_refactoring(window, proxy, project_path, operations, sources, preview=None):
+    '''
+    Performs refactorings (see PythonRefactorBatch) on the server and applies
+    their changes. With preview (by default the "python_refactoring_preview"
+    setting), the changes are shown in a RefactoringPreview first.
+    '''
+    if preview is None:
+        preview = get_setting("python_refactoring_preview", window.active_view(), False)
+    if not preview:
+        result = proxy.refactor_batch(project_path, operations, sources)
+        apply_refactoring(window, proxy, project_path, result)
+        return
+    summary = proxy.refactor_preview(project_path, operations, sources)
+    if summary is None:
+        return
+    if summary["error"]:
+        sublime.error_message("Refactoring failed, " + summary["error"])
+        return
+    RefactoringPreview(window, proxy, project_path, summary).show()
+
+
+def run_refactoring_task(window, proxy, project_path, operations, sources, preview=None):
+    '''
+    Starts refactorings that search the whole project (moves, inlines,
+    signature changes...) as a task of the server, which computes them in
+    the background while completions and linting go on. The progress is
+    shown in the status bar, the changes are previewed or applied like
+    run_refactoring's when the task is done. One task runs per window,
+    python_refactor_cancel stops it.
+    '''
+    if preview is None:
+        preview = get_setting("python_refactoring_preview", window.active_view(), False)
+    if window.id() in running_tasks:
+        sublime.status_message("Another refactoring is running")
+        return
+    started = proxy.refactor_start(project_path, operations, sources)
+    if started is None:
+        return
+    if started["error"]:
+        sublime.error_message("Refactoring failed, " + started["error"])
+        return
+    running_tasks[window.id()] = started["id"]
+    task = RefactoringTaskProgress(window, proxy, project_path, started["id"], preview)
+    sublime.set_timeout_async(task.poll, 0)
+
+
+def apply_refactoring(window, proxy, project_path, result):
+    '''
+    Applies the result of a refactoring: the text edits are applied, the
+    views of the files the server wrote are reloaded. Only the files written
+    to disk are reported as changed, the edited views are reported by the
+    save hook when they are saved.
+    '''
+    if result is None:
+        return
+    if result["error"]:
+        sublime.error_message("Refactoring failed, " + result["error"])
+        return
+
+    written = apply_edits(window, result["edits"])
+    for path in result["written"]:
+        view = _view_for(window, path)
+        if view is not None:
+            view.run_command("revert")
+        if os.path.exists(path):
+            written.append(path)
+    for path in written:
+        proxy.report_changed(project_path, path)
+
+
+def change_counts(window, paths=None):
+    '''Returns the change counts of the views of paths (by default of all
+    views of window), by view id'''
+    if paths is None:
+        views = window.views()
+    else:
+        views = [_view_for(window, path) for path in paths]
+    return dict((view.id(), view.change_count()) for view in views if view is not None)
+
+
+def views_changed(window, counts):
+    '''Whether a view was changed since its change count was recorded'''
+    for view in window.views():
+        count = counts.get(view.id())
+        if count is not None and count != view.change_count():
+            return True
+    return False
+
+
+def _view_for(window, path):
+    if not path.startswith("BUFFER:"):
+        return window.find_open_file(path)
+    for view in window.views():
+        if file_or_buffer_name(view) == path:
+            return view
+    return None
+
+
+def _apply_edits_to_file(path, edits):
+    # the offsets are relative to the source with "\n" line endings
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+        newline = f.newlines if isinstance(f.newlines, str) else "\n"
+    for offset, length, text in sorted(edits, reverse=True):
+        source = source[:offset] + text + source[offset + length:]
+    with open(path, "w", encoding="utf-8", newline=newline) as f:
+        f.write(source)
+
+
+class RefactoringPreview(object):
+    '''
+    Lists the files a refactoring changes in a quick panel. The server keeps
+    the changes meanwhile, and sends the diffs of the files as they are
+    highlighted, a few files at a time. The changes are applied when
+    "Apply" is chosen and discarded when the panel is closed.
+    '''
+
+    def __init__(self, window, proxy, project_path, summary, counts=None):
+        self.window = window
+        self.proxy = proxy
+        self.project_path = project_path
+        self.id = summary["id"]
+        self.files = summary["files"]
+        # index of a file -> its diff
+        self.diffs = {}
+        # the edits are relative to the contents of the views now, unless
+        # the change counts they were computed for are passed
+        if counts is None:
+            counts = change_counts(window, [changed["path"] for changed in self.files])
+        self.change_counts = counts
+
+    def show(self, selected_index=0):
+        hunks = sum(changed["hunks"] for changed in self.files)
+        items = [["Apply", "{0} changes in {1} files".format(hunks, len(self.files))]]
+        items.extend([changed["description"], "{0} ({1} changes)".format(
+            changed["path"], changed["hunks"])] for changed in self.files)
+        self.window.show_quick_panel(
+            items, self.on_select, 0, selected_index, self.on_highlight)
+
+    def on_highlight(self, index):
+        if index < 1:
+            return
+        panel = self.window.create_output_panel(PREVIEW_PANEL)
+        panel.set_syntax_file("Packages/Diff/Diff.tmLanguage")
+        panel.run_command("simple_clear_and_insert", {"insert_string": self.diff(index - 1)})
+        self.window.run_command("show_panel", {"panel": "output." + PREVIEW_PANEL})
+
+    def on_select(self, index):
+        if index > 0:
+            # a file was chosen, its diff stays visible
+            sublime.set_timeout(lambda: self.show(index), 0)
+            return
+        self.window.run_command("hide_panel", {"panel": "output." + PREVIEW_PANEL})
+        if index < 0:
+            self.proxy.refactor_preview_discard(self.id)
+            return
+        if views_changed(self.window, self.change_counts):
+            self.proxy.refactor_preview_discard(self.id)
+            sublime.error_message("Refactoring not applied, the files changed since the preview")
+            return
+        result = self.proxy.refactor_preview_apply(self.id)
+        apply_refactoring(self.window, self.proxy, self.project_path, result)
+
+    def diff(self, index):
+        if index not in self.diffs:
+            diffs = self.proxy.refactor_preview_diffs(
+                self.id, index, PREVIEW_DIFF_PAGE_SIZE) or []
+            for offset, file_diff in enumerate(diffs):
+                self.diffs[index + offset] = file_diff["diff"]
+        return self.diffs.get(index, "")
+
+
+class RefactoringTaskProgress(object):
+    '''
+    Asks the server for the progress of a refactoring task until it is done
+    and shows it in the status bar, then previews or applies its changes.
+    Polls from the async thread.
+    '''
+
+    def __init__(self, window, proxy, project_path, task_id, preview):
+        self.window = window
+        self.proxy = proxy
+        self.project_path = project_path
+        self.id = task_id
+        self.preview = preview
+        self.view = window.active_view()
+        # the task computes the changes of the contents the views have now
+        self.change_counts = change_counts(window)
+
+    def poll(self):
+        status = self.proxy.refactor_status(self.id)
+        if status is not None and not status["done"]:
+            message = "Refactoring"
+            if status["job"]:
+                message += " " + status["job"]
+            if status["percent"] is not None:
+                message += " {0}%".format(status["percent"])
+            self.view.set_status(TASK_STATUS, message)
+            sublime.set_timeout_async(self.poll, TASK_POLL_INTERVAL)
+            return
+        self.view.erase_status(TASK_STATUS)
+        running_tasks.pop(self.window.id(), None)
+        if status is None:
+            return
+        summary = status["preview"]
+        if summary["error"] == "cancelled":
+            sublime.status_message("Refactoring cancelled")
+            return
+        if summary["error"]:
+            sublime.error_message("Refactoring failed, " + summary["error"])
+            return
+        # only the views of the changed files have to stay unchanged
+        changed = change_counts(self.window, [f["path"] for f in summary["files"]])
+        counts = dict((view_id, count) for view_id, count in self.change_counts.items()
+                      if view_id in changed)
+        sublime.set_timeout(lambda: self.done(summary, counts), 0)
+
+    def done(self, summary, counts):
+        if self.preview:
+            RefactoringPreview(self.window, self.proxy, self.project_path, summary, counts).show()
+            return
+        if views_changed(self.window, counts):
+            self.proxy.refactor_preview_discard(self.id)
+            sublime.error_message("Refactoring not applied, the files changed while it was computed")
+            return
+        result = self.proxy.refactor_preview_apply(self.id)
+        apply_refactoring(self.window, self.proxy, self.project_path, result)
+
+
+class PythonApplyEdits(sublime_plugin.TextCommand):
+    '''
+    Applies (offset, length, text) edits to the view, replacing only the
+    changed regions. The offsets are relative to the current contents.
+    '''
+    def run(self, edit, edits):
+        for offset, length, text in sorted(edits, reverse=True):
+            self.view.replace(edit, sublime.Region(offset, offset + length), text)
+
+
+class PythonRefactorBatch(sublime_plugin.WindowCommand):
+    '''
+    Performs several renames, method extractions and import organizations
+    in a single call to the server, e.g. from a plugin:
+
+    window.run_command("python_refactor_batch", {"operations": [
+        {"type": "rename", "file_path": path, "offset": 120,
+         "new_name": "total"},
+        {"type": "extract_method", "file_path": path, "start": 200,
+         "end": 260, "new_name": "parse_header"}]})
+
+    Each operation works on the results of the ones before, so its offsets
+    are relative to the contents they leave. Nothing is changed if one of
+    the operations fails. With task=True the operations are computed in the
+    background, see run_refactoring_task; the server's refactor_batch lists
+    the other refactorings ("move", "inline"...) that can be used then.
+    '''
+    def run(self, operations, preview=None, task=False):
+        view = self.window.active_view()
+        proxy = proxy_for(view)
+        if not proxy:
+            return
+        run = run_refactoring_task if task else run_refactoring
+        run(self.window, proxy, root_folder_for(view), operations,
+            unsaved_sources(self.window), preview)
+
+
+class PythonRefactorCancel(sublime_plugin.WindowCommand):
+    '''Stops the refactoring task running for the window'''
+    def run(self):
+        task_id = running_tasks.get(self.window.id())
+        proxy = proxy_for(self.window.active_view())
+        if task_id is None or not proxy:
+            sublime.status_message("No refactoring is running")
+            return
+        proxy.refactor_cancel(task_id)
 
 
 class PythonAbstractRefactoring(object):
@@ -11,15 +326,20 @@ class PythonAbstractRefactoring(object):
     Implements basic interaction for simple refactorings:
     1.) Ask user for some input using some message and default input
     2.) Collect necessary context (selection, source, file_path etc)
-    3.) Save, call server to do the refactoring, reload view
-    Subclasses should implement default_input, input_msg and refactor
+    3.) Call server to compute the refactoring, apply its edits to the views
+    Subclasses should implement default_input, input_msg and operation, and
+    set task to compute refactorings that search the whole project in the
+    background (see run_refactoring_task)
     '''
 
     __metaclass__ = ABCMeta
 
-    def run(self, edit, block=False):
+    task = False
+
+    def run(self, edit, block=False, preview=None):
         self.sel = self.view.sel()[0]
         self.default = self.default_input()
+        self.preview = preview
         self.view.window().show_input_panel(
             self.input_msg(),
             self.default,
@@ -39,14 +359,21 @@ class PythonAbstractRefactoring(object):
     def input_callback(self, input_str):
         if input_str == self.default:
             return
+        self.refactor(input_str)
 
+    def refactor(self, input_str):
         proxy = proxy_for(self.view)
         if not proxy:
             return
 
-        self.view.run_command("save")
-        self.refactor(proxy, input_str, *self.refactoring_context())
-        self.view.run_command('revert')  # reload view
+        window = self.view.window()
+        project_path, file_path, start, end, source = self.refactoring_context()
+        # the other unsaved views are refactored as they are, too
+        sources = unsaved_sources(window)
+        sources[file_path] = source
+        operation = self.operation(input_str, file_path, start, end)
+        run = run_refactoring_task if self.task else run_refactoring
+        run(window, proxy, project_path, [operation], sources, self.preview)
 
     @abstractmethod
     def default_input(self):
@@ -59,9 +386,9 @@ class PythonAbstractRefactoring(object):
         pass
 
     @abstractmethod
-    def refactor(self, proxy, input_str, project_path, file_path, start, end, source):
-        '''Given all the necessary context, a server proxy and the user's input,
-        perform the refactoring'''
+    def operation(self, input_str, file_path, start, end):
+        '''Given the user's input, the file and the selection, return the
+        refactoring as an operation of PythonRefactorBatch'''
         pass
 
 
@@ -76,9 +403,9 @@ class PythonRefactorRename(PythonAbstractRefactoring, sublime_plugin.TextCommand
     def input_msg(self):
         return "New name:"
 
-    def refactor(self, proxy, input_str, project_path, file_path, start, _, source):
-        print("calling rename with ", proxy, input_str, project_path, file_path, start)
-        proxy.rename(project_path, file_path, start, source, input_str)
+    def operation(self, input_str, file_path, start, end):
+        return {"type": "rename", "file_path": file_path, "offset": start,
+                "new_name": input_str}
 
 
 class PythonExtractMethod(PythonAbstractRefactoring, sublime_plugin.TextCommand):
@@ -93,33 +420,195 @@ class PythonExtractMethod(PythonAbstractRefactoring, sublime_plugin.TextCommand)
     def default_input(self):
         return ""
 
-    def refactor(self, proxy, input_str, project_path, file_path, start, end, source):
-        proxy.extract_method(project_path, file_path, start, end, source, input_str)
+    def operation(self, input_str, file_path, start, end):
+        return {"type": "extract_method", "file_path": file_path, "start": start,
+                "end": end, "new_name": input_str}
+
+
+class PythonRefactorMove(PythonAbstractRefactoring, sublime_plugin.TextCommand):
+    '''Moves the global function or class under the cursor to another module,
+    a module to another package, or a method to the class of one of its
+    attributes. The destination is a path relative to the project folder,
+    or the attribute'''
+    task = True
+
+    def __init__(self, *args, **kwargs):
+        sublime_plugin.TextCommand.__init__(self, *args, **kwargs)
+
+    def input_msg(self):
+        return "Move to:"
+
+    def default_input(self):
+        return ""
+
+    def operation(self, input_str, file_path, start, end):
+        return {"type": "move", "file_path": file_path, "offset": start,
+                "destination": input_str}
+
+
+class PythonRefactorInline(PythonAbstractRefactoring, sublime_plugin.TextCommand):
+    '''Inlines the function, method, variable or parameter under the cursor
+    in all its uses, and removes its definition'''
+    task = True
+
+    def __init__(self, *args, **kwargs):
+        sublime_plugin.TextCommand.__init__(self, *args, **kwargs)
+
+    def run(self, edit, block=False, preview=None):
+        # nothing to ask
+        self.sel = self.view.sel()[0]
+        self.preview = preview
+        self.refactor(None)
+
+    def input_msg(self):
+        return ""
+
+    def default_input(self):
+        return ""
+
+    def operation(self, input_str, file_path, start, end):
+        return {"type": "inline", "file_path": file_path, "offset": start}
+
+
+class PythonRefactorChangeSignature(PythonAbstractRefactoring, sublime_plugin.TextCommand):
+    '''Changes the parameters of the function under the cursor and updates
+    its calls: parameters left out are removed, new ones added, and the
+    others reordered. A removed default is inserted into the calls'''
+    task = True
+
+    def __init__(self, *args, **kwargs):
+        sublime_plugin.TextCommand.__init__(self, *args, **kwargs)
+
+    def input_msg(self):
+        return "Parameters:"
+
+    def default_input(self):
+        proxy = proxy_for(self.view)
+        if not proxy:
+            return ""
+        project_path, file_path, start, end, source = self.refactoring_context()
+        return proxy.change_signature_parameters(
+            source, project_path, file_path, start) or ""
+
+    def operation(self, input_str, file_path, start, end):
+        return {"type": "change_signature", "file_path": file_path,
+                "offset": start, "parameters": input_str}
+
+
+class PythonRefactorIntroduceParameter(PythonAbstractRefactoring, sublime_plugin.TextCommand):
+    '''Turns the expression under the cursor into a parameter of the function
+    it is used in, with the expression as its default'''
+    task = True
+
+    def __init__(self, *args, **kwargs):
+        sublime_plugin.TextCommand.__init__(self, *args, **kwargs)
+
+    def input_msg(self):
+        return "Parameter name:"
+
+    def default_input(self):
+        return ""
+
+    def operation(self, input_str, file_path, start, end):
+        return {"type": "introduce_parameter", "file_path": file_path,
+                "offset": start, "new_name": input_str}
+
+
+class PythonRefactorRestructure(PythonAbstractRefactoring, sublime_plugin.TextCommand):
+    '''Replaces the code matching a pattern throughout the project, e.g.
+    "${a}.set(${b})" with the goal "${a}.value = ${b}". The pattern defaults
+    to the selection'''
+    task = True
+
+    def __init__(self, *args, **kwargs):
+        sublime_plugin.TextCommand.__init__(self, *args, **kwargs)
+
+    def input_msg(self):
+        return "Pattern:"
+
+    def default_input(self):
+        return self.view.substr(self.sel)
+
+    def input_callback(self, input_str):
+        # the goal is asked for next, the selection may be the pattern
+        self.pattern = input_str
+        self.view.window().show_input_panel(
+            "Goal:", input_str, self.on_goal, None, None)
+
+    def on_goal(self, input_str):
+        if input_str == self.pattern:
+            return
+        self.refactor(input_str)
+
+    def operation(self, input_str, file_path, start, end):
+        return {"type": "restructure", "file_path": file_path,
+                "pattern": self.pattern, "goal": input_str}
 
 
 class PythonOrganizeImports(sublime_plugin.TextCommand):
     '''
-    Organizes the imports of the current view.
+    Organizes the imports of the current view, replacing only the changed
+    lines. The view is not saved.
+    '''
+    def run(self, edit, preview=None):
+        path = file_or_buffer_name(self.view)
+        source = self.view.substr(sublime.Region(0, self.view.size()))
+
+        proxy = proxy_for(self.view)
+        if not proxy:
+            return
+        operation = {"type": "organize_imports", "file_path": path}
+        run_refactoring(self.view.window(), proxy, root_folder_for(self.view),
+                        [operation], {path: source}, preview)
 
-    Tries to saves the view beforehand
-    and organizes the imports only on a successful save.
+
+class PythonAddImport(sublime_plugin.TextCommand):
+    '''
+    Imports the name under the cursor from one of the modules
+    that define it, which the user chooses if there are several.
     '''
-    def run(self, edit):
-        if self.view.is_dirty():
-            self.view.run_command("save")
-        if self.view.file_name():
-            row, col = self.view.rowcol(self.view.sel()[0].a)
-            path = file_or_buffer_name(self.view)
-            all_view = sublime.Region(0, self.view.size())
-            source = self.view.substr(all_view)
+    def run(self, edit, module=None, name=None):
+        proxy = proxy_for(self.view)
+        if not proxy:
+            return
+        if name is None:
+            name = self.view.substr(self.view.word(self.view.sel()[0].a))
+        if module is None:
+            modules = proxy.import_suggestions(
+                root_folder_for(self.view), file_or_buffer_name(self.view), name)
+            if not modules:
+                sublime.status_message("No module found for " + name)
+            elif len(modules) == 1:
+                self.view.run_command(
+                    "python_add_import", {"module": modules[0], "name": name})
+            else:
+                def on_done(index):
+                    if index >= 0:
+                        self.view.run_command(
+                            "python_add_import",
+                            {"module": modules[index], "name": name})
+                self.view.window().show_quick_panel(
+                    ["from {0} import {1}".format(m, name) for m in modules],
+                    on_done)
+            return
 
-            proxy = proxy_for(self.view)
-            if not proxy:
-                return
-            organized_source = proxy.organize_imports(source, root_folder_for(self.view), path)
-            self.view.replace(edit, all_view, organized_source)
-            # end with a saved view to be compatible with the other refactorings
-            self.view.run_command("save")
+        all_view = sublime.Region(0, self.view.size())
+        source = self.view.substr(all_view)
+        new_source = proxy.add_import(
+            source, root_folder_for(self.view), file_or_buffer_name(self.view),
+            module, name)
+        # only replace the changed lines, so the cursor stays where it is
+        start = 0
+        while start < min(len(source), len(new_source)) and \
+                source[start] == new_source[start]:
+            start += 1
+        end = 0
+        while end < min(len(source), len(new_source)) - start and \
+                source[-end - 1] == new_source[-end - 1]:
+            end += 1
+        self.view.replace(
+            edit, sublime.Region(start, len(source) - end),
+            new_source[start:len(new_source) - end])
 
 
 class PythonOrganizeImportsOnSave(sublime_plugin.EventListener):
@@ -135,16 +624,7 @@ class PythonOrganizeImportsOnSave(sublime_plugin.EventListener):
     }
     '''
 
-    _post_save_is_on = True
-
-    def on_post_save(self, view):
+    def on_pre_save(self, view):
         if view.settings().get("python_organize_imports_on_save") is True:
-            # since the refactoring itself calls "save"
-            # the event has to be turned off/on
-            # otherwise we would enter an infinite recursion
-            if self._post_save_is_on:
-                try:
-                    self._post_save_is_on = False
-                    view.run_command("python_organize_imports")
-                finally:
-                    self._post_save_is_on = True
+            # the imports are organized in the view before it is written
+            view.run_command("python_organize_imports", {"preview": False})